@@ -1,10 +1,11 @@
 import streamlit as st
+import pandas as pd
 from core import (
     dashboard_summary,
     utils,
     sidebar,
-    data_variables,
     dashboard_plot,
+    partition_store,
 )
 
 # ==========================================================================================================    
@@ -18,32 +19,57 @@ st.set_page_config(
 
 st.logo("assets/logo2.png", size="large")
 
+# Columns read by the dashboard (core.dashboard_summary / core.dashboard_plot); the rest
+# of the dataset (IDs, free text, ...) is not loaded for this page
+DASHBOARD_COLUMNS = [
+    'Date', 'Violation_Type', 'Fine_Amount', 'Fine_Paid', 'Payment_Method', 'Location',
+    'Issuing_Agency', 'Vehicle_Type', 'Driver_Gender', 'License_Type', 'License_Validity',
+    'Weather_Condition', 'Traffic_Light_Status', 'Speed_Limit', 'Recorded_Speed',
+    'Alcohol_Level', 'Penalty_Points', 'Previous_Violations', 'Helmet_Worn', 'Seatbelt_Worn',
+    'Court_Appearance_Required', 'Comments',
+]
+
+def render_slider(container, preliminary: bool, label: str, key: str, **kwargs):
+    """
+    container.slider(...). In a preliminary render the slider is shown disabled at its
+    current value under another key, as the exact render of the same run creates the real one.
+    """
+    if preliminary:
+        value = st.session_state.get(key, kwargs['value'])
+        if all(kwargs['min_value'] <= v <= kwargs['max_value'] for v in (value if isinstance(value, (tuple, list)) else [value])):
+            kwargs['value'] = value # Else the sample's range differs from the full dataset's: keep the default
+        return container.slider(label, key=f"{key}_preliminary_{kwargs['value']}", disabled=True, **kwargs)
+    return container.slider(label, key=key, **kwargs)
+
 def dashboard() -> None:
 # ==========================================================================================================    
     # HEADER SECTION
 # ==========================================================================================================    
     st.title("🚦 Smart Traffic Violation Summary Dashboard", anchor=False)
+    # Progressive rendering: while the full dataset loads, the dashboard is drawn here from
+    # its saved stratified sample with a "Preliminary" badge, then redrawn in place
+    body = st.empty()
+
+    def render_preliminary(preliminary_sample):
+        with body.container():
+            st.badge("Preliminary - refining with the full dataset", icon=":material/hourglass_top:", color="orange")
+            render_dashboard(utils.filter_the_dataset(preliminary_sample.df), preliminary_sample, preliminary=True)
 
 # ==========================================================================================================    
     # SIDEBAR
 # ==========================================================================================================    
-    df = sidebar.render_sidebar()
+    df = sidebar.render_sidebar(traffic_only=True, columns=DASHBOARD_COLUMNS, preview=render_preliminary)
     if df is None:
+        body.empty()
         st.warning("No dataset selected. Please select one from the sidebar.")
         st.stop()
     # Filter the dataset
-    if set(data_variables.TRAFFIC_VIOLATION_COLUMNS).issubset(set(df.columns)) is False:
-        st.warning("Current Dataset is not suitable for this dashboard.")
-        st.info(
-                f"""
-                This analysis requires:
-                - A 'Date' column.
-                - Require columns like {data_variables.TRAFFIC_VIOLATION_COLUMNS[0], data_variables.TRAFFIC_VIOLATION_COLUMNS[1]} ....
-                """
-            )
-        st.warning("Please Select a valid traffic violation dataset from the sidebar.")
+    if set(DASHBOARD_COLUMNS).issubset(set(df.columns)) is False:
+        body.empty()
+        sidebar.render_unsuitable_dataset_notice()
         st.stop()
     elif df.shape[0] == 0:
+        body.empty()
         st.warning("The selected dataset is empty. Please upload a valid traffic violation dataset.")
         st.stop()
     
@@ -51,17 +77,29 @@ def dashboard() -> None:
     else:
         # Filter or clean the dataset
         df = utils.filter_the_dataset(df)
+        # Approximate mode: answer from the dataset's stratified sample (core.stratified_sample)
+        sample = sidebar.render_sample_mode(df)
+        if sample:
+            df = sample.df
+        with body.container():
+            render_dashboard(df, sample)
 
+def render_dashboard(df: pd.DataFrame, sample=None, preliminary: bool = False) -> None:
+    """
+    Draws the dashboard sections from df (sampled rows when `sample` is given, see
+    core.stratified_sample). A preliminary render shows its sliders disabled.
+    """
+    with st.container():
 # ==========================================================================================================    
     # Summary Calculations for Last N Days
 # ==========================================================================================================    
-        no_of_days_for_summary  = st.expander("Days Filter", expanded=False).slider("Select Number of Days for Summary Calculations", min_value=7, max_value=365, value=30, step=1, key="days_slider")
+        no_of_days_for_summary  = render_slider(st.expander("Days Filter", expanded=False), preliminary, "Select Number of Days for Summary Calculations", min_value=7, max_value=365, value=30, step=1, key="days_slider")
         df_last_n_days = utils.get_last_n_days_data(df, no_of_days_for_summary)
         
         col1, col2 = st.columns(2)
         with col1:
             st.info(f"### Total Violations (Last {no_of_days_for_summary} Days)")
-            summary = dashboard_summary.get_violations_summary_of_last_n_days(df_last_n_days)
+            summary = dashboard_summary.get_violations_summary_of_last_n_days(df_last_n_days, sample)
             
             # Display Charts
             # with st.expander("View Violation Types Distribution Chart"):
@@ -71,18 +109,18 @@ def dashboard() -> None:
             # Metrics
             sub_col1, sub_col2, sub_col3 = st.columns(3, border=True)
             with sub_col1:
-                st.metric(label="Total Violations", value=summary.get('total_no_of_violations'))
+                st.metric(label="Total Violations", value=f"{summary.get('total_no_of_violations')}")
                 
             with sub_col2:
-                st.metric(label="Violations/Day", value=f"{int(summary.get('total_no_of_violations')/no_of_days_for_summary)}")
+                st.metric(label="Violations/Day", value=f"{summary.get('total_no_of_violations')//no_of_days_for_summary}")
             with sub_col3:
-                st.metric(label="Violations/VehicleType", value=f"{int(summary.get('total_no_of_violations')/df_last_n_days['Vehicle_Type'].nunique())}")
+                st.metric(label="Violations/VehicleType", value=f"{summary.get('total_no_of_violations')//df_last_n_days['Vehicle_Type'].nunique()}")
             st.markdown('---')
             
     # ==========================================================================================================
             # --- License Insights ---
             st.info(f"### License Insights (Last {no_of_days_for_summary} Days)")
-            license_insights = dashboard_summary.get_license_insights(df_last_n_days)
+            license_insights = dashboard_summary.get_license_insights(df_last_n_days, sample)
             
             with st.container():
                 st.markdown("<h3 style='text-align: center;'>License Validity</h3>", unsafe_allow_html=True)
@@ -99,7 +137,7 @@ def dashboard() -> None:
     # ==========================================================================================================
         with col2:
             st.info(f"### Total Fines (Last {no_of_days_for_summary} Days)")
-            fine_summary = dashboard_summary.get_total_fines_generated(df_last_n_days)
+            fine_summary = dashboard_summary.get_total_fines_generated(df_last_n_days, sample)
             
             # Display Charts
             # with st.expander("View Fines Distribution Chart"):
@@ -111,12 +149,12 @@ def dashboard() -> None:
             with sub_col1:
                 st.metric(label="Total Fines", value=f"Rs.{fine_summary.get('total_fines')}")
             with sub_col2:
-                st.metric(label="Average Fines per Day", value=f"Rs.{int(fine_summary.get('total_fines')/no_of_days_for_summary)}")
+                st.metric(label="Average Fines per Day", value=f"Rs.{fine_summary.get('total_fines')//no_of_days_for_summary}")
             st.markdown('---')
 
     # ==========================================================================================================
             st.info(f"### Location Insights (Last {no_of_days_for_summary} Days)")
-            location_based_summary = dashboard_summary.get_violations_by_location(df_last_n_days)
+            location_based_summary = dashboard_summary.get_violations_by_location(df_last_n_days, sample)
             # with st.expander("View Violations by Location Chart"):
             with st.container():    
                 st.markdown("<h3 style='text-align: center;'>Violations by Location</h3>", unsafe_allow_html=True)
@@ -151,7 +189,7 @@ def dashboard() -> None:
         if min_year == max_year:
              selected_years_global = (min_year, max_year)
         else:
-             selected_years_global = st.slider(
+             selected_years_global = render_slider(st, preliminary,
                  "Filter by Year (Global Overview)",
                  min_value=min_year,
                  max_value=max_year,
@@ -160,15 +198,14 @@ def dashboard() -> None:
              )
         
         # Filter Data
-        mask_global = (df['Date'].dt.year >= selected_years_global[0]) & (df['Date'].dt.year <= selected_years_global[1])
-        df_global = df[mask_global]
+        df_global = partition_store.filter_years(df, selected_years_global[0], selected_years_global[1])
         
         with st.expander(f"📊 Executive Summary Report ({selected_years_global[0]} - {selected_years_global[1]})", expanded=True):
-             global_metrics = dashboard_summary.get_global_overview_metrics(df_global)
+             global_metrics = dashboard_summary.get_global_overview_metrics(df_global, sample)
              
              # Row 1
              c1, c2, c3, c4 = st.columns(4, border=True)
-             with c1: st.metric("Total Violations", global_metrics.get('total_violations', 0))
+             with c1: st.metric("Total Violations", f"{global_metrics.get('total_violations', 0)}")
              with c2: st.metric("Most Common Violation", global_metrics.get('most_common_violation', 'N/A'))
              with c3: st.metric("Top Location", global_metrics.get('top_location', 'N/A'))
              with c4: st.metric("Top Licensed Agency", global_metrics.get('top_agency', 'N/A'))
@@ -193,7 +230,7 @@ def dashboard() -> None:
         if min_year == max_year:
              selected_years_behavior = (min_year, max_year)
         else:
-             selected_years_behavior = st.slider(
+             selected_years_behavior = render_slider(st, preliminary,
                  "Filter by Year (Behavior Analysis)",
                  min_value=min_year,
                  max_value=max_year,
@@ -202,11 +239,10 @@ def dashboard() -> None:
              )
              
         # Filter Data
-        mask_behavior = (df['Date'].dt.year >= selected_years_behavior[0]) & (df['Date'].dt.year <= selected_years_behavior[1])
-        df_behavior = df[mask_behavior]
+        df_behavior = partition_store.filter_years(df, selected_years_behavior[0], selected_years_behavior[1])
 
         with st.expander(f"Advanced Risk Indicators ({selected_years_behavior[0]} - {selected_years_behavior[1]})", expanded=True):
-             behavior_metrics = dashboard_summary.get_behavioral_analysis(df_behavior)
+             behavior_metrics = dashboard_summary.get_behavioral_analysis(df_behavior, sample)
              
              over_speeding_count, over_speeding_pct = behavior_metrics['over_speeding_stats']
              court_count, court_pct = behavior_metrics['court_appearance_stats']
@@ -275,17 +311,16 @@ def dashboard() -> None:
             if min_year == max_year:
                  years_vehicle = (min_year, max_year)
             else:
-                 years_vehicle = st.slider(
+                 years_vehicle = render_slider(st, preliminary,
                      "Filter by Year (Vehicle Analysis)",
                      min_value=min_year, max_value=max_year, value=(min_year, max_year),
                      key="slider_vehicle_year"
                  )
             
             # Filter
-            mask_vehicle = (df['Date'].dt.year >= years_vehicle[0]) & (df['Date'].dt.year <= years_vehicle[1])
-            df_vehicle = df[mask_vehicle]
+            df_vehicle = partition_store.filter_years(df, years_vehicle[0], years_vehicle[1])
             
-            st.pyplot(dashboard_plot.plot_vehicle_type_vs_violation_type(df_vehicle), width='stretch')
+            st.pyplot(dashboard_plot.plot_vehicle_type_vs_violation_type(dashboard_summary.get_vehicle_violation_counts(df_vehicle)), width='stretch')
             
         st.markdown('---')
         
@@ -297,17 +332,16 @@ def dashboard() -> None:
             if min_year == max_year:
                  years_heatmap = (min_year, max_year)
             else:
-                 years_heatmap = st.slider(
+                 years_heatmap = render_slider(st, preliminary,
                      "Filter by Year (Heatmap Analysis)",
                      min_value=min_year, max_value=max_year, value=(min_year, max_year),
                      key="slider_heatmap_year"
                  )
             
             # Filter
-            mask_heatmap = (df['Date'].dt.year >= years_heatmap[0]) & (df['Date'].dt.year <= years_heatmap[1])
-            df_heatmap = df[mask_heatmap]
+            df_heatmap = partition_store.filter_years(df, years_heatmap[0], years_heatmap[1])
 
-            st.pyplot(dashboard_plot.plot_severity_heatmap_by_location(df_heatmap), width='stretch')
+            st.pyplot(dashboard_plot.plot_severity_heatmap_by_location(dashboard_summary.get_severity_by_location(df_heatmap)), width='stretch')
         st.markdown('---')        
     # ------------------------------
     # INFO SECTION
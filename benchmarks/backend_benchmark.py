@@ -0,0 +1,112 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import data_ingest, data_schema, dataframe_backend, utils  # noqa: E402
+
+# ====================================================================================
+# Dataframe Backend Benchmark
+# ====================================================================================
+# Runs the same aggregation workload on every installed backend (pandas, duckdb, polars),
+# checks that each result matches pandas and prints the median time per step.
+#
+#   python benchmarks/backend_benchmark.py --rows 1000000 --repeat 5
+#
+# The sample dataset is repeated up to --rows rows. The "file scan" step aggregates a
+# Parquet copy of it, where DuckDB and Polars read only the needed columns and Date range while
+# pandas has to load the columns first.
+
+SAMPLE_DATASET = os.path.join("dataset", "Indian_Traffic_Violations.csv")
+NUMERIC_COLUMNS = ['Fine_Amount', 'Driver_Age', 'Alcohol_Level', 'Speed_Limit']
+
+
+# -------------------------------------------------------------------------------
+def load_workload(rows: int) -> pd.DataFrame:
+    """
+    Returns the typed sample dataset repeated to `rows` rows.
+    """
+    df = data_schema.apply_traffic_schema(data_ingest.read_csv(SAMPLE_DATASET))
+    copies = max(1, -(-rows // len(df)))
+    df = pd.concat([df] * copies, ignore_index=True).iloc[:rows]
+    return utils.filter_the_dataset(df)
+# -------------------------------------------------------------------------------
+def get_steps(df: pd.DataFrame, parquet_path: str) -> list:
+    """
+    Returns the benchmarked steps as (name, fn) pairs.
+    """
+    def read_parquet_aggregate():
+        # pandas has no lazy scan: load the needed columns, then aggregate
+        source = parquet_path
+        if dataframe_backend.get_backend() == "pandas":
+            source = pd.read_parquet(parquet_path, columns=['Date', 'Location', 'Fine_Amount'])
+        stats = dataframe_backend.aggregate(source, ['Location'], ['Fine_Amount'], ['sum', 'mean'], start='2024-01-01', end='2024-12-31')
+        # File results keep the engine's own types; compare them as plain values
+        return stats.astype({'Location': str, 'Fine_Amount_sum': 'int64'}).sort_values('Location', ignore_index=True)
+
+    return [
+        ("violation stats", lambda: utils.get_violation_stats_table(df)),
+        ("demographic pivot", lambda: utils.get_demographic_pivot(df)),
+        ("vehicle analysis", lambda: utils.get_vehicle_analysis_table(df)),
+        ("speeding (derive+filter)", lambda: utils.get_speeding_analysis_by_zone(df)),
+        ("environmental", lambda: utils.get_environmental_stats(df)),
+        ("custom grouping", lambda: utils.get_custom_grouping(df, ['Location', 'Violation_Type'], NUMERIC_COLUMNS, ['count', 'sum', 'mean', 'max', 'std'])),
+        ("file scan, 2024 only", read_parquet_aggregate),
+    ]
+# -------------------------------------------------------------------------------
+def time_step(fn, repeat: int) -> tuple:
+    """
+    Returns (median seconds, last result) of `repeat` runs after one warm-up run.
+    """
+    result = fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+# -------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Compare the dataframe backends on one workload.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the workload")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per step")
+    args = parser.parse_args()
+
+    backends = [name for name in dataframe_backend.BACKENDS if dataframe_backend.is_available(name)]
+    print(f"Backends: {', '.join(backends)}")
+    df = load_workload(args.rows)
+    print(f"Workload: {len(df):,} rows, {df.memory_usage(deep=True).sum() / 1024 / 1024:,.1f} MB")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        parquet_path = os.path.join(tmp_dir, "workload.parquet")
+        df.to_parquet(parquet_path, index=False, row_group_size=100_000)
+
+        results = {}
+        for backend in backends:
+            os.environ[dataframe_backend.BACKEND_ENV_VAR] = backend
+            for name, fn in get_steps(df, parquet_path):
+                results[(name, backend)] = time_step(fn, args.repeat)
+
+    print()
+    print(f"{'step':<26}" + "".join(f"{backend:>12}" for backend in backends) + "  same result")
+    for name, _ in get_steps(df, None):
+        expected = results[(name, "pandas")][1]
+        same = []
+        for backend in backends[1:]:
+            try:
+                pd.testing.assert_frame_equal(expected, results[(name, backend)][1], check_exact=False)
+                same.append(backend)
+            except AssertionError:
+                same.append(f"{backend}: NO")
+        timings = "".join(f"{results[(name, backend)][0] * 1000:>10.1f}ms" for backend in backends)
+        print(f"{name:<26}{timings}  {', '.join(same) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import pandas as pd
+
+# Copy-on-write: derived frames share data with their parent until one of them is modified,
+# so pages and plot functions can add columns without copying the whole dataset. Set when
+# the package is first imported, so every page runs with the same semantics whichever page
+# a process serves first.
+pd.set_option("mode.copy_on_write", True)
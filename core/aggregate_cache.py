@@ -0,0 +1,231 @@
+import functools
+import glob
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core import data_cache
+
+# ====================================================================================
+# Two-Level Cache of Aggregates (memory + disk)
+# ====================================================================================
+# The grouped tables, KPIs and map aggregates the pages compute (core.utils,
+# core.dashboard_summary) are cached per dataset version and row selection, so a restarted
+# server answers the dashboard warm:
+#   level 1 - an in-process LRU of the last MEMORY_ENTRIES results
+#   level 2 - .dataset_cache/aggregates.v1.sqlite, shared by every worker process and
+#             kept across restarts (the least recently used rows beyond MAX_DISK_ENTRIES
+#             are dropped)
+# Key = function + digest of every core/*.py source (a cached function also depends on
+# data_schema, the query backends, the partitioned store, ...) + dataset key
+# (df.attrs['record_index'], the content hash or partitioned store version set by the
+# sidebar) + the frame's rows (its index), columns, dtypes and a fingerprint of its values
+# at FINGERPRINT_ROWS evenly spaced rows (so a frame whose columns a page derived anew,
+# e.g. converted or filled, gets its own entries) + the other arguments. Frames without a dataset key (unions,
+# versions, uploads being previewed) and calls with other arguments that have no stable
+# repr (e.g. a stratified_sample.Sample) are computed directly.
+# Results are stored pickled and every call gets its own copy, so callers may modify them.
+# A cached function must not modify the frame it is given.
+
+AGGREGATE_CACHE_FORMAT_VERSION = 1  # Bump when pickled results change shape to ignore old ones
+AGGREGATE_CACHE_PATH = os.path.join(data_cache.CACHE_DIR, f"aggregates.v{AGGREGATE_CACHE_FORMAT_VERSION}.sqlite")
+MEMORY_ENTRIES = 256
+MAX_DISK_ENTRIES = 5000
+KEY_TYPES = (str, int, float, bool, type(None))  # Argument types whose repr is a stable key
+FINGERPRINT_ROWS = 4096  # Rows whose values are hashed into a frame's key
+
+_memory = OrderedDict()  # key -> (dataset key, pickled result), least recently used first
+_memory_lock = threading.Lock()
+_schema_ready = False
+_code_digest = None
+
+
+# -------------------------------------------------------------------------------
+def _connect() -> sqlite3.Connection:
+    """
+    Opens the disk level (one short-lived connection per call, so threads never share one).
+    """
+    global _schema_ready
+    os.makedirs(data_cache.CACHE_DIR, exist_ok=True)
+    connection = sqlite3.connect(AGGREGATE_CACHE_PATH, timeout=10)
+    if not _schema_ready:
+        connection.execute("PRAGMA journal_mode=WAL") # Readers in other processes are not blocked by a write
+        connection.execute("CREATE TABLE IF NOT EXISTS aggregates (key TEXT PRIMARY KEY, dataset TEXT, value BLOB, used REAL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS aggregates_used ON aggregates (used)")
+        connection.execute("CREATE INDEX IF NOT EXISTS aggregates_dataset ON aggregates (dataset)")
+        connection.commit()
+        _schema_ready = True
+    return connection
+# -------------------------------------------------------------------------------
+def _get_code_digest() -> str:
+    """
+    Returns a digest of every core/*.py source, so a deploy changing any of them starts fresh.
+    """
+    global _code_digest
+    if _code_digest is None:
+        digest = data_cache.new_content_digest()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+            digest.update(os.path.basename(path).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        _code_digest = digest.hexdigest()
+    return _code_digest
+# -------------------------------------------------------------------------------
+def _frame_key(df: pd.DataFrame) -> str:
+    """
+    Returns '<dataset key>:<digest of rows, columns, dtypes and sampled values>', or None
+    without a dataset key.
+    """
+    dataset_key = df.attrs.get('record_index')
+    if dataset_key is None:
+        return None
+    digest = data_cache.new_content_digest()
+    if isinstance(df.index, pd.RangeIndex): # Whole datasets and slices of them
+        digest.update(repr((df.index.start, df.index.stop, df.index.step)).encode())
+    else:
+        digest.update(pd.util.hash_array(df.index.to_numpy()).tobytes())
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    positions = np.unique(np.linspace(0, len(df) - 1, min(len(df), FINGERPRINT_ROWS)).astype(np.int64))
+    try:
+        digest.update(pd.util.hash_pandas_object(df.iloc[positions], index=False).to_numpy().tobytes())
+    except TypeError: # Unhashable values (lists, dicts)
+        return None
+    return f"{dataset_key}:{digest.hexdigest()}"
+# -------------------------------------------------------------------------------
+def _value_key(value) -> str:
+    """
+    Returns a stable key of a non-frame argument, or None if it has none.
+    """
+    if isinstance(value, KEY_TYPES):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        parts = [_value_key(item) for item in value]
+        return None if None in parts else f"[{','.join(parts)}]"
+    return None
+# -------------------------------------------------------------------------------
+def _call_key(name: str, args: tuple, kwargs: dict):
+    """
+    Returns (dataset key, cache key) of a call, or None if it cannot be cached.
+    """
+    dataset_key, parts = None, [name]
+    for keyword, value in [(None, value) for value in args] + sorted(kwargs.items()):
+        if isinstance(value, pd.DataFrame):
+            part = _frame_key(value)
+            dataset_key = dataset_key or value.attrs.get('record_index')
+        else:
+            part = _value_key(value)
+        if part is None:
+            return None
+        parts.append(part if keyword is None else f"{keyword}={part}")
+    if dataset_key is None:
+        return None
+    return dataset_key, "|".join(parts)
+# -------------------------------------------------------------------------------
+def _remember(key: str, dataset_key: str, value: bytes):
+    with _memory_lock:
+        _memory[key] = (dataset_key, value)
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+# -------------------------------------------------------------------------------
+def _read(dataset_key: str, key: str) -> bytes:
+    """
+    Returns the pickled result of a key from memory, then disk, or None.
+    """
+    with _memory_lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return _memory[key][1]
+    try:
+        connection = _connect()
+        try:
+            row = connection.execute("SELECT value FROM aggregates WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                connection.execute("UPDATE aggregates SET used = ? WHERE key = ?", (time.time(), key))
+                connection.commit()
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        print(f"Aggregate cache read failed: {e}")
+        return None
+    if row is None:
+        return None
+    _remember(key, dataset_key, row[0])
+    return row[0]
+# -------------------------------------------------------------------------------
+def _write(dataset_key: str, key: str, value: bytes):
+    """
+    Stores a pickled result in memory and on disk.
+    """
+    _remember(key, dataset_key, value)
+    try:
+        connection = _connect()
+        try:
+            connection.execute("INSERT OR REPLACE INTO aggregates VALUES (?, ?, ?, ?)", (key, dataset_key, value, time.time()))
+            connection.execute(
+                "DELETE FROM aggregates WHERE key IN (SELECT key FROM aggregates ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (MAX_DISK_ENTRIES,)
+            )
+            connection.commit()
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        print(f"Aggregate cache write failed: {e}")
+
+
+# ==================================================================================
+# Public API
+# ==================================================================================
+def cached(func):
+    """
+    Decorator caching a function's results in memory and on disk (see the module notes).
+    Calls that cannot be keyed run the function directly.
+    """
+    name = f"{func.__module__}.{func.__qualname__}@{_get_code_digest()}" # Changed code starts fresh
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        call_key = _call_key(name, args, kwargs)
+        if call_key is None:
+            return func(*args, **kwargs)
+        dataset_key, key = call_key
+        value = _read(dataset_key, key)
+        if value is not None:
+            try:
+                return pickle.loads(value)
+            except Exception as e: # Written by an incompatible library version
+                print(f"Aggregate cache entry of {func.__qualname__} ignored: {e}")
+        result = func(*args, **kwargs)
+        try:
+            value = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            print(f"Result of {func.__qualname__} not cached: {e}")
+            return result
+        _write(dataset_key, key, value)
+        return pickle.loads(value) # The caller's copy, so the cached result is never modified
+    return wrapper
+# -------------------------------------------------------------------------------
+def remove_dataset(dataset_key: str):
+    """
+    Deletes the cached results of a dataset version that is no longer needed.
+    """
+    with _memory_lock:
+        for key in [key for key, (owner, _) in _memory.items() if owner == dataset_key]:
+            del _memory[key]
+    if not os.path.exists(AGGREGATE_CACHE_PATH):
+        return
+    try:
+        connection = _connect()
+        try:
+            connection.execute("DELETE FROM aggregates WHERE dataset = ?", (dataset_key,))
+            connection.commit()
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        print(f"Aggregate cache cleanup failed: {e}")
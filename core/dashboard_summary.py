@@ -1,44 +1,80 @@
 import pandas as pd
 import core.dashboard_plot as dashboard_plot
+from core import aggregate_cache, data_schema, dataframe_backend
+
+# The numbers behind each summary are computed by a cached function (core.aggregate_cache,
+# kept across restarts); the figures are drawn from them on every call.
 
 # =================================================================================
-def get_violations_summary_of_last_n_days(df_last_n_days: pd.DataFrame) -> dict:
+@aggregate_cache.cached
+def summarize_violations_of_last_n_days(df_last_n_days: pd.DataFrame, sample=None) -> dict:
+    # (sample: a core.stratified_sample.Sample when df_last_n_days holds its sampled rows;
+    #  counts, sums and percentages are then estimated with confidence intervals)
     # 1. calculate the no of violations in last n days
-    total_no_of_violations = df_last_n_days.shape[0]
+    total_no_of_violations = sample.estimator(df_last_n_days).count() if sample else df_last_n_days.shape[0]
+
+    return {
+        'total_no_of_violations': total_no_of_violations,
+        'violation_counts': data_schema.count_values(df_last_n_days['Violation_Type'], sample.estimator(df_last_n_days).weights() if sample else None),
+    }
+
+def get_violations_summary_of_last_n_days(df_last_n_days: pd.DataFrame, sample=None) -> dict:
+    summary = summarize_violations_of_last_n_days(df_last_n_days, sample)
 
     # 2. Generate a figure of pie chart for violation types
-    fig = dashboard_plot.plot_violation_type_percentage_pie(df_last_n_days)
+    fig = dashboard_plot.plot_violation_type_percentage_pie(summary['violation_counts'])
     
     return {
-        'total_no_of_violations': total_no_of_violations,
+        'total_no_of_violations': summary['total_no_of_violations'],
         'fig': fig
     }
 
 # =================================================================================
-def get_total_fines_generated(df_last_n_days: pd.DataFrame) -> dict:
+@aggregate_cache.cached
+def summarize_total_fines(df_last_n_days: pd.DataFrame, sample=None) -> dict:
+    df_last_n_days = df_last_n_days.copy(deep=False) # The columns below are rewritten on a copy
     # 1. calculate total fines in last n days
-    total_fines = df_last_n_days['Fine_Amount'].sum()
-    avg_fine_per_violation = total_fines / df_last_n_days.shape[0] if df_last_n_days.shape[0] > 0 else 0
+    if sample:
+        estimator = sample.estimator(df_last_n_days)
+        total_fines = estimator.total('Fine_Amount')
+        avg_fine_per_violation = estimator.mean('Fine_Amount')
+    else:
+        total_fines = df_last_n_days['Fine_Amount'].sum()
+        avg_fine_per_violation = total_fines / df_last_n_days.shape[0] if df_last_n_days.shape[0] > 0 else 0
     # ==============================================================================
     # 2. Prepare data for fines based on violation type
     df_last_n_days['Fine_Amount'] = pd.to_numeric(df_last_n_days['Fine_Amount'], errors='coerce').fillna(0)
+    if sample:
+        df_last_n_days['Fine_Amount'] *= estimator.weights() # Sampled fines scaled up to estimated totals
+    # Fine_Paid is a boolean flag on typed datasets and 'Yes'/'No' text otherwise
     df_last_n_days['Fine_Paid'] = df_last_n_days['Fine_Paid'].astype(str).str.upper().str.strip()
-    summary = (df_last_n_days.groupby(['Violation_Type', 'Fine_Paid'])['Fine_Amount'].sum().unstack(fill_value=0))
-    summary = summary.rename(columns={'YES': 'Paid', 'NO': 'Unpaid'})
+    fines = dataframe_backend.aggregate(df_last_n_days, ['Violation_Type', 'Fine_Paid'], ['Fine_Amount'], ['sum'])
+    summary = fines.set_index(['Violation_Type', 'Fine_Paid'])['Fine_Amount_sum'].unstack(fill_value=0)
+    summary = summary.rename(columns={'YES': 'Paid', 'NO': 'Unpaid', 'TRUE': 'Paid', 'FALSE': 'Unpaid'})
+
+    return {
+        'total_fines': total_fines,
+        'avg_fine_per_violation': avg_fine_per_violation,
+        'summary': summary
+    }
+
+def get_total_fines_generated(df_last_n_days: pd.DataFrame, sample=None) -> dict:
+    fines = summarize_total_fines(df_last_n_days, sample)
     
     # 3. Generate a figure of fines based on violation type
-    fig = dashboard_plot.plot_fines_based_on_violation_type(summary)
+    fig = dashboard_plot.plot_fines_based_on_violation_type(fines['summary'])
     
     return {
-        'total_fines': total_fines,
-        'avg_fine_per_violation': avg_fine_per_violation,
+        'total_fines': fines['total_fines'],
+        'avg_fine_per_violation': fines['avg_fine_per_violation'],
         'fig': fig
     }
 
 # =================================================================================
-def get_violations_by_location(df_last_n_days: pd.DataFrame) -> dict:
-    # 1. No Of Violations for the location
-    location_based_violations = df_last_n_days['Location'].value_counts().reset_index()
+@aggregate_cache.cached
+def summarize_violations_by_location(df_last_n_days: pd.DataFrame, sample=None) -> dict:
+    # 1. No Of Violations for the location (estimated from the sampling weights with a sample)
+    location_based_violations = data_schema.count_values(df_last_n_days['Location'], sample.estimator(df_last_n_days).weights() if sample else None).reset_index()
     location_based_violations.columns = ['Location', 'No of Violations']
 
     # 2. Total No Of Violations
@@ -56,17 +92,27 @@ def get_violations_by_location(df_last_n_days: pd.DataFrame) -> dict:
     else:
         plot_data = location_based_violations
 
-    # 5. Plot pie chart for location based violations
-    fig = dashboard_plot.plot_violations_by_location(plot_data)
-    
     return {
         'total_locations': total_locations,
         'most_violated_location': most_violated_location,
+        'plot_data': plot_data
+    }
+
+def get_violations_by_location(df_last_n_days: pd.DataFrame, sample=None) -> dict:
+    locations = summarize_violations_by_location(df_last_n_days, sample)
+
+    # 5. Plot pie chart for location based violations
+    fig = dashboard_plot.plot_violations_by_location(locations['plot_data'])
+    
+    return {
+        'total_locations': locations['total_locations'],
+        'most_violated_location': locations['most_violated_location'],
         'fig': fig
     }
 
 # =================================================================================
-def get_license_insights(df_last_n_days: pd.DataFrame) -> dict:
+@aggregate_cache.cached
+def summarize_license_insights(df_last_n_days: pd.DataFrame, sample=None) -> dict:
     """
     Calculates insights related to License validity and type.
     """
@@ -82,17 +128,32 @@ def get_license_insights(df_last_n_days: pd.DataFrame) -> dict:
     # 2. Percentage of License Validity Expired
     expired_percentage = 0.0
     if 'License_Validity' in df_last_n_days.columns:
-        total_licenses = len(df_last_n_days)
-        expired_count = df_last_n_days[df_last_n_days['License_Validity'] == 'Expired'].shape[0]
-        expired_percentage = (expired_count / total_licenses) * 100 if total_licenses > 0 else 0
+        if sample:
+            expired_percentage = sample.estimator(df_last_n_days).percentage(df_last_n_days['License_Validity'] == 'Expired')
+        else:
+            total_licenses = len(df_last_n_days)
+            expired_count = df_last_n_days[df_last_n_days['License_Validity'] == 'Expired'].shape[0]
+            expired_percentage = (expired_count / total_licenses) * 100 if total_licenses > 0 else 0
 
-    # 3. Generate License Validity Pie Chart
-    validity_fig = dashboard_plot.plot_license_validity_by_gender(df_last_n_days)
+    # 3. License Validity by Gender counts
+    validity_gender = data_schema.count_table(df_last_n_days, 'License_Validity', 'Driver_Gender', sample.estimator(df_last_n_days).weights() if sample else None)
     
     return {
         'most_common_license_type': most_common_license_type,
-        'expired_percentage': round(expired_percentage, 2),
-        'validity_fig': validity_fig
+        'expired_percentage': expired_percentage if sample else round(expired_percentage, 2),
+        'validity_gender': validity_gender
+    }
+
+def get_license_insights(df_last_n_days: pd.DataFrame, sample=None) -> dict:
+    insights = summarize_license_insights(df_last_n_days, sample)
+    if not insights:
+        return {}
+
+    # Generate License Validity Pie Chart
+    return {
+        'most_common_license_type': insights['most_common_license_type'],
+        'expired_percentage': insights['expired_percentage'],
+        'validity_fig': dashboard_plot.plot_license_validity_by_gender(insights['validity_gender'])
     }
 
 
@@ -101,19 +162,26 @@ def get_license_insights(df_last_n_days: pd.DataFrame) -> dict:
 # =======================================================================================================================
 # =======================================================================================================================
 # =======================================================================================================================
-def get_global_overview_metrics(df: pd.DataFrame) -> dict:
+@aggregate_cache.cached
+def get_global_overview_metrics(df: pd.DataFrame, sample=None) -> dict:
     """
     Generates summary statistics for the Global Data Overview.
+    With a sample, df holds sampled rows: counts and the average fine are estimated, the
+    minimum and maximum fine are exact for whole years.
     """
     metrics = {}
-    metrics['total_violations'] = len(df)
+    estimator = sample.estimator(df) if sample else None
+    metrics['total_violations'] = estimator.count() if estimator else len(df)
     
     if 'Violation_Type' in df.columns:
         metrics['most_common_violation'] = df['Violation_Type'].mode()[0] if not df['Violation_Type'].mode().empty else "N/A"
     else:
         metrics['most_common_violation'] = "N/A"
     
-    if 'Fine_Amount' in df.columns:
+    if 'Fine_Amount' in df.columns and estimator:
+        metrics['avg_fine'] = estimator.mean('Fine_Amount')
+        metrics['min_fine'], metrics['max_fine'] = estimator.extremes('Fine_Amount')
+    elif 'Fine_Amount' in df.columns:
         metrics['avg_fine'] = df['Fine_Amount'].mean()
         metrics['max_fine'] = df['Fine_Amount'].max()
         metrics['min_fine'] = df['Fine_Amount'].min()
@@ -141,15 +209,18 @@ def get_global_overview_metrics(df: pd.DataFrame) -> dict:
 
 
 # =======================================================================================================================
-def get_behavioral_analysis(df: pd.DataFrame) -> dict:
+@aggregate_cache.cached
+def get_behavioral_analysis(df: pd.DataFrame, sample=None) -> dict:
     """
     Computes flags and returns aggregate counts/percentages for:
     - Over Speeding
     - High Fine (>90th percentile)
     - Repeat Offenders (>2 violations)
     - Bad Weather Risk
+    With a sample, df holds sampled rows and counts/percentages are estimates.
     """
     total_records = len(df)
+    estimator = sample.estimator(df) if sample and total_records else None
     analysis_results = {
         'total_count': total_records,
         'over_speeding_stats': (0, 0.0),
@@ -164,6 +235,8 @@ def get_behavioral_analysis(df: pd.DataFrame) -> dict:
 
     # Helper to calculate count and percentage
     def calculate_stats(boolean_mask):
+        if estimator:
+            return (estimator.count(boolean_mask), estimator.percentage(boolean_mask))
         count = boolean_mask.sum()
         percentage = (count / total_records) * 100
         return (count, percentage)
@@ -173,15 +246,11 @@ def get_behavioral_analysis(df: pd.DataFrame) -> dict:
 
     # 2. Court Appearance Required
     if 'Court_Appearance_Required' in df.columns:
-        analysis_results['court_appearance_stats'] = calculate_stats(df['Court_Appearance_Required'] == 'Yes')
+        analysis_results['court_appearance_stats'] = calculate_stats(data_schema.flag_mask(df['Court_Appearance_Required']))
 
     # 3. Repeat Offenders (Based on Comments == 'Repeat Offender')
     if 'Comments' in df.columns:
-        repeat_offender_counts = df[df['Comments'] == 'Repeat Offender'].value_counts().sum()
-        if len(df) > 0:
-            repeat_offender_pct = (repeat_offender_counts / len(df)) * 100
-
-        analysis_results['repeat_offender_stats'] = (repeat_offender_counts, repeat_offender_pct)
+        analysis_results['repeat_offender_stats'] = calculate_stats(df['Comments'] == 'Repeat Offender')
 
     if 'Weather_Condition' in df.columns:
         adverse_weather_conditions = {'fog', 'rain', 'snow', 'thunderstorm', 'hail', 'mist'}
@@ -194,9 +263,56 @@ def get_behavioral_analysis(df: pd.DataFrame) -> dict:
             weather_mode_result = df['Weather_Condition'].mode()
             if not weather_mode_result.empty:
                 tps_weather_name = weather_mode_result[0]
-                tps_weather_count = (df['Weather_Condition'] == tps_weather_name).sum()
-                analysis_results['most_frequent_weather_stats'] = (tps_weather_name, tps_weather_count, (tps_weather_count / total_records) * 100)
+                tps_weather_count, tps_weather_pct = calculate_stats(df['Weather_Condition'] == tps_weather_name)
+                analysis_results['most_frequent_weather_stats'] = (tps_weather_name, tps_weather_count, tps_weather_pct)
     return analysis_results
 
 
-# =======================================================================================================================
\ No newline at end of file
+# =======================================================================================================================
+
+
+# =======================================================================================================================
+@aggregate_cache.cached
+def get_vehicle_violation_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Violation counts by Violation Type (rows) and Vehicle Type (columns), both in the
+    order they first appear in df.
+    """
+    counts = df.groupby(['Violation_Type', 'Vehicle_Type'], observed=True).size().unstack(fill_value=0)
+    violation_order = [value for value in df['Violation_Type'].dropna().unique() if value in counts.index]
+    vehicle_order = [value for value in df['Vehicle_Type'].dropna().unique() if value in counts.columns]
+    counts = counts.loc[violation_order, vehicle_order]
+    counts.index, counts.columns = counts.index.astype(object), counts.columns.astype(object)
+    return counts
+
+
+# =======================================================================================================================
+@aggregate_cache.cached
+def get_severity_by_location(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mrunalini: Average Severity Score by Location (rows) and Violation Type (columns).
+    """
+    # Helper to calculate severity (Internal logic kept same, computed column-wise)
+    def calc_severity_score(frame):
+        overspeed = (frame['Recorded_Speed'] - frame['Speed_Limit']).clip(lower=0)
+        return (
+            (frame['Fine_Amount'] / 1000).fillna(0)
+            + frame['Penalty_Points'].fillna(0)
+            + (overspeed / 10).fillna(0)
+            + (frame['Alcohol_Level'] * 10).fillna(0)
+            + data_schema.flag_mask(frame['Helmet_Worn'], False) * 10
+            + data_schema.flag_mask(frame['Seatbelt_Worn'], False) * 10
+            + (frame['Traffic_Light_Status'] == 'Red') * 15
+            + (frame['Previous_Violations'] * 1.5).fillna(0)
+        )
+
+    # assign() returns a new frame, so the caller's DataFrame is left untouched
+    local_df = df.assign(Violation_Severity_Score=calc_severity_score(df))
+    
+    return local_df.pivot_table(
+        values='Violation_Severity_Score',
+        index='Location',
+        columns='Violation_Type',
+        aggfunc='mean',
+        observed=True
+    )
@@ -0,0 +1,149 @@
+import hashlib
+import os
+
+import pandas as pd
+import streamlit as st
+
+from core import data_schema
+
+# ====================================================================================
+# Persistent Columnar Dataset Cache
+# ====================================================================================
+# Every CSV is parsed once and stored as a Parquet file named after the hash of its
+# contents. Later loads (worker restart, st.cache_data eviction, another session) read
+# the Parquet file instead of parsing the text again. A file replaced in place gets a
+# new hash, so it can never be served from a stale cache entry. The cached file already
+# carries the compact dtypes from core.data_schema.
+#
+# Every Parquet file the app writes (this cache, the partitioned store, version parts,
+# quarantined rows) uses PARQUET_WRITE_OPTIONS: zstd compression with dictionary-encoded
+# columns, so the repeated category values of a violation dataset cost a few bits a row.
+# Datasets the app creates itself (generated data) are written as Parquet files from the
+# start; they are read and cached like a CSV, only without the text parsing.
+
+CACHE_DIR = ".dataset_cache"
+CACHE_FORMAT_VERSION = 5  # Bump when the cached layout changes to ignore old files
+HASH_BLOCK_SIZE = 1024 * 1024
+PARQUET_WRITE_OPTIONS = {'compression': 'zstd', 'use_dictionary': True}  # Keyword arguments of every Parquet write
+PARQUET_EXTENSION = ".parquet"  # Dataset files stored as Parquet (e.g. generated datasets) instead of CSV
+
+
+# -------------------------------------------------------------------------------
+def new_content_digest():
+    """
+    Returns an empty hash object of the kind used for dataset content hashes.
+    """
+    return hashlib.blake2b(digest_size=16)
+# -------------------------------------------------------------------------------
+@st.cache_data(show_spinner=False)
+def _hash_file_contents(path: str, size: int, mtime_ns: int) -> str:
+    """
+    Hashes the file contents. Size and modification time are only part of the
+    cache key, so an unchanged file is not re-read on every rerun.
+    """
+    digest = new_content_digest()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+# -------------------------------------------------------------------------------
+def get_file_hash(path: str) -> str:
+    """
+    Returns the content hash of a dataset file.
+    """
+    stat = os.stat(path)
+    return _hash_file_contents(path, stat.st_size, stat.st_mtime_ns)
+# -------------------------------------------------------------------------------
+def get_file_hashes(path: str, prefix_size: int) -> tuple:
+    """
+    Hashes a file and its first `prefix_size` bytes in a single pass, to tell whether a
+    file that changed was only appended to (the prefix hash equals its old content hash).
+
+    Returns:
+        tuple: (prefix hash or None if the file is shorter, content hash)
+    """
+    digest = new_content_digest()
+    prefix_hash = None
+    read = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            if read < prefix_size <= read + len(block):
+                digest.update(block[:prefix_size - read])
+                prefix_hash = digest.copy().hexdigest()
+                digest.update(block[prefix_size - read:])
+            else:
+                digest.update(block)
+            read += len(block)
+    if prefix_size == 0:
+        prefix_hash = new_content_digest().hexdigest()
+    return prefix_hash, digest.hexdigest()
+# -------------------------------------------------------------------------------
+def is_parquet_file(path: str) -> bool:
+    """
+    True if a dataset file is stored as Parquet rather than CSV.
+    """
+    return str(path).endswith(PARQUET_EXTENSION)
+# -------------------------------------------------------------------------------
+def read_source(path: str, **kwargs) -> pd.DataFrame:
+    """
+    Reads a dataset file as it is stored (CSV or Parquet), without the cache or schema.
+    Extra keyword arguments go to pd.read_parquet / pd.read_csv.
+    """
+    if is_parquet_file(path):
+        return pd.read_parquet(path, **kwargs)
+    return pd.read_csv(path, **kwargs)
+# -------------------------------------------------------------------------------
+def get_cache_path(content_hash: str) -> str:
+    """
+    Returns the Parquet cache location for a given content hash.
+    """
+    return os.path.join(CACHE_DIR, f"{content_hash}.v{CACHE_FORMAT_VERSION}.parquet")
+# -------------------------------------------------------------------------------
+def remove_cache(content_hash: str):
+    """
+    Deletes the cache file of a dataset version that is no longer needed.
+    """
+    try:
+        os.remove(get_cache_path(content_hash))
+    except FileNotFoundError:
+        pass
+# -------------------------------------------------------------------------------
+def write_cache(df: pd.DataFrame, cache_path: str) -> bool:
+    """
+    Writes the DataFrame to the cache atomically (temp file + rename), so a
+    concurrent reader never sees a half written file.
+
+    Returns:
+        bool: True if the cache file was written.
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp_path, index=False, **PARQUET_WRITE_OPTIONS)
+        os.replace(tmp_path, cache_path)
+        return True
+    except Exception as e:
+        # e.g. object columns mixing numbers and text cannot be stored by Arrow
+        print(f"Dataset cache write skipped for {cache_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+# -------------------------------------------------------------------------------
+def load_dataset(path: str, content_hash: str = None) -> pd.DataFrame:
+    """
+    Loads a dataset file (CSV or Parquet) through the columnar cache.
+
+    Args:
+        path (str): Path of the dataset file.
+        content_hash (str): Hash of the file, if the caller already computed it.
+
+    Returns:
+        pd.DataFrame: The loaded dataset.
+    """
+    cache_path = get_cache_path(content_hash or get_file_hash(path))
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    df = data_schema.apply_traffic_schema(read_source(path))
+    write_cache(df, cache_path)
+    return df
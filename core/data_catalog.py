@@ -0,0 +1,306 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+from core import data_cache, data_ingest
+from core.data_variables import TRAFFIC_VIOLATION_COLUMNS
+
+# ====================================================================================
+# Persistent Dataset Catalog
+# ====================================================================================
+# SQLite index of every dataset file (CSV, or Parquet for generated data) the app knows about: path, content hash, row count,
+# schema, Date range, unparseable Date/Time row counts and whether it holds all traffic
+# violation columns. Pages read the catalog instead of walking the dataset folders and
+# parsing files on every rerun.
+# A refresh only stats the known directories; folders are re-listed, and files are
+# re-scanned, only when their modification time changed. A file that was only appended
+# to (its old bytes hash to its old content hash) has just the new rows scanned.
+
+CATALOG_PATH = os.path.join(data_cache.CACHE_DIR, "catalog.sqlite3")
+CATALOG_SCHEMA_VERSION = 3  # Bump when the tables change to rebuild the catalog
+
+# (source, folder, nested) - nested folders hold one sub-folder level (date folders)
+DATASET_SOURCES = [
+    ("sample", "dataset", False),
+    ("generated", "generated_fake_traffic_datasets", True),
+    ("related", "uploded_file_relateds", False),
+    ("other", "uploded_file_others", False),
+    ("legacy", "uploaded_datasets", True),
+]
+DATASET_EXTENSIONS = (".csv", data_cache.PARQUET_EXTENSION)
+
+
+# -------------------------------------------------------------------------------
+def _connect() -> sqlite3.Connection:
+    """
+    Opens the catalog database, creating (or rebuilding) its tables when needed.
+    """
+    os.makedirs(os.path.dirname(CATALOG_PATH), exist_ok=True)
+    conn = sqlite3.connect(CATALOG_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != CATALOG_SCHEMA_VERSION:
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS datasets")
+            conn.execute("DROP TABLE IF EXISTS folders")
+            conn.execute("""
+                CREATE TABLE datasets (
+                    path TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    previous_hash TEXT,
+                    appended_from INTEGER,
+                    row_count INTEGER,
+                    columns TEXT NOT NULL,
+                    types TEXT NOT NULL,
+                    min_date TEXT,
+                    max_date TEXT,
+                    unparseable TEXT NOT NULL,
+                    is_traffic INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE TABLE folders (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL)")
+            conn.execute(f"PRAGMA user_version = {CATALOG_SCHEMA_VERSION}")
+    return conn
+# -------------------------------------------------------------------------------
+def _mtime_ns(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+# -------------------------------------------------------------------------------
+def _list_folders() -> dict:
+    """
+    Lists every folder that can hold datasets, mapped to its modification time.
+    """
+    folders = {}
+    for _, directory, nested in DATASET_SOURCES:
+        if not os.path.isdir(directory):
+            continue
+        folders[directory] = _mtime_ns(directory)
+        if nested:
+            for name in os.listdir(directory):
+                sub_dir = os.path.join(directory, name)
+                if os.path.isdir(sub_dir):
+                    folders[sub_dir] = _mtime_ns(sub_dir)
+    return folders
+# -------------------------------------------------------------------------------
+def _list_dataset_files() -> list:
+    """
+    Returns (source, folder, file_name, path) for every dataset file in the dataset folders.
+    """
+    files = []
+    for source, directory, nested in DATASET_SOURCES:
+        if not os.path.isdir(directory):
+            continue
+        sub_dirs = [(directory, "")]
+        if nested:
+            sub_dirs = [
+                (os.path.join(directory, name), name)
+                for name in os.listdir(directory)
+                if os.path.isdir(os.path.join(directory, name))
+            ]
+        for sub_dir, folder in sub_dirs:
+            for file_name in os.listdir(sub_dir):
+                if file_name.endswith(DATASET_EXTENSIONS):
+                    files.append((source, folder, file_name, os.path.join(sub_dir, file_name)))
+    return files
+# -------------------------------------------------------------------------------
+def _find_source(path: str):
+    """
+    Returns (source, folder) of a dataset file path inside the dataset folders, or None.
+    """
+    parts = os.path.normpath(path).split(os.sep)
+    for source, directory, nested in DATASET_SOURCES:
+        if parts[0] != directory:
+            continue
+        if nested and len(parts) == 3:
+            return source, parts[1]
+        if not nested and len(parts) == 2:
+            return source, ""
+    return None
+# -------------------------------------------------------------------------------
+def _scan_appended(path: str, previous: sqlite3.Row, size: int):
+    """
+    If the file only grew since `previous` was scanned, scans just the new rows and
+    returns (content hash, scan of the whole file); otherwise returns None.
+    """
+    if previous is None or previous['row_count'] is None or not 0 < previous['size'] < size:
+        return None
+    if data_cache.is_parquet_file(path):
+        return None # Always written whole
+    prefix_hash, content_hash = data_cache.get_file_hashes(path, previous['size'])
+    if prefix_hash != previous['content_hash'] or not data_ingest.is_row_boundary(path, previous['size']):
+        return None # Rewritten, or the old last row was incomplete
+    tail = data_ingest.scan_csv(path, start=previous['size'])
+    old_unparseable = json.loads(previous['unparseable'])
+    dates = [date for date in (previous['min_date'], previous['max_date'], tail['min_date'], tail['max_date']) if date]
+    return content_hash, {
+        'columns': json.loads(previous['columns']),
+        'types': json.loads(previous['types']),
+        'row_count': previous['row_count'] + tail['row_count'],
+        'min_date': min(dates) if dates else None,
+        'max_date': max(dates) if dates else None,
+        'unparseable': {col: old_unparseable.get(col, 0) + rows for col, rows in tail['unparseable'].items()},
+    }
+# -------------------------------------------------------------------------------
+def _describe_file(path: str, previous: sqlite3.Row = None) -> dict:
+    """
+    Scans one dataset file for its catalog entry. Unreadable files are kept with an empty schema.
+    Given the file's previous entry, a file that was only appended to is scanned from
+    the old end; 'appended_from' then holds the old size (otherwise None) and
+    'previous_hash' the content hash of the version it replaces.
+    """
+    stat = os.stat(path)
+    appended_from = None
+    try:
+        appended = _scan_appended(path, previous, stat.st_size)
+        if appended is not None:
+            content_hash, scan = appended
+            appended_from = previous['size']
+        else:
+            content_hash, scan = data_cache.get_file_hash(path), data_ingest.scan_file(path)
+    except Exception as e:
+        print(f"Catalog scan failed for {path}: {e}")
+        content_hash = data_cache.get_file_hash(path)
+        scan = {'columns': [], 'types': [], 'row_count': None, 'min_date': None, 'max_date': None, 'unparseable': {}}
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'content_hash': content_hash,
+        'previous_hash': previous['content_hash'] if previous is not None else None,
+        'appended_from': appended_from,
+        'row_count': scan['row_count'],
+        'columns': json.dumps(scan['columns']),
+        'types': json.dumps(scan['types']),
+        'min_date': scan['min_date'],
+        'max_date': scan['max_date'],
+        'unparseable': json.dumps(scan['unparseable']),
+        'is_traffic': int(set(TRAFFIC_VIOLATION_COLUMNS).issubset(scan['columns'])),
+    }
+# -------------------------------------------------------------------------------
+def _upsert(conn: sqlite3.Connection, source: str, folder: str, file_name: str, path: str, previous: sqlite3.Row = None):
+    entry = _describe_file(path, previous)
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO datasets
+            (path, source, folder, file_name, size, mtime_ns, content_hash, previous_hash, appended_from,
+             row_count, columns, types, min_date, max_date, unparseable, is_traffic)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (path, source, folder, file_name, entry['size'], entry['mtime_ns'], entry['content_hash'],
+         entry['previous_hash'], entry['appended_from'], entry['row_count'], entry['columns'], entry['types'], entry['min_date'], entry['max_date'],
+         entry['unparseable'], entry['is_traffic']),
+    )
+# -------------------------------------------------------------------------------
+def _to_dict(row: sqlite3.Row) -> dict:
+    entry = dict(row)
+    entry['columns'] = json.loads(entry['columns'])
+    entry['types'] = json.loads(entry['types'])
+    entry['unparseable'] = json.loads(entry['unparseable'])
+    entry['is_traffic'] = bool(entry['is_traffic'])
+    return entry
+
+
+# ==================================================================================
+# Public API
+# ==================================================================================
+def refresh_catalog(force: bool = False) -> bool:
+    """
+    Brings the catalog up to date with the dataset folders.
+
+    Args:
+        force (bool): Re-list every folder even if no folder changed.
+
+    Returns:
+        bool: True if the folders were re-listed.
+    """
+    with closing(_connect()) as conn, conn:
+        known_folders = {row['path']: row['mtime_ns'] for row in conn.execute("SELECT path, mtime_ns FROM folders")}
+        top_folders = {directory: _mtime_ns(directory) for _, directory, _ in DATASET_SOURCES if os.path.isdir(directory)}
+        unchanged = all(known_folders.get(path) == mtime for path, mtime in top_folders.items()) and all(
+            _mtime_ns(path) == mtime for path, mtime in known_folders.items()
+        )
+        if unchanged and not force:
+            return False
+
+        known_files = {row['path']: row for row in conn.execute("SELECT * FROM datasets")}
+        current_paths = set()
+        for source, folder, file_name, path in _list_dataset_files():
+            current_paths.add(path)
+            stat = os.stat(path)
+            known = known_files.get(path)
+            if known is None or (known['size'], known['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                _upsert(conn, source, folder, file_name, path, known)
+
+        conn.executemany("DELETE FROM datasets WHERE path = ?", [(path,) for path in set(known_files) - current_paths])
+        conn.execute("DELETE FROM folders")
+        conn.executemany("INSERT INTO folders (path, mtime_ns) VALUES (?, ?)", _list_folders().items())
+    return True
+# -------------------------------------------------------------------------------
+def list_datasets(source: str = None) -> list:
+    """
+    Returns catalog entries (dicts), optionally only those of one source.
+    Entries are ordered by source (as in DATASET_SOURCES), newest date folder first, then file name.
+    """
+    with closing(_connect()) as conn, conn:
+        if source is None:
+            rows = conn.execute("SELECT * FROM datasets").fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM datasets WHERE source = ?", (source,)).fetchall()
+    entries = [_to_dict(row) for row in rows]
+
+    source_order = [source for source, _, _ in DATASET_SOURCES]
+    entries.sort(key=lambda entry: entry['file_name'])
+    entries.sort(key=lambda entry: entry['folder'], reverse=True) # Stable: file name order is kept per folder
+    entries.sort(key=lambda entry: source_order.index(entry['source']))
+    return entries
+# -------------------------------------------------------------------------------
+def get_dataset(path: str) -> dict:
+    """
+    Returns the catalog entry of one dataset, re-scanning it first if the file changed
+    in place since it was catalogued. Returns None for unknown paths.
+    """
+    with closing(_connect()) as conn, conn:
+        row = conn.execute("SELECT * FROM datasets WHERE path = ?", (path,)).fetchone()
+        if row is None or not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        if (row['size'], row['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+            _upsert(conn, row['source'], row['folder'], row['file_name'], path, row)
+            row = conn.execute("SELECT * FROM datasets WHERE path = ?", (path,)).fetchone()
+    return _to_dict(row)
+# -------------------------------------------------------------------------------
+def refresh_dataset(path: str) -> tuple:
+    """
+    Brings the catalog entry of one file up to date after it was created, changed or
+    removed (used by core.dataset_watcher, so no folder has to be re-listed).
+
+    Args:
+        path (str): CSV path relative to the app folder.
+
+    Returns:
+        tuple: (entry, previous) - the current and the replaced catalog entry, each None
+               when the file is not (or was not) catalogued. An unchanged file returns
+               the same entry twice.
+    """
+    path = os.path.normpath(path)
+    located = _find_source(path)
+    with closing(_connect()) as conn, conn:
+        row = conn.execute("SELECT * FROM datasets WHERE path = ?", (path,)).fetchone()
+        previous = _to_dict(row) if row is not None else None
+        if located is None or not os.path.isfile(path):
+            conn.execute("DELETE FROM datasets WHERE path = ?", (path,))
+            return None, previous
+        stat = os.stat(path)
+        if row is not None and (row['size'], row['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            return previous, previous
+
+        source, folder = located
+        _upsert(conn, source, folder, os.path.basename(path), path, row)
+        entry = _to_dict(conn.execute("SELECT * FROM datasets WHERE path = ?", (path,)).fetchone())
+    return entry, previous
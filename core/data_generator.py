@@ -14,7 +14,11 @@ from core.data_variables import (
     issuing_agencies_list,
     license_validity_list,
     breathalyzer_results_list,
-    comments_list
+    traffic_light_status_list,
+    comments_list,
+    driver_age_range,
+    speed_limit_range,
+    recorded_speed_range
 )
 
 from core.data_variables import (
@@ -54,7 +58,7 @@ def generate_record(idx, date: datetime.date):
     helmet_worn = helmet_worn_mapping.get(vehicle_type, "NA")
     seatbelt_worn = seatbelt_worn_mapping.get(vehicle_type, "NA")
 
-    driver_age = random.randint(18, 80)
+    driver_age = random.randint(*driver_age_range)
     driver_gender = random.choice(driver_genders_list)
 
     number_of_passengers = no_of_passengers_mapping.get(vehicle_type, random.randint(0, 50))
@@ -68,10 +72,10 @@ def generate_record(idx, date: datetime.date):
     issuing_agency = random.choice(issuing_agencies_list)
     license_validity = random.choice(license_validity_list)
     
-    traffic_light_status = random.choice(["Red", "Green", "Yellow"])
+    traffic_light_status = random.choice(traffic_light_status_list)
     
-    speed_limit = random.randint(20, 120)
-    recorded_speed = random.randint(0, 200)
+    speed_limit = random.randint(*speed_limit_range)
+    recorded_speed = random.randint(*recorded_speed_range)
     
     breathalyzer_result = random.choice(breathalyzer_results_list)
     alcohol_level = alcohol_levels_mapping.get(breathalyzer_result, 0.00)
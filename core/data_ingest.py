@@ -0,0 +1,579 @@
+import io
+import os
+import re
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from core import data_cache, data_schema, data_validation, record_index
+from core.data_variables import TRAFFIC_VIOLATION_COLUMNS
+
+# ====================================================================================
+# Streaming CSV Ingest
+# ====================================================================================
+# Large CSV files are parsed block by block with Arrow's multithreaded CSV reader
+# instead of one pd.read_csv call on the whole file. For uploads, each block is typed
+# with core.data_schema and appended to the Parquet cache straight away, so memory stays
+# bounded by the block size no matter how large the file is.
+#
+# Only traffic violation datasets (a header holding every TRAFFIC_VIOLATION_COLUMNS
+# column) are parsed with the fixed KNOWN_COLUMN_TYPES, and each of their blocks is
+# checked against them on the way. Any other CSV is typed like pd.read_csv would: from
+# the data, with a column widened (int -> float, else text) when a later block does not
+# fit the type inferred from the first one.
+#
+# Parquet dataset files (data_cache.is_parquet_file) go through the same paths, read as
+# PARQUET_BLOCK_ROWS-row record batches instead of parsed text.
+
+INGEST_BLOCK_SIZE = 64 * 1024 * 1024  # Bytes of CSV text parsed per block
+COPY_BLOCK_SIZE = data_cache.HASH_BLOCK_SIZE
+PARQUET_BLOCK_ROWS = 1_000_000  # Rows read per block from a Parquet dataset file
+
+# Traffic columns get fixed types in traffic datasets, so every block is parsed the same way
+KNOWN_COLUMN_TYPES = {col: pa.string() for col in TRAFFIC_VIOLATION_COLUMNS}
+KNOWN_COLUMN_TYPES.update({col: pa.int64() for col in data_schema.INTEGER_COLUMNS})
+KNOWN_COLUMN_TYPES['Alcohol_Level'] = pa.float64()
+CONVERSION_ERROR_COLUMN = re.compile(r"CSV column #(\d+)")  # Column named by Arrow's conversion errors
+
+
+# -------------------------------------------------------------------------------
+class _CsvSection(io.RawIOBase):
+    """
+    Reads the header line of a CSV file followed by its bytes [start, end), so rows
+    appended to a file can be parsed without reading the rows before them.
+    """
+    def __init__(self, path: str, start: int, end: int):
+        self._file = open(path, "rb")
+        header = self._file.readline()
+        self._pending = header if start > 0 else b""
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._pending:
+            size = min(len(buffer), len(self._pending))
+            buffer[:size] = self._pending[:size]
+            self._pending = self._pending[size:]
+            return size
+        data = self._file.read(min(len(buffer), self._remaining))
+        self._remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+# -------------------------------------------------------------------------------
+def complete_length(path: str) -> int:
+    """
+    Returns the size of a file up to and including its last line break, so a row that
+    is still being written is never read half finished. Parquet files are only ever
+    written whole, so their full size is returned.
+    """
+    size = os.path.getsize(path)
+    if data_cache.is_parquet_file(path):
+        return size
+    with open(path, "rb") as f:
+        end = size
+        while end > 0:
+            start = max(end - COPY_BLOCK_SIZE, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+# -------------------------------------------------------------------------------
+def is_row_boundary(path: str, offset: int) -> bool:
+    """
+    True if the bytes of a file before `offset` end with a complete line.
+    """
+    if offset <= 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+# -------------------------------------------------------------------------------
+def _open_section(path: str, start: int = 0, end: int = None):
+    """
+    Opens the header plus bytes [start, end) of a CSV file as an Arrow input stream.
+    """
+    end = os.path.getsize(path) if end is None else end
+    return pa.PythonFile(io.BufferedReader(_CsvSection(path, start, end)), mode="r")
+# -------------------------------------------------------------------------------
+def _open_stream(source):
+    """
+    Returns a readable stream positioned at the start of a path or file-like object.
+    """
+    if isinstance(source, str):
+        return pa.OSFile(source, "rb")
+    source.seek(0)
+    return source
+# -------------------------------------------------------------------------------
+def _stream_size(source) -> int:
+    """
+    Returns the size in bytes of a path or file-like object.
+    """
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    source.seek(0, os.SEEK_END)
+    return source.tell()
+# -------------------------------------------------------------------------------
+def _open_reader(source, start: int = 0, end: int = None, column_types: dict = None):
+    """
+    Opens a streaming CSV reader over `source`, or over the rows in bytes [start, end)
+    of a CSV path (start and end on line boundaries).
+
+    Columns not in `column_types` are typed from the first block. Like pd.read_csv, dates
+    and times are kept as text, and columns that are empty in the first block are read as
+    text so later blocks cannot fail on them.
+
+    Returns:
+        tuple: (reader, stream) - close the stream when done.
+    """
+    read_options = pacsv.ReadOptions(block_size=INGEST_BLOCK_SIZE, use_threads=True)
+
+    def convert_options(extra_types):
+        return pacsv.ConvertOptions(
+            column_types={**(column_types or {}), **extra_types},
+            strings_can_be_null=True,
+            true_values=['True', 'TRUE', 'true'],
+            false_values=['False', 'FALSE', 'false'],
+        )
+
+    def open_stream():
+        if start == 0 and end is None:
+            return _open_stream(source)
+        return _open_section(source, start, end)
+
+    stream = open_stream()
+    reader = pacsv.open_csv(stream, read_options=read_options, convert_options=convert_options({}))
+    text_columns = {
+        field.name: pa.string()
+        for field in reader.schema
+        if pa.types.is_temporal(field.type) or pa.types.is_null(field.type)
+    }
+    if not text_columns:
+        return reader, stream
+
+    if isinstance(source, str):
+        stream.close()
+    stream = open_stream()
+    reader = pacsv.open_csv(stream, read_options=read_options, convert_options=convert_options(text_columns))
+    return reader, stream
+# -------------------------------------------------------------------------------
+def _widened_types(schema: pa.Schema, column_types: dict, error: pa.ArrowInvalid) -> dict:
+    """
+    Returns the column types to retry a read with after a block did not fit the types
+    inferred from the first block: the failing column as float (if it was an integer
+    column) or text, or every column as text when the error names no column.
+    Returns None if there is nothing left to widen.
+    """
+    match = CONVERSION_ERROR_COLUMN.search(str(error))
+    if match is None or int(match.group(1)) >= len(schema):
+        widened = {field.name: pa.string() for field in schema}
+        return None if widened == column_types else widened
+    field = schema.field(int(match.group(1)))
+    if column_types.get(field.name) == pa.string():
+        return None
+    widened_type = pa.float64() if pa.types.is_integer(field.type) else pa.string()
+    return {**column_types, field.name: widened_type}
+# -------------------------------------------------------------------------------
+def traffic_column_types(path: str) -> dict:
+    """
+    Returns KNOWN_COLUMN_TYPES if the CSV file is a traffic violation dataset (its header
+    holds every TRAFFIC_VIOLATION_COLUMNS column), else None (types are inferred).
+    """
+    with open(path, "rb") as f:
+        header = f.readline().decode("utf-8", errors="replace")
+    columns = {col.strip().strip('"') for col in header.rstrip("\r\n").split(",")}
+    return KNOWN_COLUMN_TYPES if set(TRAFFIC_VIOLATION_COLUMNS).issubset(columns) else None
+# -------------------------------------------------------------------------------
+def _typed_blocks(reader, column_types: dict):
+    """
+    Yields the blocks of a reader as DataFrames. With fixed column types (a traffic
+    dataset), a block holding a value that does not fit its column's type stops the
+    read with the rows it covers.
+    """
+    rows = 0
+    while True:
+        try:
+            batch = reader.read_next_batch()
+        except StopIteration:
+            return
+        except pa.ArrowInvalid as e:
+            if column_types:
+                raise ValueError(f"Rows after {rows:,} do not match the traffic violation columns: {e}") from e
+            raise
+        rows += batch.num_rows
+        yield batch.to_pandas()
+# -------------------------------------------------------------------------------
+def _report(progress_callback, fraction: float, text: str):
+    if progress_callback is not None:
+        progress_callback(min(max(fraction, 0.0), 1.0), text)
+
+
+# ==================================================================================
+# Reading
+# ==================================================================================
+def read_csv(source, progress_callback=None) -> pd.DataFrame:
+    """
+    Reads a whole CSV file with the multithreaded block reader. Column types are inferred
+    from the data; a column a later block does not fit is widened and the file read again.
+
+    Args:
+        source: Path or file-like object (e.g. a Streamlit UploadedFile).
+        progress_callback (callable): Optional fn(fraction, text) called after each block.
+
+    Returns:
+        pd.DataFrame: The parsed data, with the column types pd.read_csv would give.
+    """
+    total_size = _stream_size(source) or 1
+    column_types = {}
+    while True:
+        reader, stream = _open_reader(source, column_types=column_types)
+        frames = []
+        rows = 0
+        try:
+            for frame in _typed_blocks(reader, None):
+                frames.append(frame)
+                rows += len(frame)
+                _report(progress_callback, stream.tell() / total_size, f"Parsed {rows:,} rows")
+            break
+        except pa.ArrowInvalid as e:
+            column_types = _widened_types(reader.schema, column_types, e)
+            if column_types is None:
+                raise
+        finally:
+            reader.close()
+            if isinstance(source, str):
+                stream.close()
+
+    if not frames:
+        return reader.schema.empty_table().to_pandas()
+    return pd.concat(frames, ignore_index=True)
+# -------------------------------------------------------------------------------
+def iter_csv_blocks(path: str, start: int = 0, end: int = None):
+    """
+    Yields a CSV file as a sequence of DataFrames, one per parsed block. Traffic violation
+    datasets use KNOWN_COLUMN_TYPES (see traffic_column_types), other files the types of
+    their first block. Only one block is held in memory at a time.
+
+    Args:
+        path (str): CSV file.
+        start, end (int): Optional byte range of the rows to read (on line boundaries,
+                          e.g. from complete_length); the header is always used.
+    """
+    column_types = traffic_column_types(path)
+    reader, stream = _open_reader(path, start, end, column_types)
+    with stream:
+        yield from _typed_blocks(reader, column_types)
+# -------------------------------------------------------------------------------
+def _parquet_blocks(path: str):
+    """
+    Yields (DataFrame, fraction of the file read) for each PARQUET_BLOCK_ROWS-row
+    record batch of a Parquet dataset file.
+    """
+    parquet_file = pq.ParquetFile(path)
+    total_rows = parquet_file.metadata.num_rows or 1
+    rows = 0
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BLOCK_ROWS):
+        rows += batch.num_rows
+        yield batch.to_pandas(), rows / total_rows
+# -------------------------------------------------------------------------------
+def iter_blocks(path: str, start: int = 0, end: int = None):
+    """
+    Same as iter_csv_blocks for any dataset file: a Parquet file is yielded as its
+    record batches (always whole, as it is never appended to in place).
+    """
+    if data_cache.is_parquet_file(path):
+        for block, _ in _parquet_blocks(path):
+            yield block
+    else:
+        yield from iter_csv_blocks(path, start, end)
+
+
+# ==================================================================================
+# Upload Ingest
+# ==================================================================================
+def save_upload(uploaded_file, file_path: str, progress_callback=None) -> str:
+    """
+    Copies an uploaded file to disk in fixed-size blocks, hashing it on the way.
+
+    Args:
+        uploaded_file: File-like object to save.
+        file_path (str): Destination path.
+        progress_callback (callable): Optional fn(fraction, text).
+
+    Returns:
+        str: Content hash of the saved file (same as data_cache.get_file_hash).
+    """
+    total_size = _stream_size(uploaded_file) or 1
+    uploaded_file.seek(0)
+    digest = data_cache.new_content_digest()
+    copied = 0
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for block in iter(lambda: uploaded_file.read(COPY_BLOCK_SIZE), b""):
+                f.write(block)
+                digest.update(block)
+                copied += len(block)
+                _report(progress_callback, copied / total_size, f"Saved {copied / 1024 / 1024:,.1f} MB")
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        uploaded_file.seek(0)
+    return digest.hexdigest()
+# -------------------------------------------------------------------------------
+def build_cache(path: str, content_hash: str, progress_callback=None) -> bool:
+    """
+    Streams a CSV (or Parquet) dataset file into the Parquet dataset cache, one typed
+    block at a time.
+
+    Traffic violation datasets are parsed with KNOWN_COLUMN_TYPES, other files with the
+    types of their first block. If a later block does not fit them (e.g. a Yes/No column
+    gets another value), the cache is skipped and data_cache.load_dataset builds it from
+    the whole file on first load instead. Each block is checked against
+    the validation rules (core.data_validation) on the way, and the record index
+    (ID -> rows) is built from the cached ID columns right after.
+
+    Returns:
+        bool: True if the cache file was written.
+    """
+    cache_path = data_cache.get_cache_path(content_hash)
+    if os.path.exists(cache_path):
+        return True
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}-{threading.get_ident()}.tmp" # Uploads and the dataset watcher may build at once
+    writer = None
+    rows = 0
+    validation = data_validation.ValidationRun(content_hash)
+    try:
+        for block, fraction in _file_blocks(path):
+            chunk = data_schema.apply_traffic_schema(block)
+            validation.add(chunk)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, **data_cache.PARQUET_WRITE_OPTIONS)
+            else:
+                table = table.cast(writer.schema) # Raises if the block does not fit the first block's types
+            writer.write_table(table)
+            rows += len(chunk)
+            _report(progress_callback, fraction, f"Indexed {rows:,} rows")
+
+        validation.finish()
+        if writer is None: # Header only
+            return data_cache.write_cache(data_cache.read_source(path), cache_path)
+        writer.close()
+        writer = None
+        os.replace(tmp_path, cache_path)
+        _build_record_index(cache_path, content_hash)
+        return True
+    except Exception as e:
+        print(f"Streaming cache build skipped for {path}: {e}")
+        return False
+    finally:
+        validation.abort()
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+# -------------------------------------------------------------------------------
+def _file_blocks(path: str):
+    """
+    Yields (DataFrame, fraction of the file read) for each block of a dataset file.
+    """
+    if data_cache.is_parquet_file(path):
+        yield from _parquet_blocks(path)
+        return
+    total_size = os.path.getsize(path) or 1
+    column_types = traffic_column_types(path)
+    reader, stream = _open_reader(path, column_types=column_types)
+    with stream:
+        for block in _typed_blocks(reader, column_types):
+            yield block, stream.tell() / total_size
+# -------------------------------------------------------------------------------
+def _build_record_index(cache_path: str, content_hash: str):
+    """
+    Builds the record index (ID -> rows) of a cached dataset from its ID columns.
+    """
+    id_columns = [col for col in data_schema.ID_COLUMNS if col in pq.read_schema(cache_path).names]
+    if id_columns:
+        record_index.build_index(content_hash, pd.read_parquet(cache_path, columns=id_columns))
+# -------------------------------------------------------------------------------
+def extend_cache(path: str, old_hash: str, content_hash: str, old_size: int) -> bool:
+    """
+    Builds the cache of a CSV file that was appended to from the cache of its previous
+    version: the old row groups are copied as they are and only the rows after
+    `old_size` are parsed (and validated on top of the old version's validation report).
+    Falls back to build_cache when there is no old cache, the old
+    version did not end with a complete row, or the new rows do not fit the cached types.
+
+    Args:
+        path (str): CSV file.
+        old_hash (str): Content hash of the file's first `old_size` bytes (previous version).
+        content_hash (str): Content hash of the whole file.
+        old_size (int): Size of the previous version in bytes.
+
+    Returns:
+        bool: True if the cache file was written.
+    """
+    cache_path = data_cache.get_cache_path(content_hash)
+    old_cache_path = data_cache.get_cache_path(old_hash)
+    if os.path.exists(cache_path):
+        return True
+    if not is_row_boundary(path, old_size) or not os.path.exists(old_cache_path):
+        return build_cache(path, content_hash)
+
+    tmp_path = f"{cache_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    validation = None
+    try:
+        data_validation.validate_cached(old_hash)
+        validation = data_validation.ValidationRun(content_hash, base_hash=old_hash)
+        old_file = pq.ParquetFile(old_cache_path)
+        with pq.ParquetWriter(tmp_path, old_file.schema_arrow, **data_cache.PARQUET_WRITE_OPTIONS) as writer:
+            for i in range(old_file.num_row_groups):
+                writer.write_table(old_file.read_row_group(i))
+            for block in iter_csv_blocks(path, start=old_size):
+                block = data_schema.apply_traffic_schema(block)
+                validation.add(block)
+                table = pa.Table.from_pandas(block, preserve_index=False)
+                writer.write_table(table.cast(writer.schema)) # Raises if the new rows do not fit the cached types
+        validation.finish()
+        os.replace(tmp_path, cache_path)
+        _build_record_index(cache_path, content_hash)
+        return True
+    except Exception as e:
+        print(f"Incremental cache update skipped for {path}, rebuilding: {e}")
+        return build_cache(path, content_hash)
+    finally:
+        if validation is not None:
+            validation.abort()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+# -------------------------------------------------------------------------------
+def ingest_upload(uploaded_file, file_path: str, progress_callback=None) -> bool:
+    """
+    Saves an uploaded CSV and builds its columnar cache without ever holding the
+    whole file as a DataFrame.
+
+    Args:
+        uploaded_file: File-like object to save.
+        file_path (str): Destination path of the CSV.
+        progress_callback (callable): Optional fn(fraction, text) for a progress bar.
+
+    Returns:
+        bool: True if the columnar cache was built.
+    """
+    def phase(start, end):
+        if progress_callback is None:
+            return None
+        return lambda fraction, text: progress_callback(start + (end - start) * fraction, text)
+
+    content_hash = save_upload(uploaded_file, file_path, phase(0.0, 0.2))
+    return build_cache(file_path, content_hash, phase(0.2, 1.0))
+
+
+# ==================================================================================
+# Metadata Scan
+# ==================================================================================
+def scan_csv(path: str, start: int = 0) -> dict:
+    """
+    Collects a CSV file's schema, row count, Date range and unparseable Date/Time rows
+    in one streaming pass, reading only the 'Date' and 'Time' columns after the first block.
+
+    Args:
+        path (str): CSV file.
+        start (int): Optional byte offset (on a line boundary) to scan only the rows
+                     appended after it, e.g. the file's size when it was last scanned.
+
+    Returns:
+        dict: columns (list), types (list of Arrow type names), row_count (int),
+              min_date / max_date (ISO date strings or None),
+              unparseable (dict of column -> number of rows that could not be parsed).
+    """
+    reader, stream = _open_reader(path, start, column_types=traffic_column_types(path))
+    stream.close()
+    columns = reader.schema.names
+    types = [str(field.type) for field in reader.schema]
+
+    temporal_formats = _temporal_formats(columns)
+    read_options = pacsv.ReadOptions(block_size=INGEST_BLOCK_SIZE, use_threads=True)
+    convert_options = pacsv.ConvertOptions(
+        include_columns=list(temporal_formats) or columns[:1],
+        column_types={col: pa.string() for col in temporal_formats},
+        strings_can_be_null=True,
+    )
+    with (_open_section(path, start) if start else pa.OSFile(path, "rb")) as stream:
+        batches = pacsv.open_csv(stream, read_options=read_options, convert_options=convert_options)
+        return _scan_batches(columns, types, batches, temporal_formats)
+# -------------------------------------------------------------------------------
+def _temporal_formats(columns: list) -> dict:
+    """
+    Returns the candidate formats of the Date/Time columns among `columns`.
+    """
+    return {
+        col: formats
+        for col, formats in [('Date', data_schema.DATE_FORMATS), ('Time', data_schema.TIME_FORMATS)]
+        if col in columns
+    }
+# -------------------------------------------------------------------------------
+def _scan_batches(columns: list, types: list, batches, temporal_formats: dict) -> dict:
+    """
+    Counts the rows of Arrow record batches (holding at least the `temporal_formats`
+    columns) and their Date range and unparseable Date/Time values, as a scan result.
+    """
+    row_count = 0
+    min_date, max_date = None, None
+    unparseable = {col: 0 for col in temporal_formats}
+    for batch in batches:
+        row_count += batch.num_rows
+        for col, formats in temporal_formats.items():
+            parsed, failed = data_schema.parse_datetimes(batch.column(col).to_pandas(), formats)
+            unparseable[col] += int(failed.sum())
+            if col != 'Date':
+                continue
+            dates = parsed.dropna()
+            if not dates.empty:
+                min_date = dates.min() if min_date is None else min(min_date, dates.min())
+                max_date = dates.max() if max_date is None else max(max_date, dates.max())
+
+    return {
+        'columns': columns,
+        'types': types,
+        'row_count': row_count,
+        'min_date': min_date.date().isoformat() if min_date is not None else None,
+        'max_date': max_date.date().isoformat() if max_date is not None else None,
+        'unparseable': unparseable,
+    }
+# -------------------------------------------------------------------------------
+def scan_parquet(path: str) -> dict:
+    """
+    Same as scan_csv for a Parquet dataset file: the schema comes from the file footer
+    and only the Date/Time columns are read.
+    """
+    parquet_file = pq.ParquetFile(path)
+    schema = parquet_file.schema_arrow
+    columns = schema.names
+    temporal_formats = _temporal_formats(columns)
+    batches = parquet_file.iter_batches(batch_size=PARQUET_BLOCK_ROWS, columns=list(temporal_formats)) if temporal_formats else []
+    scan = _scan_batches(columns, [str(field.type) for field in schema], batches, temporal_formats)
+    scan['row_count'] = parquet_file.metadata.num_rows
+    return scan
+# -------------------------------------------------------------------------------
+def scan_file(path: str) -> dict:
+    """
+    Scans a dataset file with scan_csv or scan_parquet, depending on how it is stored.
+    """
+    if data_cache.is_parquet_file(path):
+        return scan_parquet(path)
+    return scan_csv(path)
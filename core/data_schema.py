@@ -0,0 +1,399 @@
+import numpy as np
+import pandas as pd
+
+from core import data_variables as dv
+
+# ====================================================================================
+# Ingest-time Schema for Traffic Violation Datasets
+# ====================================================================================
+# Applied once when a dataset is loaded (before it is cached), so every page works on
+# compact dtypes:
+#   - low-cardinality text columns  -> pandas 'category' (vocabulary seeded from data_variables)
+#   - Yes/No/NA flag columns        -> nullable 'boolean'
+#   - small integer columns         -> int8 / int16 / int32
+#   - prefixed ID columns           -> uint32 number without the prefix ('VLT100042' -> 100042),
+#                                      formatted back to text only for display (format_ids)
+#   - Date / Time                   -> datetime64 Date plus Year, Month, Year_Month,
+#                                      Day_Of_Week, Hour and Minute_Of_Day columns
+# Values outside a vocabulary are kept (appended as extra categories), and columns whose
+# values do not fit the target type are left untouched.
+
+def _vocabulary(*value_lists) -> list:
+    """
+    Merges value lists into one list of unique values, keeping first-seen order.
+    """
+    return list(dict.fromkeys(value for values in value_lists for value in values))
+
+STATE_VOCABULARY = _vocabulary(dv.states_list, dv.indian_states_coordinates.keys())
+
+CATEGORY_VOCABULARIES = {
+    'Violation_Type': _vocabulary(dv.violation_types_list, dv.vehicle_types_mapping.keys(), dv.fine_mapping.keys()),
+    'Location': STATE_VOCABULARY,
+    'Registration_State': STATE_VOCABULARY,
+    'Vehicle_Type': _vocabulary(dv.vehicle_types_list, *dv.vehicle_types_mapping.values()),
+    'Vehicle_Color': _vocabulary(dv.vehicle_colors_list),
+    'Driver_Gender': _vocabulary(dv.driver_genders_list),
+    'License_Type': _vocabulary(dv.license_types_list),
+    'Weather_Condition': _vocabulary(dv.weather_conditions_list),
+    'Road_Condition': _vocabulary(dv.road_conditions_list),
+    'Issuing_Agency': _vocabulary(dv.issuing_agencies_list),
+    'License_Validity': _vocabulary(dv.license_validity_list),
+    'Traffic_Light_Status': _vocabulary(dv.traffic_light_status_list),
+    'Breathalyzer_Result': _vocabulary(dv.breathalyzer_results_list),
+    'Payment_Method': _vocabulary(dv.payment_methods_list),
+    'Comments': _vocabulary(dv.comments_list),
+}
+
+FLAG_COLUMNS = ['Helmet_Worn', 'Seatbelt_Worn', 'Towed', 'Fine_Paid', 'Court_Appearance_Required']
+FLAG_VALUES = {'yes': True, 'no': False}
+
+INTEGER_COLUMNS = {
+    'Driver_Age': 'int8',
+    'Penalty_Points': 'int8',
+    'Speed_Limit': 'int16',
+    'Recorded_Speed': 'int16',
+    'Vehicle_Model_Year': 'int16',
+    'Number_of_Passengers': 'int16',
+    'Previous_Violations': 'int16',
+    'Fine_Amount': 'int32',
+}
+
+# ID column -> (text prefix, digits it is zero-padded to). An ID column is encoded only
+# when every value is the prefix followed by exactly that many digits (the generator
+# writes 'VLT000042'), or by more digits without a leading zero, so formatting it back
+# is lossless. IDs padded to another width (or not padded, 'VLT42') stay text.
+ID_COLUMNS = {
+    'Violation_ID': ('VLT', 6),
+    'Officer_ID': ('OFF', 4),
+}
+ID_NUMBER_PATTERN = r'(?:[0-9]{{{width}}}|[1-9][0-9]{{{width},9}})'  # .format(width=...)
+
+# Derived from Date / Time once at ingest (nullable, so unparseable rows stay <NA>)
+TEMPORAL_COLUMNS = {
+    'Year': 'Int16',
+    'Month': 'Int8',          # 1-12
+    'Year_Month': 'period[M]',
+    'Day_Of_Week': 'Int8',    # 0 = Monday
+    'Hour': 'Int8',
+    'Minute_Of_Day': 'Int16', # 0-1439
+}
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Candidate formats tried (in order) on a sample of each column; month-first before
+# day-first, like pd.to_datetime's own guess
+DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y',
+                '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S']
+TIME_FORMATS = ['%H:%M', '%H:%M:%S', '%H:%M:%S.%f', '%I:%M %p', '%I:%M:%S %p']
+SNIFF_SAMPLE_SIZE = 200
+
+
+# ==================================================================================
+# Column Converters
+# ==================================================================================
+def to_category(series: pd.Series, vocabulary: list) -> pd.Series:
+    """
+    Converts a text column to 'category', seeding the categories with the known vocabulary
+    so category codes stay stable across files.
+    """
+    observed = series.dropna().unique()
+    known = set(vocabulary)
+    extra_values = sorted((value for value in observed if value not in known), key=str)
+    return pd.Series(
+        pd.Categorical(series, categories=list(vocabulary) + extra_values),
+        index=series.index,
+        name=series.name,
+    )
+# -------------------------------------------------------------------------------
+def to_flag(series: pd.Series) -> pd.Series:
+    """
+    Converts a Yes/No/NA column to nullable booleans.
+    Returns the column unchanged if it holds any other value.
+    """
+    normalized = series.astype('string').str.strip().str.lower()
+    if not normalized.dropna().isin(FLAG_VALUES.keys()).all():
+        return series
+    return normalized.map(FLAG_VALUES).astype('boolean')
+# -------------------------------------------------------------------------------
+def to_small_integer(series: pd.Series, dtype: str) -> pd.Series:
+    """
+    Downcasts an integer column when every value fits into `dtype`.
+    """
+    if not pd.api.types.is_integer_dtype(series) or series.empty:
+        return series
+    limits = np.iinfo(dtype)
+    if series.min() < limits.min or series.max() > limits.max:
+        return series
+    return series.astype(dtype)
+# -------------------------------------------------------------------------------
+def to_prefixed_id(series: pd.Series, prefix: str, width: int) -> pd.Series:
+    """
+    Converts a prefixed ID column ('VLT100042', 'VLT000042' with width 6) to its numbers
+    as uint32 (UInt32 when values are missing). Returns the column unchanged if any value
+    does not round-trip.
+    """
+    if series.dtype != 'object' or series.empty:
+        return series
+    text = series.astype('string[pyarrow]') # Vectorised string kernels
+    if not text.str.fullmatch(prefix + ID_NUMBER_PATTERN.format(width=width)).fillna(True).all():
+        return series
+    numbers = text.str.slice(len(prefix)).astype('Int64')
+    if numbers.max() > np.iinfo('uint32').max:
+        return series
+    return numbers.astype('UInt32' if numbers.hasnans else 'uint32')
+# -------------------------------------------------------------------------------
+def to_minute_of_day(series: pd.Series) -> pd.Series:
+    """
+    Converts a time-of-day text column ('HH:MM' or 'HH:MM:SS') to minutes after midnight.
+    """
+    times, unparseable = parse_datetimes(series, TIME_FORMATS)
+    report_unparseable(series, unparseable)
+    return (times.dt.hour * 60 + times.dt.minute).astype('Int16')
+
+
+# ==================================================================================
+# Date / Time Parsing
+# ==================================================================================
+def sniff_format(values: pd.Index, formats: list):
+    """
+    Returns the first format that parses every value of a sample, or None.
+    """
+    sample = values[:SNIFF_SAMPLE_SIZE]
+    for fmt in formats:
+        if pd.to_datetime(sample, format=fmt, errors='coerce').notna().all():
+            return fmt
+    return None
+# -------------------------------------------------------------------------------
+def parse_datetimes(series: pd.Series, formats: list) -> tuple:
+    """
+    Parses a text column of dates or times.
+
+    Each distinct string is parsed once (feeds repeat the same dates and minutes over and
+    over) with a format sniffed from the first values; strings in another format fall back
+    to pandas' per-value 'mixed' parsing. Results are mapped back to rows by position.
+
+    Args:
+        series (pd.Series): Text (or already datetime64) values.
+        formats (list): Candidate strptime formats, e.g. DATE_FORMATS or TIME_FORMATS.
+
+    Returns:
+        tuple: (parsed datetime64 Series, boolean Series marking rows whose non-missing
+                value could not be parsed)
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series, pd.Series(False, index=series.index)
+
+    codes, uniques = pd.factorize(series) # Missing values get code -1
+    uniques = pd.Index(uniques).astype(str).str.strip()
+    fmt = sniff_format(uniques, formats)
+    if fmt is not None:
+        parsed = pd.to_datetime(uniques, format=fmt, errors='coerce')
+    else:
+        parsed = pd.DatetimeIndex([pd.NaT] * len(uniques))
+    failed = parsed.isna()
+    if failed.any():
+        fallback = pd.to_datetime(uniques[failed], format='mixed', errors='coerce')
+        parsed = parsed.to_series(index=range(len(uniques)))
+        parsed[failed] = fallback
+        failed = parsed.isna().to_numpy()
+
+    # Code -1 takes the trailing NaT
+    values = np.append(np.asarray(parsed, dtype='datetime64[ns]'), np.datetime64('NaT'))
+    result = pd.Series(values.take(codes), index=series.index, name=series.name)
+    unparseable = pd.Series(np.append(failed, False).take(codes), index=series.index)
+    return result, unparseable
+# -------------------------------------------------------------------------------
+def report_unparseable(series: pd.Series, unparseable: pd.Series):
+    """
+    Prints how many rows of a column could not be parsed, with a few example values.
+    """
+    count = int(unparseable.sum())
+    if count:
+        examples = series[unparseable].astype(str).unique()[:5].tolist()
+        print(f"Unparseable {series.name} values in {count:,} rows (e.g. {examples}); they are left empty.")
+
+
+# ==================================================================================
+# Derived Temporal Columns
+# ==================================================================================
+def add_temporal_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parses 'Date' to datetime64 and adds the TEMPORAL_COLUMNS derived from 'Date' and 'Time'.
+    Columns that already exist are left alone, so calling this on a typed dataset is free.
+
+    Args:
+        df (pd.DataFrame): A dataset with a 'Date' and/or 'Time' column.
+
+    Returns:
+        pd.DataFrame: The same DataFrame with the derived columns.
+    """
+    if 'Date' in df.columns:
+        if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+            dates, unparseable = parse_datetimes(df['Date'], DATE_FORMATS)
+            report_unparseable(df['Date'], unparseable)
+            df['Date'] = dates
+        dates = df['Date'].dt
+        derived = {
+            'Year': lambda: dates.year,
+            'Month': lambda: dates.month,
+            'Year_Month': lambda: dates.to_period('M'),
+            'Day_Of_Week': lambda: dates.dayofweek,
+        }
+        for col, values in derived.items():
+            if col not in df.columns:
+                df[col] = values().astype(TEMPORAL_COLUMNS[col])
+
+    if 'Time' in df.columns and 'Minute_Of_Day' not in df.columns:
+        df['Minute_Of_Day'] = to_minute_of_day(df['Time'])
+    if 'Minute_Of_Day' in df.columns and 'Hour' not in df.columns:
+        df['Hour'] = (df['Minute_Of_Day'] // 60).astype(TEMPORAL_COLUMNS['Hour'])
+    return df
+# -------------------------------------------------------------------------------
+def month_names(months: pd.Series) -> pd.Series:
+    """
+    Maps a 'Month' column (1-12) to ordered month-name categories.
+    """
+    return pd.Series(
+        pd.Categorical.from_codes(months.fillna(0).astype(int) - 1, categories=MONTH_NAMES, ordered=True),
+        index=months.index,
+        name=months.name,
+    )
+# -------------------------------------------------------------------------------
+def day_names(days: pd.Series) -> pd.Series:
+    """
+    Maps a 'Day_Of_Week' column (0 = Monday) to ordered day-name categories.
+    """
+    return pd.Series(
+        pd.Categorical.from_codes(days.fillna(-1).astype(int), categories=DAY_NAMES, ordered=True),
+        index=days.index,
+        name=days.name,
+    )
+
+
+# ==================================================================================
+# Schema Application
+# ==================================================================================
+def apply_traffic_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Applies the traffic violation schema to every matching column of the DataFrame.
+
+    Args:
+        df (pd.DataFrame): A freshly parsed dataset (columns as read from CSV).
+
+    Returns:
+        pd.DataFrame: The same DataFrame with compact dtypes.
+    """
+    for col, vocabulary in CATEGORY_VOCABULARIES.items():
+        if col in df.columns and df[col].dtype == 'object':
+            df[col] = to_category(df[col], vocabulary)
+
+    for col in FLAG_COLUMNS:
+        if col in df.columns and df[col].dtype == 'object':
+            df[col] = to_flag(df[col])
+
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df.columns:
+            df[col] = to_small_integer(df[col], dtype)
+
+    for col, (prefix, width) in ID_COLUMNS.items():
+        if col in df.columns:
+            df[col] = to_prefixed_id(df[col], prefix, width)
+
+    if 'Date' in df.columns and 'Time' in df.columns:
+        df = add_temporal_columns(df)
+
+    return df
+# -------------------------------------------------------------------------------
+def project_columns(available: list, columns: list = None) -> list:
+    """
+    Resolves a page's column projection against a dataset's columns.
+
+    Args:
+        available (list): Columns of the dataset.
+        columns (list): Columns the page reads, or None for all of them. The derived
+                        TEMPORAL_COLUMNS are always kept (they are small integers).
+
+    Returns:
+        list: Columns to load, in dataset order.
+    """
+    if columns is None:
+        return list(available)
+    wanted = set(columns) | set(TEMPORAL_COLUMNS)
+    return [col for col in available if col in wanted]
+# -------------------------------------------------------------------------------
+def flag_mask(series: pd.Series, value: bool = True) -> pd.Series:
+    """
+    Returns a plain boolean mask of rows where a flag column equals `value`.
+    Works for typed (boolean) columns as well as raw 'Yes'/'No' text. Missing values are False.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return (series == value).fillna(False).astype(bool)
+    expected = 'yes' if value else 'no'
+    return series.astype(str).str.strip().str.lower() == expected
+# -------------------------------------------------------------------------------
+def count_values(series: pd.Series, weights=None) -> pd.Series:
+    """
+    value_counts() that keeps only values present in the data and returns a plain index,
+    so unused categories never show up as empty bars, wedges or table rows.
+    With `weights` (rows each sampled row stands for, see core.stratified_sample) each
+    row counts by its weight.
+    """
+    if weights is None:
+        counts = series.value_counts()
+    else:
+        counts = pd.Series(np.asarray(weights, dtype=float), index=series.index).groupby(series, observed=True).sum()
+        counts = counts.sort_values(ascending=False).rename('count')
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(object)
+    return counts
+# -------------------------------------------------------------------------------
+def count_table(df: pd.DataFrame, index: str, columns: str, weights=None) -> pd.DataFrame:
+    """
+    Row counts per (index, columns) value pair as a table (a crosstab of the values
+    present in the data); with `weights` each row counts by its weight (rounded to
+    whole rows).
+    """
+    keys = [df[index], df[columns]]
+    if weights is None:
+        counts = df.groupby(keys, observed=True).size()
+    else:
+        counts = pd.Series(np.asarray(weights, dtype=float), index=df.index).groupby(keys, observed=True).sum().round().astype(int)
+    return counts.unstack(fill_value=0)
+# -------------------------------------------------------------------------------
+def id_columns(df: pd.DataFrame) -> list:
+    """
+    Returns the ID columns of df that are stored as numbers (see to_prefixed_id).
+    """
+    return [col for col in ID_COLUMNS if col in df.columns and pd.api.types.is_integer_dtype(df[col])]
+# -------------------------------------------------------------------------------
+def numeric_columns(df: pd.DataFrame) -> list:
+    """
+    Returns the numeric measure columns of df: select_dtypes('number') without the
+    numerically stored ID columns, which are labels, not quantities.
+    """
+    ids = id_columns(df)
+    return [col for col in df.select_dtypes(include='number').columns if col not in ids]
+# -------------------------------------------------------------------------------
+def format_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns df with its numerically stored ID columns formatted back to their original
+    text ('VLT100042', zero-padded to the column's width). Meant for display and export;
+    returns df itself when there is nothing to format.
+    """
+    ids = id_columns(df)
+    if not ids:
+        return df
+    return df.assign(**{
+        col: (ID_COLUMNS[col][0] + df[col].astype('string').str.zfill(ID_COLUMNS[col][1])).astype(object)
+        for col in ids
+    })
+# -------------------------------------------------------------------------------
+def drop_derived_columns(df: pd.DataFrame, source_columns: list) -> pd.DataFrame:
+    """
+    Returns df without the TEMPORAL_COLUMNS that add_temporal_columns derived, keeping
+    any that the dataset file itself holds (`source_columns`, e.g. its catalog entry's
+    'columns'). Meant for describing or exporting a dataset as it is stored.
+    """
+    derived = [col for col in TEMPORAL_COLUMNS if col in df.columns and col not in source_columns]
+    return df.drop(columns=derived) if derived else df
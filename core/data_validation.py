@@ -0,0 +1,267 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core import data_cache, data_schema
+from core import data_variables as dv
+
+# ====================================================================================
+# Rule-Based Validation of Violation Datasets
+# ====================================================================================
+# Value rules built from core.data_variables (vocabularies, fine ranges per violation
+# type, age and speed bounds) are checked on every block a dataset is ingested with
+# (core.data_ingest), as vectorised masks: category columns are checked once per
+# category and looked up by code, so a block of millions of rows costs a few array
+# operations per rule. Each dataset gets
+#   .dataset_cache/validation/<content hash>.v1.json     rows checked and rows per rule
+#   .dataset_cache/validation/<content hash>.v1.parquet  quarantined rows (Row, Failed_Rules, values)
+# Rules only report: quarantined rows stay in the dataset unless a page leaves them out
+# (see without_quarantined). Missing values are not rule violations.
+
+VALIDATION_DIR = os.path.join(data_cache.CACHE_DIR, "validation")
+VALIDATION_FORMAT_VERSION = 2  # Bump when the rules or the report layout change to re-validate
+ROW_COLUMN = 'Row'
+FAILED_RULES_COLUMN = 'Failed_Rules'
+# Fine ranges are those of the generator (core.data_generator). Types of the bundled sample
+# dataset draw fines from one range for every type, so types it uses (some share a name
+# with generator types) have no fine range and are never flagged by fine_out_of_range
+FINE_RANGES = {name: bounds for name, bounds in dv.fine_ranges.items() if name not in dv.sample_violation_types_list}
+
+
+# -------------------------------------------------------------------------------
+def _lookup(series: pd.Series, mapping: dict) -> np.ndarray:
+    """
+    Maps every value to mapping[value] as floats (NaN when missing or unknown).
+    Category columns are mapped once per category.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        per_category = np.array([mapping.get(value, np.nan) for value in series.cat.categories] + [np.nan], dtype=float)
+        return per_category[series.cat.codes.to_numpy()] # Code -1 (missing) picks the trailing NaN
+    return series.map(mapping).to_numpy(dtype=float, na_value=np.nan)
+# -------------------------------------------------------------------------------
+def _numbers(series: pd.Series) -> np.ndarray:
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+# -------------------------------------------------------------------------------
+def _unknown(vocabulary: list):
+    known = dict.fromkeys(vocabulary, 0.0)
+    return lambda df, col: np.isnan(_lookup(df[col], known)) & df[col].notna().to_numpy()
+# -------------------------------------------------------------------------------
+def _outside(low, high):
+    def check(df, col):
+        values = _numbers(df[col])
+        return (values < low) | (values > high) # NaN compares False
+    return check
+# -------------------------------------------------------------------------------
+def _fine_outside_type_range(df, col):
+    if 'Violation_Type' not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    fines = _numbers(df[col])
+    lows = _lookup(df['Violation_Type'], {name: low for name, (low, _) in FINE_RANGES.items()})
+    highs = _lookup(df['Violation_Type'], {name: high for name, (_, high) in FINE_RANGES.items()})
+    return (fines < lows) | (fines > highs) # Types without a range give NaN bounds: never flagged
+
+
+VIOLATION_TYPES = list(data_schema.CATEGORY_VOCABULARIES['Violation_Type']) + dv.sample_violation_types_list
+
+# (rule name, column, description, check(df, column) -> bool array of rows breaking the rule)
+RULES = [
+    ('negative_fine', 'Fine_Amount', "Fine_Amount is negative", _outside(0, np.inf)),
+    ('fine_out_of_range', 'Fine_Amount', "Fine_Amount outside the fine range of its Violation_Type", _fine_outside_type_range),
+    ('driver_age_out_of_range', 'Driver_Age', f"Driver_Age outside {dv.driver_age_range[0]}-{dv.driver_age_range[1]}", _outside(*dv.driver_age_range)),
+    ('unknown_violation_type', 'Violation_Type', "Violation_Type is not a known violation type", _unknown(VIOLATION_TYPES)),
+    ('unknown_location', 'Location', "Location is not a known state", _unknown(data_schema.STATE_VOCABULARY)),
+    ('unknown_registration_state', 'Registration_State', "Registration_State is not a known state", _unknown(data_schema.STATE_VOCABULARY)),
+    ('speed_limit_out_of_range', 'Speed_Limit', f"Speed_Limit outside {dv.speed_limit_range[0]}-{dv.speed_limit_range[1]} km/h", _outside(*dv.speed_limit_range)),
+    ('recorded_speed_outlier', 'Recorded_Speed', f"Recorded_Speed outside {dv.recorded_speed_range[0]}-{dv.recorded_speed_range[1]} km/h", _outside(*dv.recorded_speed_range)),
+]
+
+
+# -------------------------------------------------------------------------------
+def evaluate(df: pd.DataFrame) -> dict:
+    """
+    Checks every rule whose column is present on a block of rows.
+
+    Returns:
+        dict: rule name -> bool array (True = row breaks the rule).
+    """
+    return {name: np.asarray(check(df, col), dtype=bool) for name, col, _, check in RULES if col in df.columns}
+# -------------------------------------------------------------------------------
+def get_report_path(content_hash: str, extension: str = "json") -> str:
+    """
+    Returns the location of a dataset's validation report ('json') or quarantine ('parquet').
+    """
+    return os.path.join(VALIDATION_DIR, f"{content_hash}.v{VALIDATION_FORMAT_VERSION}.{extension}")
+
+
+# ==================================================================================
+# Validation Runs (one per ingest)
+# ==================================================================================
+class ValidationRun:
+    """
+    Validates a dataset block by block while it is ingested, writing quarantined rows
+    as it goes. finish() publishes the report; nothing is published if it is not called.
+
+    Args:
+        content_hash (str): Hash of the dataset being ingested.
+        base_hash (str): Optional hash of a previous version this one appends rows to;
+                         its report and quarantined rows are carried over.
+    """
+    def __init__(self, content_hash: str, base_hash: str = None):
+        self.content_hash = content_hash
+        self.counts = {name: 0 for name, _, _, _ in RULES}
+        self.rows = 0
+        self.quarantined = 0
+        self.writer = None
+        self.tmp_suffix = f".{os.getpid()}-{threading.get_ident()}.tmp"
+        os.makedirs(VALIDATION_DIR, exist_ok=True)
+        if base_hash is not None:
+            self._carry_over(base_hash)
+
+    def _carry_over(self, base_hash: str):
+        report = load_report(base_hash)
+        if report is None:
+            raise ValueError(f"No validation report for {base_hash}")
+        self.rows, self.quarantined = report['rows'], report['quarantined']
+        self.counts.update({name: rule['rows'] for name, rule in report['rules'].items()})
+        if report['quarantined']:
+            quarantine = pq.ParquetFile(get_report_path(base_hash, "parquet"))
+            for i in range(quarantine.num_row_groups):
+                self._write(quarantine.read_row_group(i))
+
+    def _write(self, table: pa.Table):
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(
+                get_report_path(self.content_hash, "parquet") + self.tmp_suffix, table.schema, **data_cache.PARQUET_WRITE_OPTIONS
+            )
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def add(self, block: pd.DataFrame):
+        """
+        Validates the next block of rows (typed with data_schema).
+        """
+        masks = evaluate(block)
+        failed = np.zeros(len(block), dtype=bool)
+        for name, mask in masks.items():
+            self.counts[name] += int(mask.sum())
+            failed |= mask
+        if failed.any():
+            rules = pd.Series("", index=np.flatnonzero(failed))
+            for name, mask in masks.items():
+                hit = mask[failed]
+                rules[hit] += name + ","
+            quarantined = block[failed].reset_index(drop=True)
+            quarantined.insert(0, FAILED_RULES_COLUMN, rules.str.rstrip(",").to_numpy())
+            quarantined.insert(0, ROW_COLUMN, np.flatnonzero(failed) + self.rows)
+            try:
+                self._write(pa.Table.from_pandas(quarantined, preserve_index=False))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+                print(f"Quarantined rows of {self.content_hash} not saved: {e}") # The counts are still reported
+            self.quarantined += int(failed.sum())
+        self.rows += len(block)
+
+    def finish(self):
+        """
+        Publishes the report and quarantined rows (temp files + rename).
+        """
+        parquet_path = get_report_path(self.content_hash, "parquet")
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            os.replace(parquet_path + self.tmp_suffix, parquet_path)
+        report = {
+            'rows': self.rows,
+            'quarantined': self.quarantined,
+            'rules': {
+                name: {'column': col, 'description': description, 'rows': self.counts[name]}
+                for name, col, description, _ in RULES
+            },
+        }
+        json_path = get_report_path(self.content_hash)
+        with open(json_path + self.tmp_suffix, "w") as f:
+            json.dump(report, f)
+        os.replace(json_path + self.tmp_suffix, json_path)
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        for extension in ("json", "parquet"):
+            try:
+                os.remove(get_report_path(self.content_hash, extension) + self.tmp_suffix)
+            except FileNotFoundError:
+                pass
+
+
+# ==================================================================================
+# Reports
+# ==================================================================================
+def load_report(content_hash: str) -> dict:
+    """
+    Returns a dataset's validation report: {'rows', 'quarantined', 'rules': {name:
+    {'column', 'description', 'rows'}}}, or None if it was not validated.
+    """
+    try:
+        with open(get_report_path(content_hash)) as f:
+            return json.load(f)
+    except (FileNotFoundError, TypeError):
+        return None
+# -------------------------------------------------------------------------------
+def validate_cached(content_hash: str) -> dict:
+    """
+    Validates a dataset from its Parquet cache (row group by row group) unless it already
+    has a report - for datasets cached before validation ran at ingest.
+    """
+    report = load_report(content_hash)
+    cache_path = data_cache.get_cache_path(content_hash)
+    if report is not None or not os.path.exists(cache_path):
+        return report
+    run = ValidationRun(content_hash)
+    try:
+        cached = pq.ParquetFile(cache_path)
+        for i in range(cached.num_row_groups):
+            run.add(cached.read_row_group(i).to_pandas())
+        run.finish()
+    except Exception as e:
+        print(f"Validation skipped for {content_hash}: {e}")
+        run.abort()
+    return load_report(content_hash)
+# -------------------------------------------------------------------------------
+def load_quarantined(content_hash: str, limit: int = None) -> pd.DataFrame:
+    """
+    Returns the quarantined rows of a dataset (first `limit` rows), or an empty frame.
+    """
+    path = get_report_path(content_hash, "parquet")
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=[ROW_COLUMN, FAILED_RULES_COLUMN])
+    if limit is None:
+        return pd.read_parquet(path)
+    quarantine = pq.ParquetFile(path)
+    batch = next(quarantine.iter_batches(batch_size=limit), None)
+    return batch.to_pandas() if batch is not None else quarantine.schema_arrow.empty_table().to_pandas()
+# -------------------------------------------------------------------------------
+def without_quarantined(df: pd.DataFrame, content_hash: str) -> pd.DataFrame:
+    """
+    Returns df without its quarantined rows (df must hold the dataset's rows in file order).
+    """
+    path = get_report_path(content_hash, "parquet")
+    if not os.path.exists(path):
+        return df
+    rows = pq.read_table(path, columns=[ROW_COLUMN]).column(0).to_numpy()
+    keep = np.ones(len(df), dtype=bool)
+    keep[rows[rows < len(df)]] = False
+    return df[keep]
+# -------------------------------------------------------------------------------
+def remove_report(content_hash: str):
+    """
+    Deletes the report and quarantined rows of a dataset version that is no longer needed.
+    """
+    for extension in ("json", "parquet"):
+        try:
+            os.remove(get_report_path(content_hash, extension))
+        except FileNotFoundError:
+            pass
@@ -94,21 +94,24 @@ vehicle_types_list = [
 ]
 
 # ----------------------------- FINE MAP -----------------------------
-fine_mapping = {
-    "Overspeeding": random.randint(1000, 4000),
-    "Drunk Driving": random.randint(1000, 1500),
-    "Wrong Lane": random.randint(500, 5000),
-    "Red Light Violation": random.randint(1000, 5000),
-    "No Parking": random.randint(500, 1500),
-    "Seatbelt Violation": random.randint(1000, 5000),
-    "Helmet Violation": random.randint(1000, 5000),
-    "Mobile Phone Usage": random.randint(1000, 5000),
-    "Overloading": random.randint(1000, 5000),
-    "Illegal U Turn": random.randint(500, 1000),
-    "Driving Without License": random.randint(1000, 5000),
-    # "Hit and Run": random.choice([100000, 200000, 300000, 400000, 500000, 600000, 700000, 800000, 900000]),
+# Fine range (inclusive) of each violation type
+fine_ranges = {
+    "Overspeeding": (1000, 4000),
+    "Drunk Driving": (1000, 1500),
+    "Wrong Lane": (500, 5000),
+    "Red Light Violation": (1000, 5000),
+    "No Parking": (500, 1500),
+    "Seatbelt Violation": (1000, 5000),
+    "Helmet Violation": (1000, 5000),
+    "Mobile Phone Usage": (1000, 5000),
+    "Overloading": (1000, 5000),
+    "Illegal U Turn": (500, 1000),
+    "Driving Without License": (1000, 5000),
+    # "Hit and Run": (100000, 900000),
 }
 
+fine_mapping = {violation_type: random.randint(low, high) for violation_type, (low, high) in fine_ranges.items()}
+
 # --------------- VEHICLE SAFETY MAPPING -----------
 vehicle_colors_list = [
     "White", "Black", "Silver",
@@ -117,6 +120,8 @@ vehicle_colors_list = [
 ]
 
 # -------------------- DRIVER'S INFORMATIONS --------------------
+driver_age_range = (18, 80)
+
 driver_genders_list = [
     "Male", "Male", "Male", "Female", "Other"
 ]
@@ -214,6 +219,10 @@ states_list = [
 
 
 # ========================= Date Filteration =========================
+payment_methods_list = [
+    'Cash', 'UPI', 'Online', 'Card', 'Pending'
+]
+
 payment_methods_mapping  = {
     'Yes' : random.choice([
         'Cash', 'Cash', 'Cash', 'Cash'
@@ -224,6 +233,15 @@ payment_methods_mapping  = {
     'No' : 'Pending'
 }
 
+# -------------------------- TRAFFIC SIGNAL --------------------------
+traffic_light_status_list = [
+    "Red", "Green", "Yellow"
+]
+
+# -------------------------- SPEED (km/h) --------------------------
+speed_limit_range = (20, 120)
+recorded_speed_range = (0, 200)
+
 # -------------------------- ACTION TAKEN --------------------------
 towing_mapping = {
     # High Possibilities
@@ -307,4 +325,15 @@ indian_states_coordinates = {
     'Uttar Pradesh': {'latitude': 26.8467, 'longitude': 80.9462},
     'Uttarakhand': {'latitude': 30.0668, 'longitude': 79.0193},
     'West Bengal': {'latitude': 22.9868, 'longitude': 87.8550}
-}
\ No newline at end of file
+}
+
+# ====================================================================================
+# Validation Rule Data Definations
+# ====================================================================================
+# Violation types of the bundled sample dataset (dataset/Indian_Traffic_Violations.csv),
+# accepted on top of the generator's types above
+sample_violation_types_list = [
+    "Over-speeding", "Signal Jumping", "No Helmet", "No Seatbelt",
+    "Using Mobile Phone", "Wrong Parking", "Drunk Driving", "Overloading",
+    "Driving Without License",
+]
@@ -0,0 +1,305 @@
+import operator
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from core import partition_store
+
+# ====================================================================================
+# Dataframe Backend Switch
+# ====================================================================================
+# The grouped aggregations behind core.utils and core.dashboard_summary go through this
+# module, which runs them on the backend chosen with TRAFFIC_DASHBOARD_BACKEND:
+#   pandas  - eager pandas groupby (default, always available)
+#   duckdb  - embedded SQL engine, see core.duckdb_backend
+#   polars  - Polars LazyFrame, see core.polars_backend
+# A request is described once (group keys, aggregates, derived columns, row filters,
+# Date range) so the lazy backends can fuse the derive -> filter -> group steps into one
+# optimised query. Every backend returns a small pandas DataFrame with the same values
+# and dtypes as the pandas path, so the plotting code never sees anything else.
+#
+# Derived columns: {'Excess_Speed': ('Recorded_Speed', '-', 'Speed_Limit')}
+# Row filters:     [('Excess_Speed', '>', 0)]
+#
+# A frame loaded from a catalog dataset carries its Parquet cache file (and the Date range
+# it was cut to) in df.attrs['source_file']. While the frame still has the rows it was
+# tagged with, the lazy backends read that file instead - with projection and Date
+# pushdown, spilling to disk if needed - rather than the frame in memory.
+
+BACKEND_ENV_VAR = "TRAFFIC_DASHBOARD_BACKEND"
+DEFAULT_BACKEND = "pandas"
+BACKENDS = ("pandas", "duckdb", "polars")
+SOURCE_ATTR = "source_file"
+
+ARITHMETIC_OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+COMPARISON_OPERATORS = {
+    '==': operator.eq, '!=': operator.ne,
+    '>': operator.gt, '>=': operator.ge,
+    '<': operator.lt, '<=': operator.le,
+}
+
+_reported_fallbacks = set()
+
+
+# -------------------------------------------------------------------------------
+def _engine(name: str):
+    """
+    Returns the module implementing a backend (None for pandas).
+    """
+    if name == "duckdb":
+        from core import duckdb_backend
+        return duckdb_backend
+    if name == "polars":
+        from core import polars_backend
+        return polars_backend
+    return None
+# -------------------------------------------------------------------------------
+def is_available(name: str) -> bool:
+    """
+    True if the backend is known and its library is installed.
+    """
+    if name not in BACKENDS:
+        return False
+    engine = _engine(name)
+    return engine is None or engine.is_available()
+# -------------------------------------------------------------------------------
+def get_backend() -> str:
+    """
+    Returns the backend selected with TRAFFIC_DASHBOARD_BACKEND, falling back to pandas
+    (with a one-time message) when it is unknown or not installed.
+    """
+    name = os.environ.get(BACKEND_ENV_VAR, DEFAULT_BACKEND).strip().lower() or DEFAULT_BACKEND
+    if is_available(name):
+        return name
+    if name not in _reported_fallbacks:
+        _reported_fallbacks.add(name)
+        print(f"Dataframe backend '{name}' is not available, using {DEFAULT_BACKEND}.")
+    return DEFAULT_BACKEND
+# -------------------------------------------------------------------------------
+def source_columns(columns: list, derive: dict = None) -> list:
+    """
+    Returns the stored columns a request reads: `columns` with derived columns replaced
+    by the columns they are computed from (no duplicates, order kept).
+    """
+    derive = derive or {}
+    needed = []
+    for col in columns:
+        if col in derive:
+            left, _, right = derive[col]
+            needed.extend(operand for operand in (left, right) if isinstance(operand, str))
+        else:
+            needed.append(col)
+    return list(dict.fromkeys(needed))
+
+
+# ==================================================================================
+# File Sources
+# ==================================================================================
+def attach_source(df: pd.DataFrame, path: str, start=None, end=None) -> pd.DataFrame:
+    """
+    Records that df holds the rows of the Parquet file `path` dated between start and
+    end (inclusive, None for open), so the lazy backends can read the file instead.
+
+    Returns:
+        pd.DataFrame: df itself.
+    """
+    df.attrs[SOURCE_ATTR] = {'path': path, 'rows': len(df), 'start': start, 'end': end}
+    return df
+# -------------------------------------------------------------------------------
+def restrict_source(filtered: pd.DataFrame, df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    """
+    Tags `filtered`, the rows of df dated between start and end, with df's source file
+    and the narrowed Date range (no tag if df has none, or no longer matches it).
+
+    Returns:
+        pd.DataFrame: filtered itself.
+    """
+    filtered.attrs.pop(SOURCE_ATTR, None) # attrs are copied by pandas, with the old row count
+    source = _file_source(df)
+    if source is not None:
+        path, source_start, source_end = source
+        start, end = _narrow(source_start, start, max), _narrow(source_end, end, min)
+        attach_source(filtered, path, start, end)
+    return filtered
+# -------------------------------------------------------------------------------
+def _narrow(first, second, pick):
+    """
+    Combines two optional Date bounds with max (starts) or min (ends).
+    """
+    if first is None or second is None:
+        return second if first is None else first
+    return pick(pd.Timestamp(first), pd.Timestamp(second))
+# -------------------------------------------------------------------------------
+def _file_source(df: pd.DataFrame):
+    """
+    Returns (path, start, end) of df's source file, or None if df has no source, has lost
+    or gained rows since it was tagged, or the file is gone.
+    """
+    source = df.attrs.get(SOURCE_ATTR)
+    if source is None or source['rows'] != len(df) or not os.path.exists(source['path']):
+        return None
+    return source['path'], source['start'], source['end']
+# -------------------------------------------------------------------------------
+def _lazy_source(df: pd.DataFrame, columns: list, start, end):
+    """
+    Returns the (source, start, end) a lazy backend should query: df's source file with
+    the Date bounds combined, or df and the bounds as given (also when the file lacks one
+    of the stored `columns`, e.g. one a page added to the frame).
+    """
+    source = _file_source(df)
+    if source is None:
+        return df, start, end
+    path, source_start, source_end = source
+    try:
+        stored = set(pq.read_schema(path).names)
+    except (OSError, ValueError) as e:
+        print(f"Could not read the schema of {path}: {e}")
+        return df, start, end
+    if not stored.issuperset(columns):
+        return df, start, end
+    return path, _narrow(source_start, start, max), _narrow(source_end, end, min)
+
+
+# ==================================================================================
+# Pandas Backend
+# ==================================================================================
+def derive_columns(df: pd.DataFrame, derive: dict = None) -> pd.DataFrame:
+    """
+    Adds the derived columns to a (shallow) copy of df.
+    """
+    if not derive:
+        return df
+
+    def operand(value):
+        return df[value] if isinstance(value, str) else value
+
+    return df.assign(**{
+        name: ARITHMETIC_OPERATORS[op](operand(left), operand(right))
+        for name, (left, op, right) in derive.items()
+    })
+# -------------------------------------------------------------------------------
+def _prepare(df: pd.DataFrame, columns: list, derive: dict, where: list, start, end) -> pd.DataFrame:
+    """
+    Applies the Date range, derived columns and row filters of a request, eagerly, and
+    keeps only the columns it reads.
+    """
+    if start is not None or end is not None:
+        df = partition_store.filter_date_range(df, start, end)
+    columns = columns + [col for col, _, _ in where or []]
+    df = derive_columns(df[source_columns(columns, derive)], derive)
+    for col, op, value in where or []:
+        df = df[COMPARISON_OPERATORS[op](df[col], value).fillna(False).astype(bool)]
+    return df
+# -------------------------------------------------------------------------------
+def _pandas_aggregate(df, group_cols, agg_cols, agg_funcs, derive, where, start, end) -> pd.DataFrame:
+    df = _prepare(df, group_cols + agg_cols, derive, where, start, end)
+    stats = df.groupby(group_cols, observed=True).agg({col: agg_funcs for col in agg_cols}).reset_index()
+    # Flatten MultiIndex columns (e.g., ('Fine_Amount', 'sum') -> 'Fine_Amount_sum')
+    stats.columns = [f"{col}_{func}" if func else col for col, func in stats.columns]
+    return stats
+# -------------------------------------------------------------------------------
+def _pandas_count_rows(df, group_cols, count_col, derive, where, start, end) -> pd.DataFrame:
+    df = _prepare(df, group_cols + ([count_col] if count_col else []), derive, where, start, end)
+    grouped = df.groupby(group_cols, observed=True)
+    counts = grouped[count_col].count() if count_col else grouped.size()
+    return counts.reset_index(name='Count')
+
+
+# ==================================================================================
+# Public API
+# ==================================================================================
+def aggregate(df: pd.DataFrame, group_cols: list, agg_cols: list, agg_funcs: list,
+              derive: dict = None, where: list = None, start=None, end=None) -> pd.DataFrame:
+    """
+    Groups by `group_cols` and applies every function of `agg_funcs` to every column of
+    `agg_cols`, on the selected backend.
+
+    Args:
+        df (pd.DataFrame): Source rows (its source file on the lazy backends, see attach_source).
+        group_cols (list): Group-by columns (rows with a missing key are skipped).
+        agg_cols (list): Columns to aggregate (stored or derived).
+        agg_funcs (list): Any of 'count', 'sum', 'mean', 'min', 'max', 'std'.
+        derive (dict): Optional derived columns, name -> (operand, operator, operand).
+        where (list): Optional row filters, (column, operator, value), all must hold.
+        start, end: Optional inclusive 'Date' bounds.
+
+    Returns:
+        pd.DataFrame: Group columns then '<column>_<function>' columns, ordered by the keys.
+    """
+    group_cols, agg_cols, agg_funcs = list(group_cols), list(agg_cols), list(agg_funcs)
+    engine = _engine(get_backend())
+    if engine is None:
+        return _pandas_aggregate(df, group_cols, agg_cols, agg_funcs, derive, where, start, end)
+    columns = source_columns(group_cols + agg_cols + [col for col, _, _ in where or []], derive)
+    source, start, end = _lazy_source(df, columns, start, end)
+    stats = engine.aggregate(source, group_cols, agg_cols, agg_funcs, derive, where, start, end)
+    return match_pandas_dtypes(stats, df, group_cols, agg_cols, agg_funcs, derive)
+# -------------------------------------------------------------------------------
+def count_rows(df: pd.DataFrame, group_cols: list, count_col: str = None,
+               derive: dict = None, where: list = None, start=None, end=None) -> pd.DataFrame:
+    """
+    Number of rows per group (non-missing values of `count_col` if given), as 'Count',
+    on the selected backend. Arguments as for aggregate().
+    """
+    group_cols = list(group_cols)
+    engine = _engine(get_backend())
+    if engine is None:
+        return _pandas_count_rows(df, group_cols, count_col, derive, where, start, end)
+    columns = source_columns(group_cols + ([count_col] if count_col else []) + [col for col, _, _ in where or []], derive)
+    source, start, end = _lazy_source(df, columns, start, end)
+    counts = engine.count_rows(source, group_cols, count_col, derive, where, start, end)
+    return match_pandas_dtypes(counts, df, group_cols, [], [], derive)
+
+
+# ==================================================================================
+# Result Types (what the pandas groupby returns)
+# ==================================================================================
+def _pandas_result_dtype(dtype, func: str):
+    """
+    Returns the dtype pandas' groupby gives for `func` applied to a column of `dtype`.
+    """
+    nullable = isinstance(dtype, pd.api.extensions.ExtensionDtype)
+    if func == 'count':
+        return 'Int64' if nullable else 'int64'
+    if func in ('mean', 'std'):
+        if dtype == 'float32':
+            return dtype
+        return 'Float64' if nullable else 'float64'
+    if func == 'sum' and pd.api.types.is_bool_dtype(dtype):
+        return 'Int64' if nullable else 'int64'
+    return dtype # sum, min and max keep the column's type
+# -------------------------------------------------------------------------------
+def _fits(values: pd.Series, dtype) -> bool:
+    """
+    True unless `dtype` is a numpy integer type too small for the values.
+    """
+    if not (isinstance(dtype, np.dtype) and np.issubdtype(dtype, np.integer)) or values.empty:
+        return True
+    limits = np.iinfo(dtype)
+    return limits.min <= values.min() and values.max() <= limits.max
+# -------------------------------------------------------------------------------
+def match_pandas_dtypes(stats: pd.DataFrame, source, group_cols: list, agg_cols: list,
+                        agg_funcs: list, derive: dict = None) -> pd.DataFrame:
+    """
+    Casts another backend's result to the dtypes the pandas groupby returns for an
+    in-memory source (group keys keep their categories / nullable types, aggregates follow
+    pandas' rules) and orders it by the keys like pandas does (category order, not text).
+    File sources have no pandas types to match and are returned as they are.
+    """
+    if not isinstance(source, pd.DataFrame):
+        return stats
+    template = derive_columns(source[source_columns(group_cols + agg_cols, derive)].iloc[:0], derive)
+    for col in group_cols:
+        # Through object: pandas treats unordered categories in another order as the same dtype
+        stats[col] = stats[col].astype(object).astype(template[col].dtype)
+    for col in agg_cols:
+        for func in agg_funcs:
+            name = f"{col}_{func}"
+            dtype = _pandas_result_dtype(template[col].dtype, func)
+            if func == 'sum' and not _fits(stats[name], dtype):
+                dtype = 'int64' # pandas only casts integer sums back when they fit
+            if stats[name].notna().all() or isinstance(pd.api.types.pandas_dtype(dtype), pd.api.extensions.ExtensionDtype):
+                stats[name] = stats[name].astype(dtype)
+    return stats.sort_values(group_cols, kind='stable', ignore_index=True)
@@ -0,0 +1,153 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core import data_cache, data_ingest, data_schema, partition_store
+
+# ====================================================================================
+# Multi-File Union Datasets
+# ====================================================================================
+# Reads many catalogued dataset files as one table ("all generated datasets", "all
+# uploads", a hand-picked set):
+#   - files whose catalog Date range misses the requested dates are never opened, and
+#     inside a file only the Parquet row groups that can match are read
+#   - member files are read in parallel on a thread pool (Arrow releases the GIL)
+#   - rows whose Violation_ID already came from an earlier file can be dropped; a Bloom
+#     filter over the IDs kept so far answers "definitely new" for most rows, and only
+#     the rest are checked against the exact set of IDs
+# The result carries a per-file zone map in df.attrs['zone_map'], so the pages' date
+# filters slice the member files they need instead of scanning every row.
+
+MAX_READ_WORKERS = 8
+BLOOM_BITS_PER_ID = 16  # ~0.1% false positives with two hash functions
+DEDUP_COLUMN = 'Violation_ID'
+
+
+# -------------------------------------------------------------------------------
+class _IdFilter:
+    """
+    Set of the IDs kept so far, with a Bloom filter in front of the exact lookup.
+    """
+    def __init__(self, expected_ids: int):
+        bits = 1 << max(int(np.ceil(np.log2(max(expected_ids, 1) * BLOOM_BITS_PER_ID))), 6)
+        self.mask = np.uint64(bits - 1)
+        self.bits = np.zeros(bits // 8, dtype=np.uint8)
+        self.kept = [] # Arrays of kept IDs, merged only when the exact check needs them
+
+    def _bits(self, ids: np.ndarray):
+        """
+        Yields (byte, bit mask) of each of the two hash functions for every ID.
+        """
+        hashed = pd.util.hash_array(ids, categorize=False)
+        for position in (hashed & self.mask, (hashed >> np.uint64(32)) & self.mask):
+            yield (position >> np.uint64(3)).astype(np.intp), np.left_shift(np.uint8(1), (position & np.uint64(7)).astype(np.uint8))
+
+    def seen(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Returns which of `ids` were added before.
+        """
+        maybe = np.ones(len(ids), dtype=bool)
+        for byte, bit in self._bits(ids):
+            maybe &= (self.bits[byte] & bit) != 0
+        result = np.zeros(len(ids), dtype=bool)
+        if maybe.any() and self.kept:
+            self.kept = [np.unique(np.concatenate(self.kept))]
+            result[maybe] = np.isin(ids[maybe], self.kept[0])
+        return result
+
+    def add(self, ids: np.ndarray):
+        for byte, bit in self._bits(ids):
+            np.bitwise_or.at(self.bits, byte, bit)
+        self.kept.append(ids)
+# -------------------------------------------------------------------------------
+def _read_member(entry: dict, columns: list, start, end) -> pa.Table:
+    """
+    Reads one member file from its Parquet cache (built first if missing), with the
+    Date range pushed down to the row groups.
+    """
+    cache_path = data_cache.get_cache_path(entry['content_hash'])
+    if not os.path.exists(cache_path) and not data_ingest.build_cache(entry['path'], entry['content_hash']):
+        data_cache.load_dataset(entry['path'], entry['content_hash']) # Writes the cache from a full parse
+    if columns is not None:
+        columns = data_schema.project_columns(pq.read_schema(cache_path).names, columns)
+    filters = []
+    if start is not None:
+        filters.append(('Date', '>=', start))
+    if end is not None:
+        filters.append(('Date', '<=', end))
+    return pq.read_table(cache_path, columns=columns, filters=filters or None)
+# -------------------------------------------------------------------------------
+def _member_ids(table: pa.Table):
+    """
+    Returns (row positions with an ID, their IDs) of a member table.
+    """
+    ids = table.column(DEDUP_COLUMN).to_pandas()
+    has_id = ids.notna().to_numpy()
+    return np.flatnonzero(has_id), ids[has_id].to_numpy()
+
+
+# ==================================================================================
+# Public API
+# ==================================================================================
+def select_members(entries: list, start=None, end=None) -> list:
+    """
+    Returns the traffic dataset entries of `entries` whose Date range can overlap
+    [start, end] (files without any parseable Date are kept only without a range).
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    return [entry for entry in entries if entry['is_traffic'] and partition_store.zone_overlaps(entry, start, end)]
+# -------------------------------------------------------------------------------
+def read_union(entries: list, columns: list = None, start=None, end=None, dedup: bool = True) -> pd.DataFrame:
+    """
+    Reads catalogued dataset files as one DataFrame.
+
+    Args:
+        entries (list): Catalog entries, in priority order (the first file holding a
+                        Violation_ID keeps its row when dedup is on).
+        columns (list): Optional projection (see data_schema.project_columns).
+        start, end: Optional inclusive Date bounds; other files and row groups are skipped.
+        dedup (bool): Drop rows whose Violation_ID came from an earlier file. Rows
+                      repeated within one file are kept.
+
+    Returns:
+        pd.DataFrame: The rows of every member, file by file, with a per-file zone map
+                      in df.attrs['zone_map'] when no Date range was given.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    members = select_members(entries, start, end)
+    if not members:
+        return pd.DataFrame(columns=list(columns or []))
+
+    read_columns = columns
+    if dedup and columns is not None and DEDUP_COLUMN not in columns:
+        read_columns = list(columns) + [DEDUP_COLUMN]
+    with ThreadPoolExecutor(max_workers=min(MAX_READ_WORKERS, len(members))) as pool:
+        tables = list(pool.map(lambda entry: _read_member(entry, read_columns, start, end), members))
+
+    if dedup and all(DEDUP_COLUMN in table.column_names for table in tables):
+        id_filter = _IdFilter(sum(table.num_rows for table in tables))
+        for i, table in enumerate(tables):
+            positions, ids = _member_ids(table)
+            repeated = id_filter.seen(ids)
+            id_filter.add(ids[~repeated])
+            if repeated.any():
+                keep = np.ones(table.num_rows, dtype=bool)
+                keep[positions[repeated]] = False
+                tables[i] = table.filter(pa.array(keep))
+        if read_columns is not columns:
+            tables = [table.drop_columns([DEDUP_COLUMN]) for table in tables]
+
+    df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+    if start is None and end is None:
+        zones, row = [], 0
+        for entry, table in zip(members, tables):
+            zones.append((entry['min_date'], entry['max_date'], row, row + table.num_rows))
+            row += table.num_rows
+        df.attrs['zone_map'] = {'rows': row, 'zones': zones}
+    return df
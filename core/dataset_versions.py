@@ -0,0 +1,250 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core import data_cache, data_catalog, data_schema, partition_store
+
+# ====================================================================================
+# Versioned Dataset Snapshots
+# ====================================================================================
+# Every content version of a dataset file (an upload replaced by name, rows appended to
+# a generated file, ...) is kept as a delta over the version before it:
+#
+#   .dataset_cache/versions/<dataset key>.v1/_versions.json
+#                                            /part-00001.parquet     rows added by version 1
+#                                            /part-00001.hashes.npy  one hash per row of that part
+#                                            /deletes-00003.npy      rows removed by version 3
+#
+# Parts are only ever added, so every row ever stored has a fixed position in the
+# concatenation of all parts. Version N is the rows of parts 1..N minus the positions in
+# the deletion vectors of versions 1..N. Appended files add one part and no deletions;
+# a rewritten file is compared with the previous version by row hashes, so only rows
+# that are really new are stored. Rows of a version come back as the kept rows followed
+# by the added rows.
+#
+# Versions are only recorded when a file is replaced or appended to: a file that never
+# changes has no version folder, so it costs no copy beyond its cache. When a file first
+# changes, the content it replaced becomes version 1 (read from that content's Parquet
+# cache, before the cache is released) and the new content version 2.
+#
+# Pages read an older version with read(path, version=N) or read(path, as_of=date).
+
+VERSIONS_DIR = os.path.join(data_cache.CACHE_DIR, "versions")
+VERSIONS_FORMAT_VERSION = 1  # Bump when the layout changes to ignore old version logs
+LOG_FILE = "_versions.json"
+VERSIONED_SOURCES = ("generated", "related", "other")  # Catalog sources whose files can change
+
+
+# -------------------------------------------------------------------------------
+def get_versions_path(path: str) -> str:
+    """
+    Returns the version folder of a dataset file (named after a hash of its path).
+    """
+    digest = data_cache.new_content_digest()
+    digest.update(os.path.normpath(path).encode())
+    return os.path.join(VERSIONS_DIR, f"{digest.hexdigest()}.v{VERSIONS_FORMAT_VERSION}")
+# -------------------------------------------------------------------------------
+def list_versions(path: str) -> list:
+    """
+    Returns the versions of a dataset file, oldest first. Each version is a dict:
+    {'version', 'content_hash', 'created' (ISO timestamp), 'rows', 'stored_rows',
+    'part' (file name or None), 'deletes' (file name or None)}, where stored_rows counts
+    the rows of every part up to this version.
+    """
+    try:
+        with open(os.path.join(get_versions_path(path), LOG_FILE)) as f:
+            return json.load(f)['versions']
+    except FileNotFoundError:
+        return []
+# -------------------------------------------------------------------------------
+def _write_log(versions_path: str, path: str, versions: list):
+    tmp_path = os.path.join(versions_path, f"{LOG_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({'path': os.path.normpath(path), 'versions': versions}, f)
+    os.replace(tmp_path, os.path.join(versions_path, LOG_FILE))
+# -------------------------------------------------------------------------------
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+# -------------------------------------------------------------------------------
+def _occurrence_keys(hashes: np.ndarray) -> pd.MultiIndex:
+    """
+    Pairs each row hash with its occurrence number, so duplicate rows are matched one
+    to one when two versions are compared.
+    """
+    occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+    return pd.MultiIndex.from_arrays([hashes, occurrence])
+# -------------------------------------------------------------------------------
+def _live_positions(versions_path: str, versions: list) -> np.ndarray:
+    """
+    Returns the stored row positions that make up the last of `versions`.
+    """
+    if not versions:
+        return np.empty(0, dtype=np.int64)
+    deleted = [
+        np.load(os.path.join(versions_path, version['deletes']))
+        for version in versions
+        if version['deletes']
+    ]
+    keep = np.ones(versions[-1]['stored_rows'], dtype=bool)
+    if deleted:
+        keep[np.concatenate(deleted)] = False
+    return np.flatnonzero(keep)
+# -------------------------------------------------------------------------------
+def _stored_hashes(versions_path: str, versions: list) -> np.ndarray:
+    parts = [
+        np.load(os.path.join(versions_path, version['part'].replace(".parquet", ".hashes.npy")))
+        for version in versions
+        if version['part']
+    ]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+
+
+# ==================================================================================
+# Recording
+# ==================================================================================
+def record_version(path: str, content_hash: str, appended_rows: int = None) -> int:
+    """
+    Stores the current content of a dataset file as a new version, unless it is the
+    latest version already.
+
+    Args:
+        path (str): CSV path (as in the catalog).
+        content_hash (str): Content hash of the file (its Parquet cache is used when present).
+        appended_rows (int): Row count of the latest version when the file is known to be
+                             that version plus appended rows (see the catalog's
+                             appended_from); only the extra rows are then looked at.
+
+    Returns:
+        int: The number of the version holding this content.
+    """
+    versions_path = get_versions_path(path)
+    versions = list_versions(path)
+    if versions and versions[-1]['content_hash'] == content_hash:
+        return versions[-1]['version']
+    df = data_cache.load_dataset(path, content_hash)
+    with partition_store.store_lock(versions_path):
+        versions = list_versions(path)
+        if versions and versions[-1]['content_hash'] == content_hash:
+            return versions[-1]['version']
+
+        number = versions[-1]['version'] + 1 if versions else 1
+        stored_rows = versions[-1]['stored_rows'] if versions else 0
+        if appended_rows is not None and versions and appended_rows == versions[-1]['rows'] <= len(df):
+            added, deleted = df.iloc[appended_rows:], np.empty(0, dtype=np.int64)
+            added_hashes = _row_hashes(added)
+        else:
+            # Match rows (with their duplicates) against the previous version by hash
+            live = _live_positions(versions_path, versions)
+            old_keys = _occurrence_keys(_stored_hashes(versions_path, versions)[live])
+            new_hashes = _row_hashes(df)
+            new_keys = _occurrence_keys(new_hashes)
+            deleted = live[~old_keys.isin(new_keys)]
+            is_added = ~new_keys.isin(old_keys)
+            added, added_hashes = df[is_added], new_hashes[is_added]
+
+        version = {
+            'version': number,
+            'content_hash': content_hash,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'rows': len(df),
+            'stored_rows': stored_rows + len(added),
+            'part': None,
+            'deletes': None,
+        }
+        if len(added):
+            version['part'] = f"part-{number:05d}.parquet"
+            added.to_parquet(os.path.join(versions_path, version['part']), index=False, **data_cache.PARQUET_WRITE_OPTIONS)
+            np.save(os.path.join(versions_path, f"part-{number:05d}.hashes.npy"), added_hashes)
+        if len(deleted):
+            version['deletes'] = f"deletes-{number:05d}.npy"
+            np.save(os.path.join(versions_path, version['deletes']), deleted.astype(np.int64))
+        _write_log(versions_path, path, versions + [version])
+    return number
+# -------------------------------------------------------------------------------
+def record_entry(entry: dict) -> int:
+    """
+    Records the current content of a catalog entry as a version if its source is
+    versioned and the file replaced earlier content (rewritten, or rows appended). The
+    first time a file changes, the replaced content is recorded first as version 1, if
+    its cache still exists.
+
+    Returns:
+        int: The version number, or None when the entry is not versioned (or unchanged).
+    """
+    if entry is None or entry['source'] not in VERSIONED_SOURCES or entry['row_count'] is None:
+        return None
+    path, old_hash = entry['path'], entry['previous_hash']
+    versions = list_versions(path)
+    if not versions and old_hash in (None, entry['content_hash']):
+        return None # A new or unchanged file
+    try:
+        if not versions and os.path.exists(data_cache.get_cache_path(old_hash)):
+            record_version(path, old_hash) # The replaced content becomes version 1
+            versions = list_versions(path)
+        appended_rows = None
+        if entry['appended_from'] is not None and versions and versions[-1]['content_hash'] == old_hash:
+            appended_rows = versions[-1]['rows']
+        return record_version(path, entry['content_hash'], appended_rows)
+    except Exception as e:
+        print(f"Version snapshot skipped for {entry['path']}: {e}")
+        return None
+# -------------------------------------------------------------------------------
+def snapshot(path: str) -> int:
+    """
+    Refreshes the catalog entry of a file that was just written and records its version
+    if it replaced earlier content (see record_entry).
+    """
+    entry, _ = data_catalog.refresh_dataset(path)
+    return record_entry(entry)
+
+
+# ==================================================================================
+# Reading
+# ==================================================================================
+def resolve_version(path: str, version: int = None, as_of=None) -> dict:
+    """
+    Returns the version entry asked for: version number N, or the latest version created
+    on or before `as_of` (a date means the end of that day), or the latest version.
+    Returns None when there is no such version.
+    """
+    versions = list_versions(path)
+    if version is not None:
+        return next((entry for entry in versions if entry['version'] == version), None)
+    if as_of is not None:
+        as_of = pd.Timestamp(as_of)
+        if as_of == as_of.normalize():
+            as_of += pd.Timedelta(days=1) - pd.Timedelta(1, 'ns')
+        versions = [entry for entry in versions if pd.Timestamp(entry['created']) <= as_of]
+    return versions[-1] if versions else None
+# -------------------------------------------------------------------------------
+def read(path: str, version: int = None, as_of=None, columns: list = None) -> pd.DataFrame:
+    """
+    Reads a dataset file as it was at a version.
+
+    Args:
+        path (str): CSV path (as in the catalog).
+        version (int): Version number, or None for the latest version.
+        as_of: Optional date/timestamp - the latest version created by then.
+        columns (list): Optional projection (see data_schema.project_columns).
+
+    Returns:
+        pd.DataFrame: The rows of that version, or None if there is no such version.
+    """
+    target = resolve_version(path, version, as_of)
+    if target is None:
+        return None
+    versions_path = get_versions_path(path)
+    versions = [entry for entry in list_versions(path) if entry['version'] <= target['version']]
+    parts = [os.path.join(versions_path, entry['part']) for entry in versions if entry['part']]
+    if not parts:
+        return pd.DataFrame()
+    if columns is not None:
+        columns = data_schema.project_columns(pq.read_schema(parts[0]).names, columns)
+    table = pa.concat_tables([pq.read_table(part, columns=columns) for part in parts], promote_options="permissive")
+    table = table.take(pa.array(_live_positions(versions_path, versions)))
+    return table.to_pandas()
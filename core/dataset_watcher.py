@@ -0,0 +1,249 @@
+import os
+import threading
+import time
+
+from core import aggregate_cache, data_cache, data_catalog, data_ingest, data_validation, dataset_versions, partition_store, record_index, shared_store, stratified_sample
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError: # Optional dependency: pip install watchdog
+    FileSystemEventHandler = object
+    Observer = None
+
+# ====================================================================================
+# Dataset Folder Watcher
+# ====================================================================================
+# A background watchdog observer over the dataset folders (core.data_catalog.DATASET_SOURCES)
+# keeps the catalog, the caches and the partitioned store in step with the files:
+#   - a CSV that was appended to has only its new rows scanned, cached and stored
+#     (data_catalog.refresh_dataset, data_ingest.extend_cache, partition_store.append_csv)
+#   - a new or rewritten CSV is scanned and cached whole (a rewritten store source has its
+#     old rows dropped from the partitioned store before it is ingested again)
+#   - a deleted store source has its rows dropped from the partitioned store
+#   - each new content of a changeable file that was replaced or appended to is kept as a
+#     version (core.dataset_versions)
+#   - the cache, shared store copy, record index and other derived files of a replaced
+#     version are deleted once no catalog entry uses it any more
+# Events are collected until a file has been quiet for SETTLE_SECONDS, so a file being
+# written is handled once. Each handled change bumps a generation counter that the
+# sidebar polls (changed_since) to rerun sessions showing the changed dataset.
+#
+# One watcher runs per process; without watchdog installed, datasets are still
+# refreshed on the next rerun as before.
+
+SETTLE_SECONDS = 1.0
+STORE_SOURCES = ("generated", "related")  # Catalog sources whose traffic files feed the partitioned store
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+# -------------------------------------------------------------------------------
+class _DatasetWatcher(FileSystemEventHandler):
+    """
+    Collects changed dataset file paths from watchdog events and refreshes them in a worker thread.
+    """
+    def __init__(self):
+        super().__init__()
+        self.observer = Observer()
+        self.watched = set()
+        self.pending = {}        # path -> time of its last event
+        self.versions = {}       # path -> content hash last handled
+        self.generation = 0
+        self.changed = {}        # path (or store name) -> generation of its last change
+        self.condition = threading.Condition()
+
+    # --- Events (observer thread) ---
+    def watch_folders(self):
+        for _, directory, _ in data_catalog.DATASET_SOURCES:
+            if directory not in self.watched and os.path.isdir(directory):
+                self.observer.schedule(self, directory, recursive=True)
+                self.watched.add(directory)
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        if event.is_directory:
+            if event.event_type == "created" and os.path.dirname(os.path.normpath(event.src_path)) in ("", "."):
+                self.watch_folders() # A dataset folder created after start
+            return
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        with self.condition:
+            for path in paths:
+                path = os.path.normpath(os.path.relpath(os.fsdecode(path))) if path else ""
+                if path.endswith(data_catalog.DATASET_EXTENSIONS):
+                    self.pending[path] = time.monotonic()
+            self.condition.notify()
+
+    # --- Refresh (worker thread) ---
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                settled_at = min(self.pending.values()) + SETTLE_SECONDS
+                now = time.monotonic()
+                if now < settled_at:
+                    self.condition.wait(settled_at - now)
+                    continue
+                ready = [path for path, last_event in self.pending.items() if last_event + SETTLE_SECONDS <= now]
+                for path in ready:
+                    del self.pending[path]
+            for path in ready:
+                try:
+                    self.refresh(path)
+                except Exception as e:
+                    print(f"Dataset refresh failed for {path}: {e}")
+
+    def refresh(self, path: str):
+        """
+        Updates the catalog, caches and store after one file changed.
+        """
+        if os.path.isfile(path) and data_ingest.complete_length(path) != os.path.getsize(path):
+            return # Still being written: the rest of the row will trigger another event
+        entry, previous = data_catalog.refresh_dataset(path)
+        if entry is None and previous is None:
+            return # Not a dataset file
+
+        # A page may have refreshed the entry first, so work from the entry's own previous_hash
+        content_hash = entry['content_hash'] if entry is not None else None
+        if entry is not None:
+            cache_dataset(entry)
+            dataset_versions.record_entry(entry)
+            if entry['is_traffic'] and entry['source'] in STORE_SOURCES:
+                self.sync_store(path)
+        elif previous['source'] in STORE_SOURCES:
+            self.sync_store(path) # Deleted: its rows leave the store
+        old_hashes = {previous['content_hash'] if previous else None, entry['previous_hash'] if entry else None}
+        for old_hash in old_hashes - {content_hash, None}:
+            release_version(old_hash)
+        if self.versions.get(path) != content_hash:
+            self.versions[path] = content_hash
+            self.mark_changed(path)
+
+    def sync_store(self, path: str):
+        if update_store(path):
+            self.mark_changed(partition_store.VIOLATION_STORE)
+
+    def sync_all(self):
+        """
+        Catches up with changes made while no watcher was running: refreshes the catalog
+        and brings the store in line with its source files. Versions are not recorded
+        here, only for changes the watcher or a page sees happen.
+        """
+        data_catalog.refresh_catalog()
+        store_paths = [
+            entry['path']
+            for source in STORE_SOURCES
+            for entry in data_catalog.list_datasets(source)
+            if entry['is_traffic']
+        ]
+        deleted_paths = [path for path in partition_store.get_zone_map()['sources'] if not os.path.isfile(path)]
+        for path in store_paths + deleted_paths:
+            try:
+                self.sync_store(path)
+            except Exception as e:
+                print(f"Partition store sync failed for {path}: {e}")
+
+    def mark_changed(self, key: str):
+        with self.condition:
+            self.generation += 1
+            self.changed[key] = self.generation
+
+
+# -------------------------------------------------------------------------------
+def cache_dataset(entry: dict) -> bool:
+    """
+    Makes sure the Parquet cache of a catalog entry exists, parsing only the appended
+    rows when the entry was appended to.
+    """
+    if entry['appended_from'] is not None:
+        return data_ingest.extend_cache(entry['path'], entry['previous_hash'], entry['content_hash'], entry['appended_from'])
+    return data_ingest.build_cache(entry['path'], entry['content_hash'])
+# -------------------------------------------------------------------------------
+def release_version(content_hash: str):
+    """
+    Deletes the cache, shared store copy, record index, validation report, stratified
+    sample and cached aggregates of a dataset version unless a catalog entry still has
+    that content (e.g. a copy of the file in another folder).
+    Sessions still showing it keep their loaded frame.
+    """
+    if any(entry['content_hash'] == content_hash for entry in data_catalog.list_datasets()):
+        return
+    data_cache.remove_cache(content_hash)
+    shared_store.unpublish(content_hash)
+    record_index.remove_index(content_hash)
+    data_validation.remove_report(content_hash)
+    stratified_sample.remove_sample(content_hash)
+    aggregate_cache.remove_dataset(content_hash)
+# -------------------------------------------------------------------------------
+def update_store(path: str) -> bool:
+    """
+    Brings the partitioned store in line with a traffic CSV file: appends its new rows,
+    re-ingests it if it was rewritten, or drops its rows if it was deleted. Then deletes
+    the shared store copy, record index, stratified sample and cached aggregates of the
+    store version this replaced.
+
+    Returns:
+        bool: True if the store changed.
+    """
+    old_version = partition_store.get_zone_map()['version']
+    if os.path.isfile(path):
+        partition_store.append_csv(path)
+    else:
+        partition_store.remove_source(path)
+    if partition_store.get_zone_map()['version'] == old_version:
+        return False
+    old_key = partition_store.get_dataset_key(old_version)
+    shared_store.unpublish(old_key)
+    record_index.remove_index(old_key)
+    stratified_sample.remove_sample(old_key)
+    aggregate_cache.remove_dataset(old_key)
+    return True
+# -------------------------------------------------------------------------------
+def start() -> bool:
+    """
+    Starts the watcher of this process (once; later calls do nothing).
+
+    Returns:
+        bool: True if a watcher is running (False without watchdog).
+    """
+    global _watcher
+    if Observer is None:
+        return False
+    with _watcher_lock:
+        if _watcher is not None:
+            return True
+        watcher = _DatasetWatcher()
+        watcher.watch_folders()
+        watcher.observer.schedule(watcher, ".", recursive=False) # New dataset folders
+        watcher.observer.daemon = True
+        watcher.observer.start()
+
+        def run():
+            try:
+                watcher.sync_all()
+            except Exception as e:
+                print(f"Dataset sync failed: {e}")
+            watcher.run()
+
+        threading.Thread(target=run, name="dataset-watcher", daemon=True).start()
+        _watcher = watcher
+    return True
+# -------------------------------------------------------------------------------
+def get_generation() -> int:
+    """
+    Returns the current change generation (0 without a watcher).
+    """
+    return _watcher.generation if _watcher is not None else 0
+# -------------------------------------------------------------------------------
+def changed_since(generation: int, key: str) -> bool:
+    """
+    True if the watcher handled a change of `key` (a dataset path, or the partitioned
+    store's name) after `generation`.
+    """
+    if _watcher is None:
+        return False
+    with _watcher.condition:
+        return _watcher.changed.get(os.path.normpath(key), 0) > generation
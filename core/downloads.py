@@ -0,0 +1,113 @@
+import os
+
+import pandas as pd
+
+from core import data_cache, data_schema
+
+# ====================================================================================
+# Lazy Downloads
+# ====================================================================================
+# Download buttons are only rendered once the user asks for a download, and what they
+# serve is a file on disk that is encoded at most once per content:
+#   - a dataset as CSV is its stored file, served as is (a dataset stored as Parquet is
+#     written out as CSV once, like a derived table)
+#   - a dataset as Parquet is its stored file when it is one, else it is written once per
+#     content hash to .dataset_cache/downloads/<content hash>.parquet from the cached frame,
+#     with the IDs in their original text and without the temporal columns the schema derives
+#     (the cache file itself stores IDs as numbers and carries those extra columns)
+#   - a derived table (e.g. a custom grouping) is written as CSV in CHUNK_ROWS-row chunks
+#     to .dataset_cache/downloads/<digest of its content>.csv and reused while it exists
+#     (the least recently used files beyond MAX_DOWNLOAD_FILES are removed)
+
+DOWNLOAD_DIR = os.path.join(data_cache.CACHE_DIR, "downloads")
+CHUNK_ROWS = 100_000
+MAX_DOWNLOAD_FILES = 50
+MIME_TYPES = {'csv': "text/csv", 'parquet': "application/vnd.apache.parquet"}
+
+
+# -------------------------------------------------------------------------------
+def _table_digest(df: pd.DataFrame) -> str:
+    """
+    Returns a digest of a table's columns, dtypes and values (index excluded).
+    """
+    digest = data_cache.new_content_digest()
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError: # Unhashable values (lists, dicts), keyed by the text they are written as
+        digest.update(df.to_csv(index=False).encode('utf-8'))
+    return digest.hexdigest()
+# -------------------------------------------------------------------------------
+def _prune():
+    """
+    Removes the least recently used download files beyond MAX_DOWNLOAD_FILES.
+    """
+    files = [entry for entry in os.scandir(DOWNLOAD_DIR) if entry.is_file() and not entry.name.endswith(".tmp")]
+    files.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in files[MAX_DOWNLOAD_FILES:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+# ==================================================================================
+# Public API
+# ==================================================================================
+def dataset_file(path: str, file_format: str = 'csv') -> str:
+    """
+    Returns the file to serve for downloading a dataset.
+
+    Args:
+        path (str): Path of the dataset file.
+        file_format (str): 'csv' or 'parquet'.
+
+    Returns:
+        str: Path of the file to serve, or None if the dataset cannot be stored as Parquet.
+    """
+    if file_format == 'csv':
+        return table_csv(data_cache.read_source(path)) if data_cache.is_parquet_file(path) else path
+    if data_cache.is_parquet_file(path):
+        return path
+
+    content_hash = data_cache.get_file_hash(path)
+    download_path = os.path.join(DOWNLOAD_DIR, f"{content_hash}.v{data_cache.CACHE_FORMAT_VERSION}.parquet")
+    if os.path.exists(download_path):
+        os.utime(download_path) # Marks it as recently used
+        return download_path
+
+    source_columns = list(pd.read_csv(path, nrows=0).columns)
+    df = data_schema.drop_derived_columns(data_schema.format_ids(data_cache.load_dataset(path, content_hash)), source_columns)
+    if not data_cache.write_cache(df, download_path):
+        return None
+    _prune()
+    return download_path
+# -------------------------------------------------------------------------------
+def table_csv(df: pd.DataFrame) -> str:
+    """
+    Returns a CSV file of a table (index excluded), written in chunks the first time
+    this content is downloaded.
+
+    Args:
+        df (pd.DataFrame): The table to download.
+
+    Returns:
+        str: Path of the CSV file.
+    """
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    path = os.path.join(DOWNLOAD_DIR, f"{_table_digest(df)}.csv")
+    if os.path.exists(path):
+        os.utime(path) # Marks it as recently used
+        return path
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            for start in range(0, max(len(df), 1), CHUNK_ROWS):
+                df.iloc[start:start + CHUNK_ROWS].to_csv(f, index=False, header=(start == 0))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _prune()
+    return path
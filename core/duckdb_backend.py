@@ -0,0 +1,167 @@
+import os
+import threading
+
+import pandas as pd
+
+from core import data_cache, dataframe_backend
+
+try:
+    import duckdb
+except ImportError: # Optional dependency: pip install duckdb
+    duckdb = None
+
+# ====================================================================================
+# Optional DuckDB Execution Backend
+# ====================================================================================
+# SQL versions of the grouped aggregations in core.utils. A source is either a DataFrame
+# (scanned in place by DuckDB, only the referenced columns) or a Parquet/CSV file or glob,
+# which DuckDB reads itself with projection and Date filter pushdown, spilling to disk
+# when a query does not fit in memory - so files larger than RAM can be aggregated.
+#
+# Derived columns and row filters become one SQL query, so DuckDB's optimiser plans the
+# derive -> filter -> group steps together. Results are the raw grouped rows;
+# core.dataframe_backend casts them to pandas' types.
+#
+# Selected with the environment variable TRAFFIC_DASHBOARD_BACKEND=duckdb.
+
+SPILL_DIR = os.path.join(data_cache.CACHE_DIR, "duckdb_spill")
+
+SQL_AGGREGATES = {
+    'count': "COUNT({col})",
+    'sum': "COALESCE(SUM({col}), 0)", # pandas sums an all-missing group to 0 (cast to BIGINT for integer columns)
+    'mean': "AVG({col})",
+    'min': "MIN({col})",
+    'max': "MAX({col})",
+    'std': "STDDEV_SAMP({col})",
+}
+
+SQL_COMPARISONS = {'==': "=", '!=': "<>"} # Other comparison operators are spelled the same
+
+_connection = None
+_connection_lock = threading.Lock()
+
+
+# -------------------------------------------------------------------------------
+def is_available() -> bool:
+    return duckdb is not None
+# -------------------------------------------------------------------------------
+def _cursor():
+    """
+    Returns a cursor on the shared in-process database (one cursor per query, so
+    Streamlit sessions running in different threads do not share one).
+    """
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            os.makedirs(SPILL_DIR, exist_ok=True)
+            _connection = duckdb.connect(config={'temp_directory': SPILL_DIR})
+    return _connection.cursor()
+# -------------------------------------------------------------------------------
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+# -------------------------------------------------------------------------------
+def _operand(value) -> str:
+    return _quote(value) if isinstance(value, str) else repr(value)
+# -------------------------------------------------------------------------------
+def _query(source, columns: list, select: str, group_cols: list, derive=None, where=None, start=None, end=None) -> pd.DataFrame:
+    """
+    Runs `SELECT <group cols>, <select> ... GROUP BY <group cols>` over a source.
+
+    Rows with a missing group key are skipped (like pandas groupby), and the result is
+    ordered by the group keys.
+
+    Args:
+        source: DataFrame, or path/glob of Parquet or CSV files.
+        columns (list): Columns the query reads (stored or derived; only these are scanned).
+        select (str): Aggregate expressions.
+        group_cols (list): Group-by columns.
+        derive, where: Derived columns and row filters (see core.dataframe_backend).
+        start, end: Optional inclusive 'Date' bounds, pushed down to the scan.
+    """
+    cursor = _cursor()
+    try:
+        from_clause = _from_clause(cursor, source, columns, derive, start is not None or end is not None)
+        keys = ", ".join(_quote(col) for col in group_cols)
+        conditions = [f"{_quote(col)} IS NOT NULL" for col in group_cols]
+        parameters = []
+        for col, op, value in where or []:
+            conditions.append(f"{_quote(col)} {SQL_COMPARISONS.get(op, op)} ?")
+            parameters.append(value)
+        if start is not None:
+            conditions.append("CAST(\"Date\" AS TIMESTAMP) >= ?")
+            parameters.append(pd.Timestamp(start).to_pydatetime())
+        if end is not None:
+            conditions.append("CAST(\"Date\" AS TIMESTAMP) <= ?")
+            parameters.append(pd.Timestamp(end).to_pydatetime())
+
+        sql = (
+            f"SELECT {keys}, {select} FROM {from_clause} "
+            f"WHERE {' AND '.join(conditions)} GROUP BY {keys} ORDER BY {keys}"
+        )
+        return cursor.execute(sql, parameters).df()
+    finally:
+        cursor.close()
+# -------------------------------------------------------------------------------
+def _from_clause(cursor, source, columns: list, derive: dict = None, dated: bool = False) -> str:
+    """
+    Makes a source readable by the cursor and returns the FROM clause that scans it,
+    with the derived columns added.
+    """
+    if isinstance(source, pd.DataFrame):
+        stored = dataframe_backend.source_columns(columns, derive) + (['Date'] if dated else [])
+        cursor.register('source_frame', source[list(dict.fromkeys(stored))])
+        from_clause = "source_frame"
+    else:
+        path = str(source).replace("'", "''")
+        if path.endswith(".csv"):
+            from_clause = f"read_csv('{path}', auto_detect=true)"
+        else:
+            from_clause = f"read_parquet('{path}')"
+    if not derive:
+        return from_clause
+    derived = ", ".join(
+        f"{_operand(left)} {op} {_operand(right)} AS {_quote(name)}"
+        for name, (left, op, right) in derive.items()
+    )
+    return f"(SELECT *, {derived} FROM {from_clause})"
+# -------------------------------------------------------------------------------
+def _integer_columns(source, columns: list, derive: dict = None) -> set:
+    """
+    Returns which of `columns` DuckDB reads as integers (schema only, no data is scanned).
+    """
+    cursor = _cursor()
+    try:
+        from_clause = _from_clause(cursor, source, columns, derive)
+        described = cursor.execute(f"DESCRIBE SELECT * FROM {from_clause}").fetchall()
+    finally:
+        cursor.close()
+    integer_types = ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'UTINYINT', 'USMALLINT', 'UINTEGER', 'UBIGINT')
+    return {name for name, column_type, *_ in described if column_type in integer_types}
+
+
+# ==================================================================================
+# Aggregations (see core.dataframe_backend for the arguments)
+# ==================================================================================
+def aggregate(source, group_cols: list, agg_cols: list, agg_funcs: list, derive=None, where=None, start=None, end=None) -> pd.DataFrame:
+    """
+    Groups by `group_cols` and applies every function of `agg_funcs` to every column of
+    `agg_cols`. Result columns are named '<column>_<function>'.
+    """
+    columns = group_cols + agg_cols + [col for col, _, _ in where or []]
+    integer_columns = _integer_columns(source, columns, derive) if 'sum' in agg_funcs else set()
+    expressions = []
+    for col in agg_cols:
+        for func in agg_funcs:
+            expression = SQL_AGGREGATES[func].format(col=_quote(col))
+            if func == 'sum' and col in integer_columns:
+                expression = f"CAST({expression} AS BIGINT)"
+            expressions.append(f"{expression} AS {_quote(f'{col}_{func}')}")
+    return _query(source, columns, ", ".join(expressions), group_cols, derive, where, start, end)
+# -------------------------------------------------------------------------------
+def count_rows(source, group_cols: list, count_col: str = None, derive=None, where=None, start=None, end=None) -> pd.DataFrame:
+    """
+    Number of rows per group (non-missing values of `count_col` if given), as 'Count'.
+    """
+    counted = _quote(count_col) if count_col else "*"
+    columns = group_cols + ([count_col] if count_col else []) + [col for col, _, _ in where or []]
+    return _query(source, columns, f"COUNT({counted}) AS \"Count\"", group_cols, derive, where, start, end)
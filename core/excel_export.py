@@ -0,0 +1,236 @@
+import os
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+import pandas as pd
+
+# ====================================================================================
+# Streaming Excel Export
+# ====================================================================================
+# Writes several tables into one .xlsx workbook in constant memory. The workbook parts
+# are written straight into the zip file (zipfile streams each worksheet entry), and the
+# cells of a worksheet are rendered as SpreadsheetML WRITE_CHUNK_ROWS rows at a time with
+# vectorised string operations, so no cell objects are ever built (unlike openpyxl) and a
+# million-row table costs one chunk of memory. Cells are typed from the column dtypes:
+#   numbers and booleans  - numeric/boolean cells
+#   datetimes             - date serial numbers shown with DATE_FORMAT
+#   anything else         - inline strings
+# Missing values leave the cell empty. A table longer than Excel's row limit continues on
+# further sheets ("Name (2)", ...).
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXCEL_MAX_ROWS = 1_048_576  # Rows per worksheet, header included
+EXCEL_MAX_CHARS = 32_767    # Characters per cell
+WRITE_CHUNK_ROWS = 20_000
+SHEET_NAME_LENGTH = 31
+INVALID_SHEET_CHARACTERS = "[]:*?/\\"
+INVALID_XML_CHARACTERS = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+DATE_FORMAT = "yyyy-mm-dd hh:mm:ss"
+EXCEL_EPOCH = np.datetime64("1899-12-30", "ns")
+
+# Cell styles (positions in the cellXfs of STYLES_XML)
+DATE_STYLE = 1
+HEADER_STYLE = 2
+
+SPREADSHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+RELATIONSHIP_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_RELATIONSHIP_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+CONTENT_TYPES_XML = (
+    XML_DECLARATION
+    + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+ROOT_RELS_XML = (
+    XML_DECLARATION
+    + f'<Relationships xmlns="{PACKAGE_RELATIONSHIP_NS}">'
+    f'<Relationship Id="rId1" Type="{RELATIONSHIP_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+STYLES_XML = (
+    XML_DECLARATION
+    + f'<styleSheet xmlns="{SPREADSHEET_NS}">'
+    f'<numFmts count="1"><numFmt numFmtId="164" formatCode="{DATE_FORMAT}"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="3"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FFDDEBF7"/><bgColor indexed="64"/></patternFill></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="2" borderId="0" xfId="0" applyFont="1" applyFill="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+# -------------------------------------------------------------------------------
+def _column_letter(i: int) -> str:
+    """
+    Returns the Excel column letters of a 0-based column number (0 -> A, 26 -> AA).
+    """
+    letters = ""
+    i += 1
+    while i:
+        i, remainder = divmod(i - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+# -------------------------------------------------------------------------------
+def _sheet_name(name: str, part: int, used: set) -> str:
+    """
+    Returns a valid, unused worksheet name (31 characters, no []:*?/\\).
+    """
+    name = "".join(" " if char in INVALID_SHEET_CHARACTERS else char for char in str(name)).strip() or "Sheet"
+    suffix = f" ({part})" if part > 1 else ""
+    candidate = name[:SHEET_NAME_LENGTH - len(suffix)] + suffix
+    while candidate.lower() in used:
+        part += 1
+        suffix = f" ({part})"
+        candidate = name[:SHEET_NAME_LENGTH - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+# -------------------------------------------------------------------------------
+def _text(column: pd.Series) -> np.ndarray:
+    """
+    Returns the values of a column as XML-escaped text (illegal control characters dropped).
+    """
+    text = column.astype(object).astype(str).str.slice(0, EXCEL_MAX_CHARS)
+    text = text.str.replace("&", "&amp;", regex=False).str.replace("<", "&lt;", regex=False).str.replace(">", "&gt;", regex=False)
+    return text.str.replace(INVALID_XML_CHARACTERS, "", regex=True).to_numpy(dtype=object)
+# -------------------------------------------------------------------------------
+def _cells(column: pd.Series, refs: np.ndarray) -> np.ndarray:
+    """
+    Returns the SpreadsheetML cell of every value of a column chunk ('' when missing).
+
+    Args:
+        column (pd.Series): One chunk of a table column.
+        refs (np.ndarray): Cell references of the chunk's rows ('A2', 'A3', ...).
+    """
+    dtype = column.dtype
+    missing = column.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(dtype):
+        values = np.where(column.fillna(False).to_numpy(dtype=bool), "1", "0").astype(object)
+        cells = '<c r="' + refs + '" t="b"><v>' + values + '</v></c>'
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, 'tz', None) is not None:
+            column = column.dt.tz_localize(None) # Wall-clock time, Excel has no time zones
+        days = (column.to_numpy(dtype='datetime64[ns]') - EXCEL_EPOCH) / np.timedelta64(1, 'D')
+        cells = '<c r="' + refs + f'" s="{DATE_STYLE}"><v>' + days.astype(str).astype(object) + '</v></c>'
+    elif pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype):
+        if pd.api.types.is_float_dtype(dtype):
+            values = column.to_numpy(dtype=float, na_value=np.nan)
+            missing = missing | ~np.isfinite(values) # inf has no numeric cell either
+        else:
+            values = column.fillna(0).to_numpy()
+        cells = '<c r="' + refs + '"><v>' + values.astype(str).astype(object) + '</v></c>'
+    else:
+        cells = '<c r="' + refs + '" t="inlineStr"><is><t xml:space="preserve">' + _text(column) + '</t></is></c>'
+    cells[missing] = ""
+    return cells
+# -------------------------------------------------------------------------------
+def _write_sheet(archive: zipfile.ZipFile, number: int, df: pd.DataFrame):
+    """
+    Streams one worksheet part (header row + the rows of df) into the archive.
+    """
+    letters = [_column_letter(i) for i in range(len(df.columns))]
+    widths = "".join(
+        f'<col min="{i + 1}" max="{i + 1}" width="{max(10, min(len(col) + 2, 40))}" customWidth="1"/>'
+        for i, col in enumerate(df.columns)
+    )
+    header = "".join(
+        f'<c r="{letter}1" s="{HEADER_STYLE}" t="inlineStr"><is><t>{escape(col)}</t></is></c>'
+        for letter, col in zip(letters, df.columns)
+    )
+    with archive.open(f"xl/worksheets/sheet{number}.xml", "w", force_zip64=True) as part:
+        part.write((
+            XML_DECLARATION
+            + f'<worksheet xmlns="{SPREADSHEET_NS}"><sheetViews><sheetView workbookViewId="0">'
+            '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+            + (f'<cols>{widths}</cols>' if widths else "")
+            + f'<sheetData><row r="1">{header}</row>'
+        ).encode("utf-8"))
+        for start in range(0, len(df), WRITE_CHUNK_ROWS):
+            chunk = df.iloc[start:start + WRITE_CHUNK_ROWS]
+            row_numbers = np.arange(start + 2, start + 2 + len(chunk)).astype(str).astype(object)
+            rows = '<row r="' + row_numbers + '">'
+            for letter, (_, column) in zip(letters, chunk.items()):
+                rows = rows + _cells(column, letter + row_numbers)
+            part.write(("</row>".join(rows) + "</row>").encode("utf-8"))
+        part.write(b'</sheetData></worksheet>')
+
+
+# ==================================================================================
+# Public API
+# ==================================================================================
+def write_workbook(sheets: dict, path: str) -> str:
+    """
+    Writes tables into an .xlsx workbook, one worksheet per table.
+
+    Args:
+        sheets (dict): Sheet name -> DataFrame (empty or None tables are skipped). A named
+                       index (pivot tables) is written as the first columns, others are left out.
+        path (str): Workbook file to write (replaced once complete).
+
+    Returns:
+        str: path.
+    """
+    names, used = [], set()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+            for name, df in sheets.items():
+                if df is None or df.empty:
+                    continue
+                if any(name is not None for name in df.index.names):
+                    df = df.reset_index() # Named row labels (pivot tables) become the first columns
+                df = df.set_axis([str(col) for col in df.columns], axis=1)
+                for part, start in enumerate(range(0, len(df), EXCEL_MAX_ROWS - 1), start=1):
+                    names.append(_sheet_name(name, part, used))
+                    _write_sheet(archive, len(names), df.iloc[start:start + EXCEL_MAX_ROWS - 1])
+            if not names:
+                names.append("Report")
+                _write_sheet(archive, 1, pd.DataFrame({"No data": []}))
+
+            sheet_numbers = range(1, len(names) + 1)
+            archive.writestr("[Content_Types].xml", CONTENT_TYPES_XML.format(sheets="".join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in sheet_numbers
+            )))
+            archive.writestr("_rels/.rels", ROOT_RELS_XML)
+            archive.writestr("xl/styles.xml", STYLES_XML)
+            archive.writestr("xl/workbook.xml", (
+                XML_DECLARATION
+                + f'<workbook xmlns="{SPREADSHEET_NS}" xmlns:r="{RELATIONSHIP_NS}"><sheets>'
+                + "".join(f'<sheet name={quoteattr(name)} sheetId="{i}" r:id="rId{i}"/>' for i, name in zip(sheet_numbers, names))
+                + '</sheets></workbook>'
+            ))
+            archive.writestr("xl/_rels/workbook.xml.rels", (
+                XML_DECLARATION
+                + f'<Relationships xmlns="{PACKAGE_RELATIONSHIP_NS}">'
+                + "".join(f'<Relationship Id="rId{i}" Type="{RELATIONSHIP_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>' for i in sheet_numbers)
+                + f'<Relationship Id="rId{len(names) + 1}" Type="{RELATIONSHIP_NS}/styles" Target="styles.xml"/>'
+                + '</Relationships>'
+            ))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+# -------------------------------------------------------------------------------
+def export_workbook(sheets: dict) -> bytes:
+    """
+    Returns the bytes of a workbook written by write_workbook (through a temporary file,
+    so only the compressed workbook is held in memory).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_workbook(sheets, os.path.join(directory, "report.xlsx"))
+        with open(path, "rb") as f:
+            return f.read()
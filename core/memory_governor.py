@@ -0,0 +1,224 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core import shared_store
+
+# ====================================================================================
+# Process-Wide Memory Budget
+# ====================================================================================
+# Every frame this process keeps around between reruns is registered here with its deep
+# memory size (pandas memory_usage(deep=True), measured once per frame):
+#   - datasets held by the sidebar loaders (st.cache_resource)
+#   - derived frames cached per dataset (unions, versions, aggregates)
+#   - DataFrames a session keeps in st.session_state (e.g. the custom map aggregate)
+# Entries are kept in least-recently-used order; when the total goes over the budget the
+# oldest entries are evicted through the callback they were registered with (clearing
+# that one cache entry, or dropping that session key) until the total fits again. The
+# entry being used right now is never evicted, even if it alone is over the budget.
+# Entries whose frames were garbage collected (cache entries dropped by Streamlit's own
+# max_entries, sessions that ended) leave the registry by themselves.
+#
+# A session key can only be dropped by its own session on its next run, so a deferred
+# entry stays registered (pending, and still counted) until the holder calls forget.
+# Columns that are still views of a shared store mapping (core.shared_store.attach) are
+# reported as mapped instead of counted: the OS keeps one copy of them for all processes,
+# so evicting them frees little.
+#
+# The budget is DASHBOARD_MEMORY_BUDGET_MB (megabytes), by default half the machine's RAM.
+
+BUDGET_ENV_VAR = "DASHBOARD_MEMORY_BUDGET_MB"
+DEFAULT_BUDGET_FRACTION = 0.5  # Of physical RAM, when the variable is not set
+FALLBACK_BUDGET_BYTES = 4 * 1024 ** 3  # When physical RAM cannot be read
+
+_entries = OrderedDict()  # (kind, key) -> _Entry, least recently used first
+_lock = threading.RLock()
+_budget = None
+
+
+# -------------------------------------------------------------------------------
+class _Entry:
+    """
+    One registered value: its frames (weakly referenced), their size and how to evict it.
+    """
+    def __init__(self, frames: list, evict, deferred: bool = False):
+        self.refs = [weakref.ref(frame) for frame in frames]
+        sizes = [frame_size(frame) for frame in frames]
+        self.size = sum(private for private, _ in sizes)
+        self.mapped = sum(mapped for _, mapped in sizes)
+        self.evict = evict
+        self.deferred = deferred
+        self.pending = False # Evicted, but the holder has not released the value yet
+
+    def is_alive(self) -> bool:
+        return any(ref() is not None for ref in self.refs)
+
+    def holds(self, frames: list) -> bool:
+        return len(frames) == len(self.refs) and all(ref() is frame for ref, frame in zip(self.refs, frames))
+# -------------------------------------------------------------------------------
+def _frames_in(value) -> list:
+    """
+    Returns the DataFrames/Series of a value: the value itself, or the items of a
+    dict, list or tuple (one level deep).
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return [value]
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return [item for item in value if isinstance(item, (pd.DataFrame, pd.Series))]
+    return []
+# -------------------------------------------------------------------------------
+def _is_arrow_view(series: pd.Series) -> bool:
+    """
+    True if a column's values are still a zero-copy view of an Arrow buffer, not an
+    array numpy allocated.
+    """
+    values = series.array.codes if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+    while isinstance(values, np.ndarray):
+        values = values.base
+    return values is not None
+# -------------------------------------------------------------------------------
+def _physical_memory() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError): # Not available on Windows
+        return None
+# -------------------------------------------------------------------------------
+def _prune():
+    """
+    Drops entries whose frames were garbage collected.
+    """
+    for name in [name for name, entry in _entries.items() if not entry.is_alive()]:
+        del _entries[name]
+# -------------------------------------------------------------------------------
+def _enforce(keep: tuple):
+    """
+    Evicts least recently used entries (other than `keep`) until the total fits the budget.
+    Deferred entries are only marked pending, so they keep counting until released.
+    """
+    _prune()
+    used = sum(entry.size for entry in _entries.values())
+    for name in list(_entries):
+        if used <= get_budget():
+            break
+        entry = _entries[name]
+        if name == keep or entry.pending:
+            continue
+        if entry.deferred:
+            entry.pending = True
+        else:
+            del _entries[name]
+            used -= entry.size
+        try:
+            entry.evict()
+        except Exception as e:
+            print(f"Memory governor could not evict {name}: {e}")
+
+
+# ==================================================================================
+# Public API
+# ==================================================================================
+def frame_size(frame) -> tuple:
+    """
+    Returns the deep memory size of a DataFrame or Series in bytes (index and the
+    Python objects of object columns included).
+
+    Returns:
+        tuple: (private bytes, mapped bytes) - mapped bytes are the columns of a frame
+               from core.shared_store.attach that are still views of the mapping.
+    """
+    try:
+        if not isinstance(frame, pd.DataFrame):
+            return int(frame.memory_usage(index=True, deep=True)), 0
+        usage = frame.memory_usage(index=True, deep=True).to_numpy() # Index first, then each column
+    except (TypeError, ValueError):
+        return 0, 0
+    mapped = 0
+    if shared_store.MAPPED_ATTR in frame.attrs:
+        mapped = sum(int(usage[1 + i]) for i in range(frame.shape[1]) if _is_arrow_view(frame.iloc[:, i]))
+    return int(usage.sum()) - mapped, mapped
+# -------------------------------------------------------------------------------
+def get_budget() -> int:
+    """
+    Returns the memory budget in bytes (DASHBOARD_MEMORY_BUDGET_MB, or half the RAM).
+    """
+    global _budget
+    if _budget is None:
+        configured = os.environ.get(BUDGET_ENV_VAR, "").strip()
+        try:
+            _budget = int(float(configured) * 1024 ** 2) if configured else None
+        except ValueError:
+            print(f"Ignoring {BUDGET_ENV_VAR}={configured!r}: not a number of megabytes.")
+        if _budget is None:
+            physical = _physical_memory()
+            _budget = int(physical * DEFAULT_BUDGET_FRACTION) if physical else FALLBACK_BUDGET_BYTES
+    return _budget
+# -------------------------------------------------------------------------------
+def set_budget(budget_bytes: int):
+    """
+    Changes the memory budget (bytes) and evicts what no longer fits.
+    """
+    global _budget
+    with _lock:
+        _budget = int(budget_bytes)
+        _enforce(keep=None)
+# -------------------------------------------------------------------------------
+def track(kind: str, key: tuple, value, evict, deferred: bool = False):
+    """
+    Registers a value that stays in memory between reruns, or marks it as just used,
+    then evicts least recently used values while the total is over the budget.
+
+    Args:
+        kind (str): What holds the value ('dataset', 'union', 'session', ...).
+        key (tuple): Hashable identity of the value within its kind (e.g. the cache key).
+        value: A DataFrame/Series, or a dict/list/tuple holding some. Other values are ignored.
+        evict (callable): Called without arguments to release the value.
+        deferred (bool): True if evict only asks the holder to release the value later;
+                         the entry then stays counted until forget is called.
+
+    Returns:
+        The value, unchanged.
+    """
+    frames = _frames_in(value)
+    if not frames:
+        return value
+    name = (kind, key)
+    with _lock:
+        entry = _entries.get(name)
+        if entry is None or not entry.holds(frames):
+            entry = _entries[name] = _Entry(frames, evict, deferred)
+        entry.evict = evict
+        entry.deferred = deferred
+        _entries.move_to_end(name)
+        _enforce(keep=name)
+    return value
+# -------------------------------------------------------------------------------
+def forget(kind: str, key: tuple):
+    """
+    Removes a value from the registry without evicting it (it was released elsewhere,
+    e.g. a pending deferred entry its holder dropped).
+    """
+    with _lock:
+        _entries.pop((kind, key), None)
+# -------------------------------------------------------------------------------
+def get_usage() -> dict:
+    """
+    Returns the current memory use of the registered values.
+
+    Returns:
+        dict: {'budget': bytes, 'used': bytes, 'entries': [{'kind', 'key', 'bytes', 'mapped', 'pending'}]}
+              with the most recently used entry first. 'mapped' bytes (shared store
+              views) are not part of 'bytes' or 'used'.
+    """
+    with _lock:
+        _prune()
+        entries = [
+            {'kind': kind, 'key': key, 'bytes': entry.size, 'mapped': entry.mapped, 'pending': entry.pending}
+            for (kind, key), entry in reversed(_entries.items())
+        ]
+    return {'budget': get_budget(), 'used': sum(entry['bytes'] for entry in entries), 'entries': entries}
@@ -0,0 +1,468 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core import data_cache, data_ingest
+
+# ====================================================================================
+# Date-Partitioned Violation Store
+# ====================================================================================
+# An append-only store that lays violations out in one folder per month of 'Date':
+#
+#   .dataset_cache/partitions/<name>.v1/2023-01/part-....parquet
+#                                      /2023-02/part-....parquet
+#                                      /undated/part-....parquet   (unparseable dates)
+#                                      /_zone_map.json
+#
+# The zone map records every part file with its row count and min/max Date, so a date
+# range read only opens the files that can contain matching rows. Each append adds new
+# part files; small files of the same month are merged later by compact(), which runs
+# in a background thread after appends.
+#
+# The zone map also keeps a ledger of the CSV files appended with append_csv (bytes and
+# rows ingested so far), so appending a file again only adds the rows written to it
+# since - which lets the dataset watcher keep the store in sync with growing files.
+# Every part records the CSV file its rows came from, so the rows of a file that was
+# rewritten or deleted can be dropped (remove_source) before it is ingested again.
+
+STORE_DIR = os.path.join(data_cache.CACHE_DIR, "partitions")
+STORE_FORMAT_VERSION = 3  # Bump when the layout changes to ignore old stores
+VIOLATION_STORE = "violations"
+ZONE_MAP_FILE = "_zone_map.json"
+LOCK_FILE = "_lock"
+LOCK_STALE_SECONDS = 300
+UNDATED_PARTITION = "undated"
+COMPACT_TARGET_ROWS = 250_000  # Files smaller than this are merged with their neighbours
+FINGERPRINT_BYTES = 64 * 1024  # Bytes hashed at the start and at the end of the ingested part of a CSV
+
+_compaction_threads = {}
+_compaction_guard = threading.Lock()
+
+
+# -------------------------------------------------------------------------------
+def get_store_path(name: str = VIOLATION_STORE) -> str:
+    """
+    Returns the folder of a named store.
+    """
+    return os.path.join(STORE_DIR, f"{name}.v{STORE_FORMAT_VERSION}")
+# -------------------------------------------------------------------------------
+def get_dataset_key(version: int, name: str = VIOLATION_STORE) -> str:
+    """
+    Returns the dataset key of one version of a store, used by the per-dataset caches
+    (record index, shared store, samples, aggregates). It includes the store format, so a
+    rebuilt store never reuses the files of an older one.
+    """
+    return f"{name}.v{STORE_FORMAT_VERSION}-{version}"
+# -------------------------------------------------------------------------------
+@contextmanager
+def store_lock(store_path: str):
+    """
+    Cross-process lock around zone map (or other store folder metadata) updates, using
+    a lock file created exclusively. A lock older than LOCK_STALE_SECONDS is treated as
+    left over from a crash.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    lock_path = os.path.join(store_path, LOCK_FILE)
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > LOCK_STALE_SECONDS:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+# -------------------------------------------------------------------------------
+def _write_zone_map(store_path: str, zone_map: dict):
+    tmp_path = os.path.join(store_path, f"{ZONE_MAP_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(zone_map, f)
+    os.replace(tmp_path, os.path.join(store_path, ZONE_MAP_FILE))
+# -------------------------------------------------------------------------------
+def get_zone_map(name: str = VIOLATION_STORE) -> dict:
+    """
+    Returns the zone map of a store: {'version': int, 'parts': [...], 'sources': {...}},
+    where each part is {'partition', 'file', 'rows', 'min_date', 'max_date', 'source'}
+    (dates are ISO strings, source is the CSV path the rows came from or None) and sources
+    maps each appended CSV path to {'bytes', 'rows', 'fingerprint'}.
+    An empty store has no parts.
+    """
+    try:
+        with open(os.path.join(get_store_path(name), ZONE_MAP_FILE)) as f:
+            zone_map = json.load(f)
+    except FileNotFoundError:
+        zone_map = {'version': 0, 'parts': []}
+    zone_map.setdefault('sources', {})
+    return zone_map
+# -------------------------------------------------------------------------------
+def store_exists(name: str = VIOLATION_STORE) -> bool:
+    return bool(get_zone_map(name)['parts'])
+# -------------------------------------------------------------------------------
+def _parse_dates(df: pd.DataFrame) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(df['Date']):
+        return df['Date']
+    return pd.to_datetime(df['Date'], errors='coerce')
+# -------------------------------------------------------------------------------
+def _write_part(store_path: str, partition: str, df: pd.DataFrame, dates: pd.Series, source: str = None) -> dict:
+    """
+    Writes one part file and returns its zone map entry.
+    """
+    os.makedirs(os.path.join(store_path, partition), exist_ok=True)
+    file_name = f"part-{time.time_ns()}-{os.getpid()}-{threading.get_ident()}.parquet"
+    relative_path = os.path.join(partition, file_name)
+    df.to_parquet(os.path.join(store_path, relative_path), index=False, **data_cache.PARQUET_WRITE_OPTIONS)
+    valid_dates = dates.dropna()
+    return {
+        'partition': partition,
+        'file': relative_path,
+        'rows': len(df),
+        'min_date': valid_dates.min().date().isoformat() if not valid_dates.empty else None,
+        'max_date': valid_dates.max().date().isoformat() if not valid_dates.empty else None,
+        'source': source,
+    }
+
+
+# -------------------------------------------------------------------------------
+def _write_parts(store_path: str, df: pd.DataFrame, source: str = None) -> list:
+    """
+    Writes violations as one part file per month and returns their zone map entries
+    (not registered yet).
+    """
+    dates = _parse_dates(df)
+    partitions = dates.dt.strftime('%Y-%m').fillna(UNDATED_PARTITION)
+    return [
+        _write_part(store_path, partition, part_df, dates.loc[part_df.index], source)
+        for partition, part_df in df.groupby(partitions.to_numpy(), sort=True)
+    ]
+# -------------------------------------------------------------------------------
+def _remove_parts(store_path: str, parts: list):
+    for part in parts:
+        try:
+            os.remove(os.path.join(store_path, part['file']))
+        except FileNotFoundError:
+            pass
+# -------------------------------------------------------------------------------
+def _fingerprint(path: str, size: int) -> str:
+    """
+    Hashes the first and the last FINGERPRINT_BYTES of a file's first `size` bytes, to
+    notice when an ingested CSV was rewritten rather than appended to.
+    """
+    digest = data_cache.new_content_digest()
+    with open(path, "rb") as f:
+        digest.update(f.read(min(size, FINGERPRINT_BYTES)))
+        f.seek(max(size - FINGERPRINT_BYTES, 0))
+        digest.update(f.read(min(size, FINGERPRINT_BYTES)))
+    return digest.hexdigest()
+# -------------------------------------------------------------------------------
+def _source_key(path: str) -> str:
+    return os.path.normpath(os.path.relpath(path))
+
+
+# ==================================================================================
+# Writing
+# ==================================================================================
+def append(df: pd.DataFrame, name: str = VIOLATION_STORE, compact_after: bool = True) -> int:
+    """
+    Appends violations to the store as new monthly part files.
+
+    Args:
+        df (pd.DataFrame): Violations with a 'Date' column.
+        name (str): Store name.
+        compact_after (bool): Start a background compaction when appends left small files.
+
+    Returns:
+        int: Number of rows appended.
+    """
+    if df.empty:
+        return 0
+    store_path = get_store_path(name)
+    new_parts = _write_parts(store_path, df)
+
+    with store_lock(store_path):
+        zone_map = get_zone_map(name)
+        zone_map['parts'].extend(new_parts)
+        zone_map['version'] += 1
+        _write_zone_map(store_path, zone_map)
+
+    if compact_after:
+        compact_in_background(name)
+    return len(df)
+# -------------------------------------------------------------------------------
+def append_csv(path: str, name: str = VIOLATION_STORE) -> int:
+    """
+    Appends the rows of a traffic violation CSV that are not in the store yet, block by
+    block (bounded memory), then compacts the resulting small files in the background.
+
+    The ledger in the zone map remembers how much of each file was ingested, so calling
+    this again after rows were appended to the file adds just those rows, and calling it
+    twice adds nothing. A row still being written (no line break yet) is left for the
+    next call. A file rewritten since it was ingested (shorter, or different ingested
+    bytes) has its old rows dropped (remove_source) and is ingested again.
+
+    Returns:
+        int: Number of rows appended.
+    """
+    store_path = get_store_path(name)
+    key = _source_key(path)
+    ingested = get_zone_map(name)['sources'].get(key, {'bytes': 0, 'rows': 0})
+    start = ingested['bytes']
+    end = data_ingest.complete_length(path)
+    if start and (end < start or _fingerprint(path, start) != ingested['fingerprint']):
+        print(f"Partition store re-ingests {path}: the file was rewritten after it was ingested.")
+        remove_source(path, name)
+        ingested = {'bytes': 0, 'rows': 0}
+        start = 0
+    if end <= start:
+        return 0
+
+    new_parts, rows = [], 0
+    try:
+        for block in data_ingest.iter_blocks(path, start, end):
+            if not block.empty:
+                new_parts.extend(_write_parts(store_path, block, key))
+                rows += len(block)
+    except Exception:
+        _remove_parts(store_path, new_parts)
+        raise
+
+    with store_lock(store_path):
+        zone_map = get_zone_map(name)
+        if zone_map['sources'].get(key, {'bytes': 0})['bytes'] != start:
+            registered = False # Another append of the same file got there first
+        else:
+            zone_map['parts'].extend(new_parts)
+            zone_map['sources'][key] = {'bytes': end, 'rows': ingested['rows'] + rows, 'fingerprint': _fingerprint(path, end)}
+            zone_map['version'] += 1
+            _write_zone_map(store_path, zone_map)
+            registered = True
+    if not registered:
+        _remove_parts(store_path, new_parts)
+        return 0
+
+    compact_in_background(name)
+    return rows
+# -------------------------------------------------------------------------------
+def remove_source(path: str, name: str = VIOLATION_STORE) -> int:
+    """
+    Drops the rows a CSV file added to the store (the file was rewritten or deleted)
+    and forgets how much of it was ingested.
+
+    Returns:
+        int: Number of rows removed.
+    """
+    store_path = get_store_path(name)
+    key = _source_key(path)
+    with store_lock(store_path):
+        zone_map = get_zone_map(name)
+        removed = [part for part in zone_map['parts'] if part.get('source') == key]
+        if not removed and key not in zone_map['sources']:
+            return 0
+        zone_map['parts'] = [part for part in zone_map['parts'] if part.get('source') != key]
+        zone_map['sources'].pop(key, None)
+        zone_map['version'] += 1
+        _write_zone_map(store_path, zone_map)
+    _remove_parts(store_path, removed)
+    return sum(part['rows'] for part in removed)
+# -------------------------------------------------------------------------------
+def compact(name: str = VIOLATION_STORE) -> int:
+    """
+    Merges the small part files of each month into one file per source CSV (so the rows
+    of a file can still be dropped on their own).
+
+    Returns:
+        int: Number of part files removed.
+    """
+    store_path = get_store_path(name)
+    removed_files = []
+    with store_lock(store_path):
+        zone_map = get_zone_map(name)
+        by_partition = {}
+        for part in zone_map['parts']:
+            by_partition.setdefault((part['partition'], part.get('source') or ""), []).append(part)
+
+        parts = []
+        for (partition, source), partition_parts in sorted(by_partition.items()):
+            small_parts = [part for part in partition_parts if part['rows'] < COMPACT_TARGET_ROWS]
+            if len(small_parts) < 2:
+                parts.extend(partition_parts)
+                continue
+            merged = pd.concat(
+                [pd.read_parquet(os.path.join(store_path, part['file'])) for part in small_parts],
+                ignore_index=True,
+            )
+            parts.extend(part for part in partition_parts if part not in small_parts)
+            parts.append(_write_part(store_path, partition, merged, _parse_dates(merged), source or None))
+            removed_files.extend(part['file'] for part in small_parts)
+
+        if removed_files:
+            zone_map['parts'] = parts # The data is unchanged, so the version stays the same
+            _write_zone_map(store_path, zone_map)
+
+    for file in removed_files:
+        try:
+            os.remove(os.path.join(store_path, file))
+        except FileNotFoundError:
+            pass
+    return len(removed_files)
+# -------------------------------------------------------------------------------
+def compact_in_background(name: str = VIOLATION_STORE):
+    """
+    Runs compact() in a daemon thread, unless one is already running for this store.
+    """
+    def run():
+        try:
+            compact(name)
+        except Exception as e:
+            print(f"Partition compaction failed for {name}: {e}")
+
+    with _compaction_guard:
+        thread = _compaction_threads.get(name)
+        if thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(target=run, name=f"compact-{name}", daemon=True)
+        _compaction_threads[name] = thread
+        thread.start()
+
+
+# ==================================================================================
+# Reading
+# ==================================================================================
+def zone_overlaps(part: dict, start, end) -> bool:
+    """
+    Zone map check: can this part file hold rows between start and end?
+    """
+    if start is None and end is None:
+        return True
+    if part['min_date'] is None:
+        return False # Only undated rows
+    if start is not None and part['max_date'] < start.date().isoformat():
+        return False
+    if end is not None and part['min_date'] > end.date().isoformat():
+        return False
+    return True
+# -------------------------------------------------------------------------------
+def get_row_zones(parts: list) -> dict:
+    """
+    Returns the in-memory zone map of the rows read from `parts`: one (min_date, max_date,
+    first_row, last_row) range per month, in the order read() returns rows. Ranges only
+    depend on each month's contents, so they stay valid after a compaction.
+    """
+    zones, row = [], 0
+    for part in sorted(parts, key=lambda part: (part['partition'] == UNDATED_PARTITION, part['partition'])):
+        if zones and zones[-1][4] == part['partition']:
+            min_date, max_date, first_row, _, partition = zones[-1]
+            zones[-1] = (min_date, max_date, first_row, row + part['rows'], partition)
+        else:
+            zones.append((part['min_date'], part['max_date'], row, row + part['rows'], part['partition']))
+        row += part['rows']
+    return {'rows': row, 'zones': [zone[:4] for zone in zones]}
+# -------------------------------------------------------------------------------
+def read(name: str = VIOLATION_STORE, start=None, end=None, columns: list = None) -> pd.DataFrame:
+    """
+    Reads violations from the store, opening only the part files whose zone map overlaps
+    the requested dates. Rows come back ordered by month, and a full read keeps its zone
+    map in df.attrs['zone_map'] so filter_date_range can later slice instead of scan.
+
+    Args:
+        name (str): Store name.
+        start, end: Optional inclusive date bounds (anything pd.Timestamp accepts).
+        columns (list): Optional columns to read ('Date' is always read).
+
+    Returns:
+        pd.DataFrame: The matching violations.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    if columns is not None and 'Date' not in columns:
+        columns = ['Date'] + list(columns)
+
+    store_path = get_store_path(name)
+    for attempt in range(2):
+        parts = [part for part in get_zone_map(name)['parts'] if zone_overlaps(part, start, end)]
+        parts.sort(key=lambda part: (part['partition'] == UNDATED_PARTITION, part['partition']))
+        try:
+            tables = [pq.read_table(os.path.join(store_path, part['file']), columns=columns) for part in parts]
+            break
+        except FileNotFoundError:
+            if attempt == 1:
+                raise # A compaction replaced the files twice in a row
+    if not tables:
+        return pd.DataFrame(columns=columns or [])
+
+    df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+    row_zones = get_row_zones(parts)
+    if start is not None or end is not None:
+        return filter_date_range(df, start, end, zones=row_zones['zones'])
+    df.attrs['zone_map'] = row_zones
+    return df
+# -------------------------------------------------------------------------------
+def filter_date_range(df: pd.DataFrame, start=None, end=None, zones: list = None) -> pd.DataFrame:
+    """
+    Returns the rows of df whose 'Date' lies between start and end (inclusive).
+
+    When df came from read() (or zones are given), only the row ranges whose zone map
+    overlaps the dates are looked at; otherwise the whole 'Date' column is compared.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    if zones is None:
+        zone_map = df.attrs.get('zone_map')
+        is_unchanged = (
+            zone_map is not None
+            and zone_map['rows'] == len(df)
+            and isinstance(df.index, pd.RangeIndex)
+            and df.index.start == 0 and df.index.step == 1
+        )
+        zones = zone_map['zones'] if is_unchanged else None
+
+    if zones is not None:
+        candidates = [
+            df.iloc[first_row:last_row]
+            for min_date, max_date, first_row, last_row in zones
+            if zone_overlaps({'min_date': min_date, 'max_date': max_date}, start, end)
+        ]
+        df = pd.concat(candidates) if candidates else df.iloc[0:0]
+
+    dates = _parse_dates(df)
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= dates >= start
+    if end is not None:
+        mask &= dates <= end
+    return df[mask]
+# -------------------------------------------------------------------------------
+def filter_years(df: pd.DataFrame, first_year: int, last_year: int) -> pd.DataFrame:
+    """
+    Returns the rows of df dated within [first_year, last_year].
+    """
+    return filter_date_range(
+        df,
+        pd.Timestamp(year=first_year, month=1, day=1),
+        pd.Timestamp(year=last_year + 1, month=1, day=1) - pd.Timedelta(1, 'ns'),
+    )
+# -------------------------------------------------------------------------------
+def filter_days(df: pd.DataFrame, first_day, last_day) -> pd.DataFrame:
+    """
+    Returns the rows of df dated within [first_day, last_day], whole days included.
+    """
+    first_day = pd.Timestamp(first_day).normalize()
+    return filter_date_range(
+        df,
+        first_day,
+        pd.Timestamp(last_day).normalize() + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns'),
+    )
@@ -0,0 +1,100 @@
+import pandas as pd
+
+from core import dataframe_backend
+
+try:
+    import polars as pl
+except ImportError: # Optional dependency: pip install polars
+    pl = None
+
+# ====================================================================================
+# Optional Polars Execution Backend
+# ====================================================================================
+# Lazy Polars versions of the grouped aggregations in core.dataframe_backend. A source is
+# either a DataFrame (only the referenced columns are handed to Polars, through Arrow) or a
+# Parquet/CSV file or glob, which Polars scans itself. The derived columns, row filters,
+# Date range and group-by are chained on one LazyFrame, so the query optimiser fuses them
+# and pushes the projection and filters down to the scan; only the grouped result is
+# collected and converted to pandas.
+#
+# Selected with the environment variable TRAFFIC_DASHBOARD_BACKEND=polars.
+
+ARITHMETIC_METHODS = {'+': '__add__', '-': '__sub__', '*': '__mul__', '/': '__truediv__'}
+COMPARISON_METHODS = {'==': 'eq', '!=': 'ne', '>': 'gt', '>=': 'ge', '<': 'lt', '<=': 'le'}
+
+
+# -------------------------------------------------------------------------------
+def is_available() -> bool:
+    return pl is not None
+# -------------------------------------------------------------------------------
+def _expression(value):
+    return pl.col(value) if isinstance(value, str) else pl.lit(value)
+# -------------------------------------------------------------------------------
+def _aggregation(col: str, func: str):
+    column = pl.col(col)
+    expressions = {
+        'count': column.count,
+        'sum': column.sum,     # An all-missing group sums to 0, like pandas
+        'mean': column.mean,
+        'min': column.min,
+        'max': column.max,
+        'std': lambda: column.std(ddof=1),
+    }
+    return expressions[func]().alias(f"{col}_{func}")
+# -------------------------------------------------------------------------------
+def _scan(source, columns: list, derive: dict = None, where: list = None, start=None, end=None):
+    """
+    Returns a LazyFrame over `source` with the derived columns, row filters and Date range
+    applied, reading only the columns the query needs.
+    """
+    dated = start is not None or end is not None
+    stored = dataframe_backend.source_columns(columns + [col for col, _, _ in where or []], derive)
+    stored = list(dict.fromkeys(stored + (['Date'] if dated else [])))
+    if isinstance(source, pd.DataFrame):
+        frame = pl.from_pandas(source[stored]).lazy()
+    elif str(source).endswith(".csv"):
+        frame = pl.scan_csv(source, try_parse_dates=True).select(stored)
+    else:
+        frame = pl.scan_parquet(source).select(stored)
+
+    if derive:
+        frame = frame.with_columns([
+            getattr(_expression(left), ARITHMETIC_METHODS[op])(_expression(right)).alias(name)
+            for name, (left, op, right) in derive.items()
+        ])
+    for col, op, value in where or []:
+        frame = frame.filter(getattr(pl.col(col), COMPARISON_METHODS[op])(value))
+    if start is not None:
+        frame = frame.filter(pl.col('Date') >= pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        frame = frame.filter(pl.col('Date') <= pd.Timestamp(end).to_pydatetime())
+    return frame
+# -------------------------------------------------------------------------------
+def _group(frame, group_cols: list, aggregations: list) -> pd.DataFrame:
+    """
+    Groups the LazyFrame (skipping missing keys, like pandas), collects it and returns
+    the result as pandas, ordered by the keys.
+    """
+    frame = frame.filter(pl.all_horizontal([pl.col(col).is_not_null() for col in group_cols]))
+    result = frame.group_by(group_cols).agg(aggregations).sort(group_cols).collect()
+    return result.to_pandas()
+
+
+# ==================================================================================
+# Aggregations (see core.dataframe_backend for the arguments)
+# ==================================================================================
+def aggregate(source, group_cols: list, agg_cols: list, agg_funcs: list, derive=None, where=None, start=None, end=None) -> pd.DataFrame:
+    """
+    Groups by `group_cols` and applies every function of `agg_funcs` to every column of
+    `agg_cols`. Result columns are named '<column>_<function>'.
+    """
+    frame = _scan(source, group_cols + agg_cols, derive, where, start, end)
+    return _group(frame, group_cols, [_aggregation(col, func) for col in agg_cols for func in agg_funcs])
+# -------------------------------------------------------------------------------
+def count_rows(source, group_cols: list, count_col: str = None, derive=None, where=None, start=None, end=None) -> pd.DataFrame:
+    """
+    Number of rows per group (non-missing values of `count_col` if given), as 'Count'.
+    """
+    frame = _scan(source, group_cols + ([count_col] if count_col else []), derive, where, start, end)
+    counted = pl.col(count_col).count() if count_col else pl.len()
+    return _group(frame, group_cols, [counted.cast(pl.Int64).alias('Count')]) # pandas counts are int64
@@ -0,0 +1,234 @@
+import functools
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core import data_cache, data_schema
+
+# ====================================================================================
+# Persistent Record Index (ID -> row positions)
+# ====================================================================================
+# For each ID column (data_schema.ID_COLUMNS) of a dataset, a hash index from ID value to
+# the positions of its rows is built once and saved as plain .npy arrays:
+#   keys.npy    - every distinct ID, sorted
+#   offsets.npy - rows of keys[i] are rows[offsets[i]:offsets[i + 1]]
+#   rows.npy    - row positions grouped by ID
+#   table.npy   - open-addressing hash table (linear probing): slot -> index into keys, -1 = empty
+# Lookups memory-map the arrays, so finding one ticket touches a handful of pages no
+# matter how many rows the dataset has. Violation_ID usually maps to a single row,
+# Officer_ID to the list of that officer's tickets.
+
+INDEX_DIR = os.path.join(data_cache.CACHE_DIR, "record_index")
+INDEX_FORMAT_VERSION = 2  # Bump when the index layout changes to ignore old indexes
+META_FILE = "meta.json"
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15) # Fibonacci hashing spreads the key hashes over the table
+
+
+# -------------------------------------------------------------------------------
+def get_index_path(index_key: str) -> str:
+    """
+    Returns the index folder of a dataset (content hash or partition store key).
+    """
+    return os.path.join(INDEX_DIR, f"{index_key}.v{INDEX_FORMAT_VERSION}")
+# -------------------------------------------------------------------------------
+def _hash(keys: np.ndarray, bits: int) -> np.ndarray:
+    """
+    Returns the home slot of each key in a table of 2**bits slots.
+    """
+    if keys.dtype.kind == 'U':
+        keys = keys.astype(object)
+    hashed = pd.util.hash_array(keys, categorize=False)
+    with np.errstate(over='ignore'):
+        return ((hashed * HASH_MULTIPLIER) >> np.uint64(64 - bits)).astype(np.int64)
+# -------------------------------------------------------------------------------
+def _build_table(keys: np.ndarray) -> np.ndarray:
+    """
+    Places every key in an open-addressing table at most half full.
+
+    Keys are inserted in rounds: each round every pending key tries its next slot and
+    one key wins each free slot. A key only moves past slots that are taken, so a lookup
+    probing from the key's home slot always reaches it before an empty slot.
+    """
+    bits = max(int(np.ceil(np.log2(max(len(keys), 1) * 2))), 1)
+    mask = (1 << bits) - 1
+    table = np.full(1 << bits, -1, dtype=np.int32 if len(keys) < 2**31 else np.int64)
+
+    home = _hash(keys, bits)
+    pending = np.arange(len(keys))
+    probe = np.zeros(len(keys), dtype=np.int64)
+    while pending.size:
+        slots = (home[pending] + probe) & mask
+        free = table[slots] == -1
+        winner_slots, first = np.unique(slots[free], return_index=True)
+        winners = pending[free][first]
+        table[winner_slots] = winners
+
+        placed = np.zeros(len(pending), dtype=bool)
+        placed[np.flatnonzero(free)[first]] = True
+        probe[~free] += 1 # Slot taken before this round: move on (losers retry, then see it taken)
+        keep = ~placed
+        pending, probe = pending[keep], probe[keep]
+    return table
+# -------------------------------------------------------------------------------
+def _write_column_index(column_path: str, values: pd.Series):
+    """
+    Builds and saves the index of one column.
+    """
+    codes, keys = pd.factorize(values, sort=True) # Missing IDs get code -1 and are not indexed
+    if isinstance(keys, pd.api.extensions.ExtensionArray): # e.g. UInt32 (no missing values left)
+        keys = keys.to_numpy(dtype=keys.dtype.numpy_dtype)
+    keys = np.asarray(keys)
+    if keys.dtype == object: # IDs that stayed text are saved as fixed-width unicode
+        keys = keys.astype(str)
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    counts = np.bincount(codes[codes >= 0], minlength=len(keys))
+
+    os.makedirs(column_path, exist_ok=True)
+    np.save(os.path.join(column_path, "keys.npy"), keys)
+    np.save(os.path.join(column_path, "offsets.npy"), np.concatenate([[0], np.cumsum(counts)]).astype(np.int64))
+    np.save(os.path.join(column_path, "rows.npy"), order.astype(np.int64))
+    np.save(os.path.join(column_path, "table.npy"), _build_table(keys))
+
+
+# ==================================================================================
+# Building
+# ==================================================================================
+def index_exists(index_key: str) -> bool:
+    return os.path.exists(os.path.join(get_index_path(index_key), META_FILE))
+# -------------------------------------------------------------------------------
+def build_index(index_key: str, df: pd.DataFrame) -> bool:
+    """
+    Builds the record index of a dataset from its ID columns (other columns are ignored).
+    Written to a temp folder and renamed, so readers never see a half built index.
+
+    Args:
+        index_key (str): Dataset key (content hash or partition store key).
+        df (pd.DataFrame): The whole dataset, in stored row order.
+
+    Returns:
+        bool: True if the index exists afterwards.
+    """
+    if index_exists(index_key):
+        return True
+    columns = [col for col in data_schema.ID_COLUMNS if col in df.columns]
+    if not columns:
+        return False
+
+    index_path = get_index_path(index_key)
+    tmp_path = f"{index_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        for col in columns:
+            _write_column_index(os.path.join(tmp_path, col), df[col])
+        with open(os.path.join(tmp_path, META_FILE), "w") as f:
+            json.dump({'rows': len(df), 'columns': columns}, f)
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        os.replace(tmp_path, index_path)
+        return True
+    except OSError:
+        return index_exists(index_key) # Built by another process in the meantime
+    except Exception as e:
+        print(f"Record index build skipped for {index_key}: {e}")
+        return False
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+# -------------------------------------------------------------------------------
+def remove_index(index_key: str):
+    """
+    Deletes the index of a dataset version that is no longer needed. Frames still
+    pointing at it fall back to scanning in find_rows.
+    """
+    shutil.rmtree(get_index_path(index_key), ignore_errors=True)
+    _open_index.cache_clear()
+
+
+# ==================================================================================
+# Lookup
+# ==================================================================================
+@functools.lru_cache(maxsize=32)
+def _open_index(index_key: str):
+    """
+    Memory-maps the index of a dataset. Returns (meta, {column: arrays}) or None.
+    """
+    index_path = get_index_path(index_key)
+    try:
+        with open(os.path.join(index_path, META_FILE)) as f:
+            meta = json.load(f)
+        arrays = {
+            col: {
+                name: np.load(os.path.join(index_path, col, f"{name}.npy"), mmap_mode='r')
+                for name in ('keys', 'offsets', 'rows', 'table')
+            }
+            for col in meta['columns']
+        }
+    except (OSError, ValueError):
+        return None
+    return meta, arrays
+# -------------------------------------------------------------------------------
+def _parse_key(column: str, text: str, keys: np.ndarray):
+    """
+    Converts a typed-in ID ('VLT100042', 'vlt 100042' or '100042') to the stored key.
+    Returns None if it cannot be an ID of this column.
+    """
+    text = str(text).strip()
+    if keys.dtype.kind == 'U':
+        return np.array([text]) if text else None
+    prefix = data_schema.ID_COLUMNS.get(column, ("", 0))[0]
+    if text.upper().startswith(prefix):
+        text = text[len(prefix):].strip()
+    if not text.isdigit() or int(text) > np.iinfo(keys.dtype).max:
+        return None
+    return np.array([int(text)], dtype=keys.dtype)
+# -------------------------------------------------------------------------------
+def _probe(arrays: dict, key: np.ndarray) -> np.ndarray:
+    """
+    Returns the row positions stored for one key (empty if it is not indexed).
+    """
+    keys, table = arrays['keys'], arrays['table']
+    mask = len(table) - 1
+    slot = int(_hash(key, mask.bit_length())[0])
+    while True:
+        entry = int(table[slot])
+        if entry < 0:
+            return np.empty(0, dtype=np.int64)
+        if keys[entry] == key[0]:
+            return np.asarray(arrays['rows'][arrays['offsets'][entry]:arrays['offsets'][entry + 1]])
+        slot = (slot + 1) & mask
+# -------------------------------------------------------------------------------
+def find_rows(df: pd.DataFrame, column: str, text: str) -> pd.DataFrame:
+    """
+    Returns the rows of df whose `column` holds the typed-in ID.
+
+    Uses the record index named by df.attrs['record_index'] when it matches df (same
+    row count, default row labels); otherwise falls back to scanning the column.
+
+    Args:
+        df (pd.DataFrame): The whole dataset, as returned by the sidebar.
+        column (str): 'Violation_ID' or 'Officer_ID'.
+        text (str): The ID as typed by the user.
+    """
+    if column not in df.columns or not str(text).strip():
+        return df.iloc[0:0]
+
+    index_key = df.attrs.get('record_index')
+    opened = _open_index(index_key) if index_key and index_exists(index_key) else None
+    is_default_index = isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1
+    if opened is not None and column in opened[1] and opened[0]['rows'] == len(df) and is_default_index:
+        arrays = opened[1][column]
+        key = _parse_key(column, text, arrays['keys'])
+        return df.iloc[_probe(arrays, key)] if key is not None else df.iloc[0:0]
+
+    # No usable index: compare the typed-in ID with the displayed IDs
+    text = str(text).strip().upper()
+    prefix, width = data_schema.ID_COLUMNS.get(column, ("", 0))
+    number = text[len(prefix):].strip() if text.startswith(prefix) else text
+    if number.isdigit():
+        text = prefix + number.zfill(width) # '42' finds 'VLT000042'
+    elif text.startswith(prefix):
+        text = prefix + number
+    values = data_schema.format_ids(df[[column]])[column].astype(str).str.upper()
+    return df[values == text]
@@ -0,0 +1,114 @@
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+from core import data_schema
+
+# ====================================================================================
+# Shared Read-Only Dataset Store
+# ====================================================================================
+# Each loaded dataset is published once as an uncompressed Arrow IPC file in a RAM
+# backed directory (/dev/shm when available). Every Streamlit session and every worker
+# process memory-maps that same file, so the OS keeps a single copy of the data in RAM.
+# Numeric columns and category codes of the returned DataFrame are read-only views over
+# the mapping; only text/boolean columns are materialised (once per process).
+
+SHARED_STORE_DIR = os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+    "traffic_dashboard_store",
+)
+STORE_FORMAT_VERSION = 4  # Bump when the stored layout changes to ignore old files
+MAPPED_ATTR = "shared_store"  # DataFrame.attrs key marking a frame mapped from the store (its content hash)
+MAX_STORE_FILES = 8       # Older datasets are dropped from the store (it lives in RAM)
+
+
+# -------------------------------------------------------------------------------
+def get_store_path(content_hash: str) -> str:
+    """
+    Returns the shared store location for a given content hash.
+    """
+    return os.path.join(SHARED_STORE_DIR, f"{content_hash}.v{STORE_FORMAT_VERSION}.arrow")
+# -------------------------------------------------------------------------------
+def _prune_store(keep_path: str):
+    """
+    Removes the oldest store files beyond MAX_STORE_FILES.
+    Processes that still map a removed file keep their view until they release it.
+    """
+    store_files = [
+        os.path.join(SHARED_STORE_DIR, name)
+        for name in os.listdir(SHARED_STORE_DIR)
+        if name.endswith(".arrow")
+    ]
+    store_files.sort(key=os.path.getmtime, reverse=True)
+    for path in store_files[MAX_STORE_FILES:]:
+        if path != keep_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass # Already removed by another process
+# -------------------------------------------------------------------------------
+def publish(df: pd.DataFrame, content_hash: str) -> bool:
+    """
+    Writes the DataFrame to the shared store atomically (temp file + rename).
+
+    Returns:
+        bool: True if the dataset is available in the store.
+    """
+    store_path = get_store_path(content_hash)
+    if os.path.exists(store_path):
+        return True
+
+    os.makedirs(SHARED_STORE_DIR, exist_ok=True)
+    tmp_path = f"{store_path}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, store_path)
+        _prune_store(store_path)
+        return True
+    except Exception as e:
+        # e.g. no space left in /dev/shm, or columns Arrow cannot represent
+        print(f"Shared store publish skipped for {store_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+# -------------------------------------------------------------------------------
+def unpublish(content_hash: str):
+    """
+    Removes a dataset version that is no longer needed from the store.
+    Processes that still map it keep their view until they release it.
+    """
+    try:
+        os.remove(get_store_path(content_hash))
+    except FileNotFoundError:
+        pass
+# -------------------------------------------------------------------------------
+def attach(content_hash: str, columns: list = None) -> pd.DataFrame:
+    """
+    Maps a published dataset into this process.
+
+    Args:
+        content_hash (str): Hash of the dataset file.
+        columns (list): Optional projection (see data_schema.project_columns). Columns
+                        left out are never converted to pandas, so they cost no memory.
+
+    Returns:
+        pd.DataFrame: Read-only view of the dataset, or None if it is not in the store.
+                      Its attrs[MAPPED_ATTR] holds the content hash.
+    """
+    store_path = get_store_path(content_hash)
+    try:
+        source = pa.memory_map(store_path, "r")
+        table = pa.ipc.open_file(source).read_all()
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    if columns is not None:
+        table = table.select(data_schema.project_columns(table.column_names, columns))
+    # split_blocks keeps every column in its own block, so numeric columns stay views
+    df = table.to_pandas(split_blocks=True)
+    df.attrs[MAPPED_ATTR] = content_hash
+    return df
@@ -1,60 +1,210 @@
+import os
+
 import streamlit as st
 import pandas as pd
-import os
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from streamlit_local_storage import LocalStorage
+from core import data_cache, data_catalog, data_ingest, data_schema, dataframe_backend, data_validation, data_variables, dataset_union, dataset_versions, dataset_watcher, memory_governor, partition_store, record_index, shared_store, stratified_sample
+
+# Display suffix of each catalog source in the dataset selector
+SOURCE_LABELS = {
+    "sample": "Sample",
+    "generated": "Fake Generated",
+    "related": "Legacy",
+    "other": "Other CSVs",
+}
+
+# Pages load different column projections of the same dataset; cache room for a few each
+PROJECTIONS_PER_DATASET = 4
+
+# Selector label of the date-partitioned store holding every uploaded/generated violation
+PARTITION_STORE_LABEL = "All Violations [Partitioned Store]"
+
+# Selector labels of the multi-file union datasets -> catalog sources (None = files picked by hand)
+UNION_OPTIONS = {
+    "All Generated Datasets [Union]": ("generated",),
+    "All Uploaded Datasets [Union]": ("related",),
+    "Selected Files [Union]": None,
+}
+
+# How often an open page checks whether the dataset watcher refreshed the shown dataset
+WATCH_INTERVAL_SECONDS = 5
+
+# (dataset key, columns) frames this process has loaded (served from st.cache_resource afterwards)
+_loaded_frames = set()
+
+# Session state keys the memory governor evicted, per session id (dropped on that session's next run;
+# the governor keeps counting them as pending until then)
+_session_evictions = {}
+
+@st.fragment(run_every=WATCH_INTERVAL_SECONDS)
+def rerun_when_changed(key: str, generation: int):
+    """
+    Reruns the page once the dataset watcher handled a change of the shown dataset
+    (a path, or the partitioned store) after `generation`.
+    """
+    if dataset_watcher.changed_since(generation, key):
+        st.rerun()
+
+def load_governed(kind: str, key: tuple, loader, *args) -> pd.DataFrame:
+    """
+    Calls a cached loader and registers the frame it holds with the memory governor,
+    which clears that one cache entry when it is evicted.
+    """
+    def evict():
+        loader.clear(*args)
+        _loaded_frames.discard(key)
+    return memory_governor.track(kind, key, loader(*args), evict)
+
+def govern_session_state():
+    """
+    Drops the session state keys the memory governor evicted since this session last ran
+    (which only then leave the governor's registry), and registers the DataFrames the
+    session still keeps.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    session_id = ctx.session_id
+    evicted = _session_evictions.pop(session_id, set())
+    for name in evicted:
+        st.session_state.pop(name, None)
+        memory_governor.forget("session", (session_id, name))
+    if evicted:
+        st.sidebar.info("Some results were cleared to free server memory; recreate them if needed.")
+    for name in list(st.session_state.keys()):
+        memory_governor.track("session", (session_id, name), st.session_state[name],
+                              lambda name=name: _session_evictions.setdefault(session_id, set()).add(name), deferred=True)
+
+def get_dataset_display_name(entry: dict) -> str:
+    """
+    Returns the selector label of a catalog entry.
+    """
+    if entry['source'] == "legacy":
+        return f"[Legacy] {entry['folder']}/{entry['file_name']}"
+    if entry['source'] == "generated":
+        return f"{entry['file_name']} [{SOURCE_LABELS['generated']} - {entry['folder']}]"
+    return f"{entry['file_name']} [{SOURCE_LABELS[entry['source']]}]"
+
+def render_unsuitable_dataset_notice():
+    """
+    Explains that the selected dataset lacks the traffic violation columns.
+    """
+    st.warning("Current Dataset is not suitable for this page.")
+    st.info(
+            f"""
+            This analysis requires:
+            - A 'Date' column.
+            - Require columns like {data_variables.TRAFFIC_VIOLATION_COLUMNS[0], data_variables.TRAFFIC_VIOLATION_COLUMNS[1]} ....
+            """
+        )
+    st.warning("Please Select a valid traffic violation dataset from the sidebar.")
+
+def render_sample_mode(df: pd.DataFrame):
+    """
+    Offers approximate results for large datasets: a sidebar toggle (on by default from
+    stratified_sample.APPROXIMATE_MIN_ROWS rows) between the dataset's stratified sample
+    and the exact data.
+
+    Returns:
+        stratified_sample.Sample: The sample to answer from, or None for exact results.
+    """
+    if not stratified_sample.can_sample(df):
+        return None
+    approximate = st.sidebar.toggle(
+        "Approximate results",
+        value=len(df) >= stratified_sample.APPROXIMATE_MIN_ROWS,
+        key="approximate_results",
+        help="Answer from a stratified sample (Location x Violation Type x Year) of the dataset. Figures show 95% confidence intervals.",
+    )
+    if not approximate:
+        return None
+    with st.spinner("Drawing a stratified sample of the dataset..."):
+        sample = stratified_sample.load_sample(df)
+    if sample is not None:
+        st.sidebar.caption(f"Approximate: {len(sample.df):,} sampled rows ({sample.fraction:.2%} of the dataset). Charts are drawn from the sample, scaled by its weights.")
+    return sample
+
+def render_union_dataset(label: str, entries: list, columns: tuple) -> pd.DataFrame:
+    """
+    Renders the controls of a union dataset (member files, Date range, dedup) and
+    returns the union of its member files (see core.dataset_union).
+    """
+    candidates = [entry for entry in entries if entry['is_traffic']]
+    sources = UNION_OPTIONS[label]
+    if sources is None:
+        names = {get_dataset_display_name(entry): entry for entry in candidates}
+        picked = st.sidebar.multiselect("Files", list(names), default=list(names)[:2])
+        members = [names[name] for name in picked]
+    else:
+        members = [entry for entry in candidates if entry['source'] in sources]
+    if not members:
+        st.sidebar.warning("Please select at least one file.")
+        return None
 
-def render_sidebar() -> pd.DataFrame:
+    start, end = None, None
+    dates = [pd.Timestamp(date).date() for entry in members for date in (entry['min_date'], entry['max_date']) if date]
+    if dates:
+        date_range = st.sidebar.date_input("Rows dated", value=(min(dates), max(dates)), min_value=min(dates), max_value=max(dates))
+        if len(date_range) == 2 and tuple(date_range) != (min(dates), max(dates)):
+            start = pd.Timestamp(date_range[0])
+            end = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns')
+    dedup = st.sidebar.checkbox(
+        "Drop repeated Violation_IDs",
+        value=not any(entry['source'] == "generated" for entry in members), # Generated files all number from VLT000001
+        help="Keep only the first file's row when several files hold the same Violation_ID.",
+    )
+
+    # Keyed by the members' content hashes, so an appended or replaced file is reloaded
+    @st.cache_resource(max_entries=2 * PROJECTIONS_PER_DATASET)
+    def load_union(members_key, _members, columns, start, end, dedup):
+        return dataset_union.read_union(_members, columns, start, end, dedup)
+    members_key = tuple((entry['path'], entry['content_hash']) for entry in members)
+    df = load_governed("union", (members_key, columns, start, end, dedup), load_union,
+                       members_key, members, columns, start, end, dedup).copy(deep=False)
+    st.sidebar.success(f"Loaded dataset: **{label}** ({len(members)} files, {len(df):,} rows)")
+    return df
+
+def render_preview(preview, dataset_key: str, columns: tuple):
+    """
+    Calls preview(sample) with the saved stratified sample of a dataset that is about to
+    be loaded slowly (not loaded by this process yet, nor in the shared store).
+    """
+    if preview is None or (dataset_key, columns) in _loaded_frames or os.path.exists(shared_store.get_store_path(dataset_key)):
+        return
+    sample = stratified_sample.load_preview(dataset_key, columns)
+    if sample is not None:
+        preview(sample)
+
+def render_sidebar(traffic_only: bool = False, columns: list = None, preview=None) -> pd.DataFrame:
     """
     Renders the sidebar components including the dataset selector.
     Returns the selected and loaded pandas DataFrame.
+
+    Args:
+        traffic_only (bool): Stop the page before loading if the selected dataset
+                             lacks the traffic violation columns (checked from the catalog).
+        columns (list): Columns the page reads (None = all). Other columns are not loaded;
+                        the derived temporal columns are always included.
+        preview (callable): Optional preview(sample) called before a slow load with the
+                            dataset's saved stratified_sample.Sample, so the page can draw
+                            preliminary results first.
     """
     st.sidebar.header("Dataset Selector")
+    columns = tuple(columns) if columns is not None else None # Hashable cache key
+    dataset_watcher.start() # Background refresh of appended/new dataset files (once per process)
+    govern_session_state()
+    generation = dataset_watcher.get_generation()
     
-    # Get the list of available datasets
-    dataset_folder = "dataset"
-    uploaded_dataset_folder = "uploaded_datasets"
-    related_uploads_folder = "uploded_file_relateds"
-    generated_dataset_folder = "generated_fake_traffic_datasets"
-    other_party_uploads_folder = "uploded_file_others"
-    
-    dataset_options = {}
-
-    # Add datasets from the 'dataset' folder
-    if os.path.exists(dataset_folder):
-        for filename in os.listdir(dataset_folder):
-            if filename.endswith(".csv"):
-                dataset_options[f"{filename} [Sample]"] = os.path.join(dataset_folder, filename)
-
-    # Function to scan a directory and add to options
-    def scan_and_add_datasets(directory, prefix):
-        if os.path.exists(directory):
-            # Scan for date-based directories (for generated data)
-            if "generated" in directory:
-                for date_dir in sorted(os.listdir(directory), reverse=True):
-                    full_date_dir = os.path.join(directory, date_dir)
-                    if os.path.isdir(full_date_dir):
-                        for file_name in sorted(os.listdir(full_date_dir)):
-                            if file_name.endswith('.csv'):
-                                display_name = f"{file_name} [{prefix} - {date_dir}]"
-                                dataset_options[display_name] = os.path.join(full_date_dir, file_name)
-            else: # Original logic for other directories
-                for file_name in sorted(os.listdir(directory)):
-                    if file_name.endswith('.csv'):
-                        dataset_options[f"{file_name} [{prefix}]"] = os.path.join(directory, file_name)
-
-    # Scan new directories in the desired order
-    scan_and_add_datasets(generated_dataset_folder, "Fake Generated")
-    scan_and_add_datasets(related_uploads_folder, "Legacy")
-    scan_and_add_datasets(other_party_uploads_folder, "Other CSVs")
-
-    # Add datasets from the 'uploaded_datasets' folder (legacy)
-    if os.path.exists(uploaded_dataset_folder):
-        for root, dirs, files in os.walk(uploaded_dataset_folder):
-            for filename in files:
-                if filename.endswith(".csv"):
-                    # Get the parent directory name for context
-                    parent_dir = os.path.basename(root)
-                    dataset_options[f"[Legacy] {parent_dir}/{filename}"] = os.path.join(root, filename)
+    # Get the list of available datasets from the catalog (folders are only re-listed when they change)
+    data_catalog.refresh_catalog()
+    catalog_entries = data_catalog.list_datasets()
+    dataset_options = {get_dataset_display_name(entry): entry for entry in catalog_entries}
+    if partition_store.store_exists():
+        dataset_options[PARTITION_STORE_LABEL] = None
+    for label, sources in UNION_OPTIONS.items():
+        if sum(entry['is_traffic'] and (sources is None or entry['source'] in sources) for entry in catalog_entries) > 1:
+            dataset_options[label] = None
 
     # ==========================================================================================================    
     # Persistence with Local Storage
@@ -91,18 +241,111 @@ def render_sidebar() -> pd.DataFrame:
         st.sidebar.warning("Please select a dataset.")
         return None
 
-    # 3. Get Selected Dataset Path  
-    selected_dataset_path = dataset_options[selected_dataset_display_name]
+    # 3. Union of several files, or the partitioned store (keyed by its version, so appends are picked up)
+    if selected_dataset_display_name in UNION_OPTIONS:
+        return render_union_dataset(selected_dataset_display_name, catalog_entries, columns)
+    if dataset_options[selected_dataset_display_name] is None:
+        @st.cache_resource(max_entries=2 * PROJECTIONS_PER_DATASET)
+        def load_partition_store(version, columns):
+            zone_map = partition_store.get_zone_map()
+            store_key = partition_store.get_dataset_key(version)
+            df = shared_store.attach(store_key, columns)
+            if df is None:
+                df = data_schema.apply_traffic_schema(partition_store.read())
+                record_index.build_index(store_key, df)
+                shared_df = shared_store.attach(store_key, columns) if shared_store.publish(df, store_key) else None
+                if shared_df is not None:
+                    df = shared_df
+                else:
+                    df = df[data_schema.project_columns(df.columns, columns)]
+            elif columns is None:
+                record_index.build_index(store_key, df)
+            # Row ranges per month, so date filters only look at the months they need
+            df.attrs['zone_map'] = partition_store.get_row_zones(zone_map['parts'])
+            return df
+        version = partition_store.get_zone_map()['version']
+        store_key = partition_store.get_dataset_key(version)
+        render_preview(preview, store_key, columns)
+        df = load_governed("dataset", (store_key, columns), load_partition_store, version, columns).copy(deep=False)
+        _loaded_frames.add((store_key, columns))
+        df.attrs['record_index'] = store_key # ID -> row lookups (core.record_index)
+        st.sidebar.success(f"Loaded dataset: **{selected_dataset_display_name}**")
+        rerun_when_changed(partition_store.VIOLATION_STORE, generation)
+        return df
+
+    # 4. Get Selected Dataset Path (re-checked in case the file was replaced in place)
+    selected_entry = data_catalog.get_dataset(dataset_options[selected_dataset_display_name]['path'])
+    if selected_entry is None:
+        st.sidebar.warning("The selected dataset no longer exists.")
+        return None
+    selected_dataset_path = selected_entry['path']
+
+    if traffic_only and not selected_entry['is_traffic']:
+        st.sidebar.info(f"Selected dataset: **{selected_dataset_display_name}**")
+        render_unsuitable_dataset_notice()
+        st.stop()
+    if not selected_entry['is_traffic']:
+        columns = None # Page projections name traffic columns; other datasets are loaded whole
+
+    # 5. Older versions of the file (core.dataset_versions), rebuilt from their stored deltas
+    versions = dataset_versions.list_versions(selected_dataset_path)
+    version_options = {"Latest": None}
+    for version in reversed(versions[:-1]):
+        label = f"v{version['version']} - {version['created'].replace('T', ' ')} ({version['rows']:,} rows)"
+        version_options[label] = version['version']
+    if len(version_options) > 1:
+        selected_version = version_options[st.sidebar.selectbox("As of version", list(version_options))]
+        if selected_version is not None:
+            @st.cache_resource(max_entries=PROJECTIONS_PER_DATASET)
+            def load_version(path, version, columns):
+                return dataset_versions.read(path, version=version, columns=columns)
+            df = load_governed("version", (selected_dataset_path, selected_version, columns), load_version,
+                               selected_dataset_path, selected_version, columns).copy(deep=False)
+            st.sidebar.info(f"Showing version {selected_version} of **{selected_dataset_display_name}**")
+            return df
 
-    # 4. Load the selected dataset
-    @st.cache_data
-    def load_data(path):
-        df = pd.read_csv(path)
-        return df.copy() # Return a copy to prevent mutation of cached data
-    df = load_data(selected_dataset_path)
+    # 6. Load the selected dataset (keyed by content hash, so a replaced file is reloaded)
+    # One read-only frame per process and projection, mapped from the shared store, is reused by every session
+    @st.cache_resource(max_entries=shared_store.MAX_STORE_FILES * PROJECTIONS_PER_DATASET)
+    def load_data(path, content_hash, columns, previous_hash=None, appended_from=None):
+        df = shared_store.attach(content_hash, columns)
+        if df is None:
+            if appended_from is not None: # Only the rows appended since the cached version are parsed
+                data_ingest.extend_cache(path, previous_hash, content_hash, appended_from)
+            df = data_cache.load_dataset(path, content_hash)
+            record_index.build_index(content_hash, df) # Usually already built at upload
+            shared_df = shared_store.attach(content_hash, columns) if shared_store.publish(df, content_hash) else None
+            if shared_df is not None:
+                df = shared_df # Drop the private copy in favour of the shared mapping
+            else:
+                df = df[data_schema.project_columns(df.columns, columns)]
+        elif columns is None:
+            record_index.build_index(content_hash, df) # Datasets cached before the index existed
+        return df
+    render_preview(preview, selected_entry['content_hash'], columns)
+    df = load_governed("dataset", (selected_entry['content_hash'], columns), load_data, selected_dataset_path,
+                       selected_entry['content_hash'], columns, selected_entry['previous_hash'], selected_entry['appended_from'])
+    _loaded_frames.add((selected_entry['content_hash'], columns))
     
-    # 4. Display Success Message
+    # 7. Display Success Message
     st.sidebar.success(f"Loaded dataset: **{selected_dataset_display_name}**")
+    unparseable = {col: rows for col, rows in selected_entry['unparseable'].items() if rows}
+    if unparseable:
+        details = ", ".join(f"{rows:,} {col}" for col, rows in unparseable.items())
+        st.sidebar.warning(f"Some rows have values that could not be parsed and are left empty: {details}.")
+    report = data_validation.validate_cached(selected_entry['content_hash']) if selected_entry['is_traffic'] else None
+    exclude_quarantined = False
+    if report is not None and report['quarantined']:
+        st.sidebar.warning(f"{report['quarantined']:,} rows break validation rules (see View Dataset).")
+        exclude_quarantined = st.sidebar.checkbox("Exclude quarantined rows", value=False)
     
-    # 5. Return the loaded dataset
-    return df.copy()
+    # 8. Return a shallow copy: pages may add or replace columns without touching the shared data
+    df = df.copy(deep=False)
+    df.attrs['record_index'] = selected_entry['content_hash'] # ID -> row lookups (core.record_index)
+    df.attrs['validation'] = selected_entry['content_hash'] # Validation report (core.data_validation)
+    if exclude_quarantined:
+        df = data_validation.without_quarantined(df, selected_entry['content_hash'])
+    else: # Lazy backends aggregate the cache file itself (core.dataframe_backend)
+        dataframe_backend.attach_source(df, data_cache.get_cache_path(selected_entry['content_hash']))
+    rerun_when_changed(selected_dataset_path, generation)
+    return df
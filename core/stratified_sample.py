@@ -0,0 +1,347 @@
+import functools
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from core import data_cache, data_schema
+
+# ====================================================================================
+# Persistent Stratified Samples (approximate mode)
+# ====================================================================================
+# For datasets too large to scan on every rerun, the dashboards can answer from a sample
+# drawn once per dataset and stratified by Location x Violation_Type x year of Date:
+# every stratum keeps about SAMPLE_ROWS / rows of its rows (at least MIN_STRATUM_ROWS
+# on average, or all of them), so rare combinations are still represented. Saved as
+#   .dataset_cache/samples/<dataset key>.v1/rows.npy        sampled row positions
+#                                          /strata.npy      stratum of each sampled row
+#                                          /population.npy  rows of each stratum in the dataset
+#                                          /<col>.min.npy   exact minimum (and .max) per stratum
+#                                          /rows.parquet    the sampled rows themselves
+# Estimates weight each sampled row by rows in its stratum / rows sampled from it and
+# carry a 95% confidence interval from the stratified variance, so a filtered subset
+# (last N days, a year range) of the sample still gives an honest interval.
+#
+# The saved rows let a page draw a preliminary view (load_preview) before the dataset
+# itself is loaded.
+
+SAMPLE_DIR = os.path.join(data_cache.CACHE_DIR, "samples")
+SAMPLE_FORMAT_VERSION = 2  # Bump when the sample layout or design changes to redraw samples
+META_FILE = "meta.json"
+SAMPLE_ROWS = 200_000             # Target sample size
+MIN_STRATUM_ROWS = 10             # Expected rows sampled from every stratum
+APPROXIMATE_MIN_ROWS = 1_000_000  # Datasets this large open in approximate mode
+STRATA_COLUMNS = ['Location', 'Violation_Type', 'Date']  # Date is stratified by year
+EXTREME_COLUMNS = ['Fine_Amount']  # Exact per-stratum minimum/maximum are kept for these
+DRAW_CHUNK_ROWS = 10_000_000
+MAX_DENSE_STRATA = 10_000_000  # Larger code combinations are numbered with a hash table instead
+Z_95 = 1.959963984540054
+
+
+# -------------------------------------------------------------------------------
+class Estimate:
+    """
+    An estimated value with the half width of its 95% confidence interval.
+    Formats as 'value ± margin' (format spec applied to both), scales with / and //,
+    and compares by value.
+    """
+    def __init__(self, value: float, margin: float):
+        self.value = float(value)
+        self.margin = float(margin)
+
+    @property
+    def low(self) -> float:
+        return self.value - self.margin
+
+    @property
+    def high(self) -> float:
+        return self.value + self.margin
+
+    def __format__(self, spec: str) -> str:
+        spec = spec or (",.0f" if abs(self.value) >= 100 else ".2f")
+        return f"≈{format(self.value, spec)} ± {format(self.margin, spec)}"
+
+    def __str__(self) -> str:
+        return format(self)
+
+    def __truediv__(self, other: float):
+        return Estimate(self.value / other, self.margin / other) if other else Estimate(np.nan, np.nan)
+
+    def __floordiv__(self, other: float):
+        return self / other
+
+    def __float__(self) -> float:
+        return self.value
+
+    def __lt__(self, other) -> bool:
+        return self.value < float(other)
+
+    def __gt__(self, other) -> bool:
+        return self.value > float(other)
+# -------------------------------------------------------------------------------
+def get_sample_path(dataset_key: str) -> str:
+    """
+    Returns the sample folder of a dataset (content hash or partition store key).
+    """
+    return os.path.join(SAMPLE_DIR, f"{dataset_key}.v{SAMPLE_FORMAT_VERSION}")
+# -------------------------------------------------------------------------------
+def _numbers(series: pd.Series) -> np.ndarray:
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+# -------------------------------------------------------------------------------
+def _stratum_of_rows(df: pd.DataFrame) -> np.ndarray:
+    """
+    Returns the stratum (0..K-1) of every row: Location x Violation_Type x year.
+    Codes are combined arithmetically and renumbered with bincount, without sorting.
+    """
+    years = df['Date'].dt.year if pd.api.types.is_datetime64_any_dtype(df['Date']) else pd.to_datetime(df['Date'], errors='coerce').dt.year
+    combined = np.zeros(len(df), dtype=np.int64)
+    size = 1
+    for values in (df['Location'], df['Violation_Type'], years):
+        codes = pd.factorize(values)[0] # Missing values get -1
+        width = int(codes.max(initial=-1)) + 2
+        combined = combined * width + (codes + 1)
+        size *= width
+    if size > MAX_DENSE_STRATA: # Free-text columns: too many combinations to count densely
+        return pd.factorize(combined)[0].astype(np.int32)
+    present = np.bincount(combined, minlength=size) > 0
+    return (np.cumsum(present) - 1)[combined].astype(np.int32)
+# -------------------------------------------------------------------------------
+def can_sample(df: pd.DataFrame) -> bool:
+    """
+    True if df is a keyed dataset (see the sidebar's df.attrs['record_index']) in stored
+    row order, has the stratification columns, and is larger than a sample.
+    """
+    return (
+        df is not None
+        and df.attrs.get('record_index') is not None
+        and len(df) > SAMPLE_ROWS
+        and all(col in df.columns for col in STRATA_COLUMNS)
+        and isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1
+    )
+
+
+# ==================================================================================
+# Building
+# ==================================================================================
+def build_sample(dataset_key: str, df: pd.DataFrame) -> bool:
+    """
+    Draws the stratified sample of a dataset and saves it (temp folder + rename).
+    The draw is seeded by the dataset key, so it is the same in every process.
+
+    Args:
+        dataset_key (str): Content hash or partition store key of the dataset.
+        df (pd.DataFrame): The whole dataset, in stored row order.
+
+    Returns:
+        bool: True if the sample exists afterwards.
+    """
+    sample_path = get_sample_path(dataset_key)
+    if os.path.exists(os.path.join(sample_path, META_FILE)):
+        return True
+    tmp_path = f"{sample_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        strata = _stratum_of_rows(df)
+        population = np.bincount(strata)
+        rate = np.minimum(np.maximum(SAMPLE_ROWS / max(len(df), 1), MIN_STRATUM_ROWS / population), 1.0)
+
+        digest = data_cache.new_content_digest()
+        digest.update(dataset_key.encode())
+        rng = np.random.default_rng(int(digest.hexdigest(), 16))
+        keep = np.empty(len(df), dtype=bool)
+        for start in range(0, len(df), DRAW_CHUNK_ROWS): # Bounded temporary memory on huge datasets
+            chunk = strata[start:start + DRAW_CHUNK_ROWS]
+            keep[start:start + len(chunk)] = rng.random(len(chunk), dtype=np.float32) < rate[chunk]
+        rows = np.flatnonzero(keep)
+
+        os.makedirs(tmp_path, exist_ok=True)
+        np.save(os.path.join(tmp_path, "rows.npy"), rows.astype(np.int64))
+        np.save(os.path.join(tmp_path, "strata.npy"), strata[rows])
+        np.save(os.path.join(tmp_path, "population.npy"), population.astype(np.int64))
+        df.iloc[rows].to_parquet(os.path.join(tmp_path, "rows.parquet"), index=False, **data_cache.PARQUET_WRITE_OPTIONS)
+        extremes = [col for col in EXTREME_COLUMNS if col in df.columns]
+        for col in extremes:
+            per_stratum = pd.Series(_numbers(df[col])).groupby(strata).agg(['min', 'max']).reindex(range(len(population)))
+            np.save(os.path.join(tmp_path, f"{col}.min.npy"), per_stratum['min'].to_numpy(dtype=float))
+            np.save(os.path.join(tmp_path, f"{col}.max.npy"), per_stratum['max'].to_numpy(dtype=float))
+        with open(os.path.join(tmp_path, META_FILE), "w") as f:
+            json.dump({'rows': len(df), 'sample_rows': len(rows), 'strata': len(population), 'extremes': extremes}, f)
+        os.makedirs(SAMPLE_DIR, exist_ok=True)
+        os.replace(tmp_path, sample_path)
+        return True
+    except OSError:
+        return os.path.exists(os.path.join(sample_path, META_FILE)) # Drawn by another process in the meantime
+    except Exception as e:
+        print(f"Stratified sample skipped for {dataset_key}: {e}")
+        return False
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+# -------------------------------------------------------------------------------
+def remove_sample(dataset_key: str):
+    """
+    Deletes the sample of a dataset version that is no longer needed.
+    """
+    shutil.rmtree(get_sample_path(dataset_key), ignore_errors=True)
+    _open_sample.cache_clear()
+
+
+# ==================================================================================
+# Estimation
+# ==================================================================================
+@functools.lru_cache(maxsize=32)
+def _open_sample(dataset_key: str):
+    """
+    Loads the saved sample of a dataset. Returns (meta, {name: array}) or None.
+    """
+    sample_path = get_sample_path(dataset_key)
+    try:
+        with open(os.path.join(sample_path, META_FILE)) as f:
+            meta = json.load(f)
+        names = ["rows", "strata", "population"] + [f"{col}.{end}" for col in meta['extremes'] for end in ("min", "max")]
+        arrays = {name: np.load(os.path.join(sample_path, f"{name}.npy")) for name in names}
+    except (OSError, ValueError):
+        return None
+    return meta, arrays
+# -------------------------------------------------------------------------------
+class Sample:
+    """
+    The sampled rows of a dataset (sample.df, labelled by their row positions in the
+    dataset) and the stratum sizes needed to scale them back up.
+    """
+    def __init__(self, sampled_df: pd.DataFrame, meta: dict, arrays: dict):
+        self.df = sampled_df
+        self.df.attrs = {} # Zone map and record index describe the whole dataset, not the sample
+        self.strata = pd.Series(arrays['strata'], index=self.df.index)
+        self.population = arrays['population'].astype(float)
+        self.sampled = np.bincount(arrays['strata'], minlength=len(self.population)).astype(float)
+        self.arrays = arrays
+        self.fraction = meta['sample_rows'] / max(meta['rows'], 1)
+
+    def estimator(self, frame: pd.DataFrame):
+        """
+        Returns an Estimator for a subset of sample.df (rows filtered any way, labels kept).
+        """
+        return Estimator(self, frame)
+# -------------------------------------------------------------------------------
+class Estimator:
+    """
+    Estimates totals, means and percentages of the dataset rows that match `frame`
+    (a filtered sample.df), each as an Estimate with a 95% confidence interval.
+    """
+    def __init__(self, sample: Sample, frame: pd.DataFrame):
+        self.sample = sample
+        self.strata = sample.strata.loc[frame.index].to_numpy()
+        self.frame = frame
+
+    def weights(self) -> np.ndarray:
+        """
+        Returns how many dataset rows each row of the frame stands for.
+        """
+        return (self.sample.population / np.maximum(self.sample.sampled, 1))[self.strata]
+
+    def _total(self, values: np.ndarray) -> tuple:
+        """
+        Returns (estimated total, variance) of values over the frame's rows; rows of the
+        sample outside the frame count as zeros of their stratum.
+        """
+        values = np.nan_to_num(np.asarray(values, dtype=float))
+        size = len(self.sample.population)
+        population, sampled = self.sample.population, np.maximum(self.sample.sampled, 1)
+        sums = np.bincount(self.strata, values, minlength=size)
+        squares = np.bincount(self.strata, values * values, minlength=size)
+        spread = np.where(sampled > 1, (squares - sums * sums / sampled) / np.maximum(sampled - 1, 1), 0.0)
+        variance = population * population * (1 - sampled / population) * np.maximum(spread, 0) / sampled
+        return float((population / sampled * sums).sum()), float(variance.sum())
+
+    def count(self, mask=None) -> Estimate:
+        """
+        Estimated number of dataset rows in the frame (and matching `mask`, if given).
+        """
+        values = np.ones(len(self.frame)) if mask is None else np.asarray(mask, dtype=float)
+        total, variance = self._total(values)
+        return Estimate(total, Z_95 * np.sqrt(variance))
+
+    def total(self, column: str) -> Estimate:
+        """
+        Estimated sum of a numeric column (missing values count as 0).
+        """
+        total, variance = self._total(_numbers(self.frame[column]))
+        return Estimate(total, Z_95 * np.sqrt(variance))
+
+    def mean(self, column: str) -> Estimate:
+        """
+        Estimated mean of a numeric column over its non-missing values (ratio estimator,
+        variance by linearisation).
+        """
+        values = _numbers(self.frame[column])
+        valid = ~np.isnan(values)
+        total, _ = self._total(values)
+        count, _ = self._total(valid)
+        if count == 0:
+            return Estimate(np.nan, np.nan)
+        ratio = total / count
+        _, variance = self._total(np.where(valid, values - ratio, 0.0))
+        return Estimate(ratio, Z_95 * np.sqrt(variance) / count)
+
+    def percentage(self, mask) -> Estimate:
+        """
+        Estimated percentage of the frame's rows matching `mask`.
+        """
+        values = np.asarray(mask, dtype=float)
+        count, _ = self._total(np.ones(len(values)))
+        if count == 0:
+            return Estimate(0.0, 0.0)
+        share = self._total(values)[0] / count
+        _, variance = self._total(values - share)
+        return Estimate(share * 100, Z_95 * np.sqrt(variance) / count * 100)
+
+    def extremes(self, column: str) -> tuple:
+        """
+        Returns (min, max) of a column over the strata the frame has rows from: exact for
+        frames of whole years (strata are years), from the sampled rows otherwise.
+        """
+        if f"{column}.min" not in self.sample.arrays:
+            values = _numbers(self.frame[column])
+            return np.nanmin(values), np.nanmax(values)
+        present = np.unique(self.strata)
+        return (
+            np.nanmin(self.sample.arrays[f"{column}.min"][present]),
+            np.nanmax(self.sample.arrays[f"{column}.max"][present]),
+        )
+# -------------------------------------------------------------------------------
+def load_sample(df: pd.DataFrame) -> Sample:
+    """
+    Returns the stratified sample of a dataset loaded by the sidebar, drawing it first
+    if needed, or None when df cannot be sampled (see can_sample).
+    """
+    if not can_sample(df):
+        return None
+    dataset_key = df.attrs['record_index']
+    opened = _open_sample(dataset_key)
+    if opened is None and build_sample(dataset_key, df):
+        _open_sample.cache_clear()
+        opened = _open_sample(dataset_key)
+    if opened is None or opened[0]['rows'] != len(df):
+        return None
+    meta, arrays = opened
+    return Sample(df.iloc[arrays['rows']], meta, arrays)
+# -------------------------------------------------------------------------------
+def load_preview(dataset_key: str, columns: tuple = None) -> Sample:
+    """
+    Returns the saved sample of a dataset read from its own rows (no need to load the
+    dataset), or None if there is none holding `columns`.
+    """
+    opened = _open_sample(dataset_key)
+    rows_path = os.path.join(get_sample_path(dataset_key), "rows.parquet")
+    if opened is None or not os.path.exists(rows_path):
+        return None
+    names = pq.read_schema(rows_path).names
+    if columns is not None and not set(columns) <= set(names):
+        return None
+    meta, arrays = opened
+    sampled_df = pd.read_parquet(rows_path, columns=data_schema.project_columns(names, columns))
+    sampled_df.index = arrays['rows']
+    return Sample(sampled_df, meta, arrays)
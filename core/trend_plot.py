@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import matplotlib.ticker as mtick
+from core import data_schema
 
 # This module handles plots for Trend Analysis
 
@@ -163,18 +164,12 @@ def plot_categorical_heatmap(percent_pivot, annot, x_label, y_label):
 
 def plot_peak_hour_traffic(df):
     apply_trend_plot_style()
-    df = df.copy()
-    if 'Time' in df.columns:
-        try:
-            df['hour'] = pd.to_datetime(df['Time'], format='%H:%M:%S', errors='coerce').dt.hour
-            if df['hour'].isnull().any():
-                 df['hour'] = pd.to_datetime(df['Time'], format='%H:%M', errors='coerce').dt.hour
-            if df['hour'].isnull().all():
-                 df['hour'] = df['Time'].astype(str).str.split(':').str[0].astype(float)
-        except:
-             return None
-
-        hour_counts = df['hour'].value_counts().sort_index()
+    if 'Hour' in df.columns or 'Time' in df.columns:
+        hour = data_schema.add_temporal_columns(df.copy(deep=False))['Hour']
+        if hour.isnull().all():
+            return None
+
+        hour_counts = hour.value_counts().sort_index()
         fig, ax = plt.subplots(figsize=TREND_FIG_SIZE)
         sns.lineplot(x=hour_counts.index, y=hour_counts.values, marker="o", linewidth=3, color="teal", ax=ax)
         ax.set_title("Peak Hour Traffic Violations", fontsize=TREND_TITLE_SIZE, fontweight='bold')
@@ -189,11 +184,9 @@ def plot_peak_hour_traffic(df):
 
 def plot_fines_per_year(df):
     apply_trend_plot_style()
-    df = df.copy()
     if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        df['Year'] = df['Date'].dt.year
-        fines_per_year = df.groupby('Year')['Fine_Amount'].sum()
+        df = data_schema.add_temporal_columns(df.copy(deep=False))
+        fines_per_year = df.groupby('Year', observed=True)['Fine_Amount'].sum()
         
         fig, ax = plt.subplots(figsize=TREND_FIG_SIZE)
         ax.plot(fines_per_year.index, fines_per_year.values, marker='o', linewidth=3, markersize=8, color="skyblue")
@@ -210,7 +203,8 @@ def plot_fines_per_year(df):
 
 def plot_avg_fine_location_line(df):
     apply_trend_plot_style()
-    fine_location = df.groupby('Location')['Fine_Amount'].mean().reset_index()
+    fine_location = df.groupby('Location', observed=True)['Fine_Amount'].mean().reset_index()
+    fine_location['Location'] = fine_location['Location'].astype(object)
     fig, ax = plt.subplots(figsize=TREND_FIG_SIZE)
     ax.plot(
         fine_location['Location'],
@@ -1,9 +1,9 @@
 import streamlit as st
 import pandas as pd
 from streamlit_folium import st_folium
-from core import map_plot
+from core import aggregate_cache, data_schema, dataframe_backend, map_plot, partition_store
 """
-All Fields in the dataset:
+All Fields in the dataset (as read from CSV, before core.data_schema types them):
     Violation_ID                  object
     Violation_Type                object
     Fine_Amount                    int64
@@ -77,9 +77,8 @@ def filter_the_dataset(df: pd.DataFrame) -> pd.DataFrame:
         Previous_Violations            int64
         Comments                      object
     """
-    # Date and Time Filteration
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    df['Time'] = pd.to_datetime(df['Time'], errors='coerce', format='mixed')
+    # Date and Time Filteration (already done at ingest for cached datasets)
+    df = data_schema.add_temporal_columns(df)
 
     #===================
     # More refiners if required
@@ -99,8 +98,10 @@ def get_last_n_days_data(df: pd.DataFrame, n: int) -> pd.DataFrame:
     """
     today = pd.Timestamp.now().normalize()
     n_days_ago = today - pd.Timedelta(days=n)
-    filtered_df = df[(df['Date'] >= n_days_ago) & (df['Date'] <= today)]
-    return filtered_df.copy()
+    # Skips whole months via the zone map when df comes from the partitioned store
+    filtered_df = partition_store.filter_date_range(df, n_days_ago, today)
+    # The lazy backends can then aggregate the same range straight from the cache file
+    return dataframe_backend.restrict_source(filtered_df, df, n_days_ago, today)
 # ----------------------------------------------------------------------------
 def find_location_columns(df, known_locations, sample_size=20, threshold=0.8) -> list:
     """
@@ -118,7 +119,7 @@ def find_location_columns(df, known_locations, sample_size=20, threshold=0.8) ->
     potential_location_cols = []
     
     # Consider only object/categorical columns
-    categorical_cols = df.select_dtypes(include=['object']).columns
+    categorical_cols = df.select_dtypes(include=['object', 'category']).columns
     
     for col in categorical_cols:
         # Drop nulls and get unique values
@@ -149,6 +150,7 @@ def find_location_columns(df, known_locations, sample_size=20, threshold=0.8) ->
 # Block 1: Data Quality Analysis Functions
 # ===================== Data Quality Analysis Functions ============================
 
+@aggregate_cache.cached
 def get_data_quality_analysis(df: pd.DataFrame) -> pd.DataFrame:
     """
     Calculates missing, unique, and duplicate statistics for each column.
@@ -158,6 +160,7 @@ def get_data_quality_analysis(df: pd.DataFrame) -> pd.DataFrame:
     """
     total_rows = len(df)
     report = []
+    numeric_cols = data_schema.numeric_columns(df) # Numerically stored IDs have no outliers
     
     for col in df.columns:
         missing_count = df[col].isnull().sum()
@@ -171,7 +174,7 @@ def get_data_quality_analysis(df: pd.DataFrame) -> pd.DataFrame:
         
         # Outlier Calculation (IQR Method) for numeric columns
         outlier_pct = 0.0
-        if pd.api.types.is_numeric_dtype(df[col]):
+        if col in numeric_cols:
             Q1 = df[col].quantile(0.25)
             Q3 = df[col].quantile(0.75)
             IQR = Q3 - Q1
@@ -200,6 +203,7 @@ def get_data_quality_analysis(df: pd.DataFrame) -> pd.DataFrame:
 # Block 2: Numerical Analysis Functions (Tabular/Grouped)
 # ===================== Numerical Analysis Functions ===============================
 
+@aggregate_cache.cached
 def get_violation_stats_table(df: pd.DataFrame) -> pd.DataFrame:
     """
     Aggregates Fine Amount by Violation Type (Count, Sum, Mean, Min, Max).
@@ -207,11 +211,12 @@ def get_violation_stats_table(df: pd.DataFrame) -> pd.DataFrame:
     if 'Violation_Type' not in df.columns or 'Fine_Amount' not in df.columns:
         return pd.DataFrame()
     
-    stats = df.groupby('Violation_Type')['Fine_Amount'].agg(['count', 'sum', 'mean', 'min', 'max']).reset_index()
+    stats = dataframe_backend.aggregate(df, ['Violation_Type'], ['Fine_Amount'], ['count', 'sum', 'mean', 'min', 'max'])
     stats.columns = ['Violation Type', 'Total Incidents', 'Total Fines', 'Average Fine', 'Min Fine', 'Max Fine']
     stats = stats.sort_values(by='Total Fines', ascending=False)
     return stats
 # -------------------------------------------------------------------------------
+@aggregate_cache.cached
 def get_demographic_pivot(df: pd.DataFrame) -> pd.DataFrame:
     """
     Creates a pivot table of Violation Counts by Violation Type (Rows) and Driver Gender (Columns).
@@ -219,11 +224,13 @@ def get_demographic_pivot(df: pd.DataFrame) -> pd.DataFrame:
     if 'Violation_Type' not in df.columns or 'Driver_Gender' not in df.columns:
         return pd.DataFrame()
     
-    pivot = df.pivot_table(index='Violation_Type', columns='Driver_Gender', values='Violation_ID', aggfunc='count', fill_value=0)
+    counts = dataframe_backend.count_rows(df, ['Violation_Type', 'Driver_Gender'], 'Violation_ID')
+    pivot = counts.pivot_table(index='Violation_Type', columns='Driver_Gender', values='Count', aggfunc='sum', fill_value=0, observed=True)
     pivot['Total'] = pivot.sum(axis=1)
     pivot = pivot.sort_values(by='Total', ascending=False)
     return pivot
 # -------------------------------------------------------------------------------
+@aggregate_cache.cached
 def get_vehicle_analysis_table(df: pd.DataFrame) -> pd.DataFrame:
     """
     Aggregates fines and counts by Vehicle Type and Model Year.
@@ -232,11 +239,12 @@ def get_vehicle_analysis_table(df: pd.DataFrame) -> pd.DataFrame:
     if not all(col in df.columns for col in cols_needed):
         return pd.DataFrame()
         
-    stats = df.groupby(['Vehicle_Type', 'Vehicle_Model_Year'])['Fine_Amount'].agg(['count', 'mean']).reset_index()
+    stats = dataframe_backend.aggregate(df, ['Vehicle_Type', 'Vehicle_Model_Year'], ['Fine_Amount'], ['count', 'mean'])
     stats.columns = ['Vehicle Type', 'Model Year', 'Violation Count', 'Avg Fine']
     stats = stats.sort_values(by='Violation Count', ascending=False)
     return stats
 # -------------------------------------------------------------------------------
+@aggregate_cache.cached
 def get_speeding_analysis_by_zone(df: pd.DataFrame) -> pd.DataFrame:
     """
     Analyzes speeding violations grouped by Speed Limit zones.
@@ -245,17 +253,19 @@ def get_speeding_analysis_by_zone(df: pd.DataFrame) -> pd.DataFrame:
     if not all(col in df.columns for col in cols_needed):
         return pd.DataFrame()
     
-    df_speed = df.copy()
-    df_speed['Excess_Speed'] = df_speed['Recorded_Speed'] - df_speed['Speed_Limit']
-    df_speed = df_speed[df_speed['Excess_Speed'] > 0] # Only actual speeding
+    stats = dataframe_backend.aggregate(
+        df, ['Speed_Limit'], ['Excess_Speed'], ['count', 'mean', 'max'],
+        derive={'Excess_Speed': ('Recorded_Speed', '-', 'Speed_Limit')},
+        where=[('Excess_Speed', '>', 0)], # Only actual speeding
+    )
     
-    if df_speed.empty:
+    if stats.empty:
         return pd.DataFrame()
 
-    stats = df_speed.groupby('Speed_Limit')['Excess_Speed'].agg(['count', 'mean', 'max']).reset_index()
     stats.columns = ['Speed Limit Zone', 'Speeding Incidents', 'Avg Excess Speed', 'Max Excess Speed']
     return stats
 # -------------------------------------------------------------------------------
+@aggregate_cache.cached
 def get_environmental_stats(df: pd.DataFrame) -> pd.DataFrame:
     """
     Grouped analysis of violations by Weather Condition and Road Condition.
@@ -264,10 +274,11 @@ def get_environmental_stats(df: pd.DataFrame) -> pd.DataFrame:
     if not all(col in df.columns for col in cols_needed):
         return pd.DataFrame()
         
-    stats = df.groupby(['Weather_Condition', 'Road_Condition']).size().reset_index(name='Violation Count')
+    stats = dataframe_backend.count_rows(df, ['Weather_Condition', 'Road_Condition']).rename(columns={'Count': 'Violation Count'})
     stats = stats.sort_values(by='Violation Count', ascending=False)
     return stats
 # -------------------------------------------------------------------------------
+@aggregate_cache.cached
 def get_hourly_patterns_table(df: pd.DataFrame) -> pd.DataFrame:
     """
     Pivot table of Violation Counts by Day of Week vs Hour of Day.
@@ -275,19 +286,16 @@ def get_hourly_patterns_table(df: pd.DataFrame) -> pd.DataFrame:
     if 'Time' not in df.columns or 'Date' not in df.columns:
         return pd.DataFrame()
         
-    temp_df = df.copy()
-    # Fix UserWarning: parse dates/times with format='mixed' to handle inconsistencies
-    temp_df['Hour'] = pd.to_datetime(temp_df['Time'], format='mixed', errors='coerce').dt.hour
-    temp_df['Day'] = pd.to_datetime(temp_df['Date'], format='mixed', errors='coerce').dt.day_name()
-    
-    # Order days correctly
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    temp_df['Day'] = pd.Categorical(temp_df['Day'], categories=days_order, ordered=True)
+    # Hour and Day_Of_Week are precomputed at ingest; ordered day names keep Monday first
+    df = data_schema.add_temporal_columns(df.copy(deep=False))
+    temp_df = df.assign(Day=data_schema.day_names(df['Day_Of_Week']))
     
     # Fix FutureWarning: specify observed=False for categorical data
     pivot = temp_df.pivot_table(index='Day', columns='Hour', values='Violation_ID', aggfunc='count', fill_value=0, observed=False)
+    pivot.columns = pivot.columns.astype(int) # Plain hour labels (Styler cannot index nullable ones)
     return pivot
 # -------------------------------------------------------------------------------
+@aggregate_cache.cached
 def get_custom_grouping(df: pd.DataFrame, group_cols: list, agg_cols: list, agg_funcs: list) -> pd.DataFrame:
     """
     Dynamically groups the dataframe based on user input.
@@ -295,28 +303,8 @@ def get_custom_grouping(df: pd.DataFrame, group_cols: list, agg_cols: list, agg_
     if not group_cols or not agg_cols or not agg_funcs:
         return pd.DataFrame()
     
-    # Create the aggregation dictionary: apply all selected functions to all selected numerical columns
-    agg_dict = {col: agg_funcs for col in agg_cols}
-    
     try:
-        grouped_df = df.groupby(group_cols).agg(agg_dict).reset_index()
-        
-        # Flatten MultiIndex columns (e.g., ('Fine_Amount', 'sum') -> 'Fine_Amount_sum')
-        new_cols = []
-        for col in grouped_df.columns:
-            if isinstance(col, tuple):
-                 # Skip the grouping columns if they happen to be part of the index/tuple structure in some pandas versions,
-                 # but usually reset_index handles grouping cols nicely.
-                 # The aggregated columns will be tuples like ('Fine_Amount', 'mean')
-                 if col[1] == '':
-                     new_cols.append(col[0])
-                 else:
-                     new_cols.append(f"{col[0]}_{col[1]}")
-            else:
-                new_cols.append(col)
-        
-        grouped_df.columns = new_cols
-        return grouped_df
+        return dataframe_backend.aggregate(df, group_cols, agg_cols, agg_funcs)
     except Exception as e:
         print(f"Grouping Error: {e}")
         return pd.DataFrame()
@@ -328,6 +316,31 @@ def get_custom_grouping(df: pd.DataFrame, group_cols: list, agg_cols: list, agg_
 # Block 4: Map Visualization Functions
 # ========================= Map Visualization Functions ==========================
 
+@aggregate_cache.cached
+def get_map_aggregate(df: pd.DataFrame, location_col: str, value_col: str = None, agg_func: str = 'mean', value_name: str = None) -> pd.DataFrame:
+    """
+    Aggregates a column per location for the choropleth maps.
+
+    Args:
+        df (pd.DataFrame): Source rows.
+        location_col (str): Column holding the state names.
+        value_col (str): Column to aggregate (None = count the violations).
+        agg_func (str): 'mean', 'sum' or 'median' of value_col.
+        value_name (str): Name of the value column (default 'Count', or value_col).
+
+    Returns:
+        pd.DataFrame: [location_col, value_name], one row per location.
+    """
+    if value_col is None:
+        map_data = data_schema.count_values(df[location_col]).reset_index()
+        map_data.columns = [location_col, value_name or 'Count']
+        return map_data
+    values = pd.to_numeric(df[value_col], errors='coerce')
+    map_data = values.groupby(df[location_col], observed=True).agg(agg_func).reset_index()
+    map_data.columns = [location_col, value_name or value_col]
+    return map_data
+# -------------------------------------------------------------------------------
+
 def render_choropleth_map_on_page(map_data, geojson_data, location_col, value_col, state_prop_name, color_theme="YlGnBu", title="Map"):
     """
     Renders a Folium Choropleth map using the core module and displays it on Streamlit.
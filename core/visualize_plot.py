@@ -1,7 +1,9 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import seaborn as sns
 import pandas as pd
 import matplotlib.ticker as mtick
+from core import data_schema
 
 # ---------------------------------------------------------
 # UNIFORM STYLE CONFIGURATION
@@ -47,20 +49,58 @@ def apply_plot_style():
 # Apply global style on module load
 apply_plot_style()
 
+# ---------------------------------------------------------
+# SAMPLING WEIGHTS
+# ---------------------------------------------------------
+# In approximate mode the plots get the rows of a stratified sample (core.stratified_sample)
+# and `weights`: how many dataset rows each sampled row stands for (Estimator.weights).
+# Counts (data_schema.count_values / count_table), sums and means are aggregated with
+# those weights, so bars, wedges and heatmap cells estimate the whole dataset. Without
+# weights every row counts once.
+
+def _row_weights(df, weights=None):
+    """
+    Returns the weights as a Series aligned with df (ones when there are none).
+    """
+    if weights is None:
+        return pd.Series(1.0, index=df.index)
+    return pd.Series(np.asarray(weights, dtype=float), index=df.index)
+
+def sum_by(df, by, column, weights=None):
+    """
+    Weighted sum of a column per group.
+    """
+    if weights is None:
+        return df.groupby(by, observed=True)[column].sum()
+    return (df[column] * _row_weights(df, weights)).groupby(df[by], observed=True).sum().rename(column)
+
+def mean_by(df, by, column, weights=None, observed=True):
+    """
+    Weighted mean of a column per group (a column name or a list of them); missing
+    values are left out as in groupby().mean().
+    """
+    if weights is None:
+        return df.groupby(by, observed=observed)[column].mean()
+    keys = [df[col] for col in by] if isinstance(by, list) else df[by]
+    row_weights = _row_weights(df, weights).where(df[column].notna(), 0.0)
+    sums = (df[column] * row_weights).groupby(keys, observed=observed).sum()
+    return (sums / row_weights.groupby(keys, observed=observed).sum()).rename(column)
+
 # ---------------------------------------------------------
 # PLOT FUNCTIONS
 # ---------------------------------------------------------
 
-def plot_speed_exceeded_vs_weather(df):
+def plot_speed_exceeded_vs_weather(df, weights=None):
     """
     Plots Average Speed Exceeded vs Weather Condition.
     """
     apply_plot_style()
-    df['Speed_Exceeded'] = df['Recorded_Speed'] - df['Speed_Limit']
+    df = df.assign(Speed_Exceeded=df['Recorded_Speed'] - df['Speed_Limit'])
 
     fig, ax = plt.subplots(figsize=FIG_SIZE)
 
-    avg_speed = df.groupby('Weather_Condition')['Speed_Exceeded'].mean().sort_values(ascending=False)
+    avg_speed = mean_by(df, 'Weather_Condition', 'Speed_Exceeded', weights).sort_values(ascending=False)
+    avg_speed.index = avg_speed.index.astype(object) # Plot in sorted order, not category order
 
     sns.barplot(
         x=avg_speed.index,
@@ -84,14 +124,15 @@ def plot_speed_exceeded_vs_weather(df):
     plt.tight_layout()
     return fig
 
-def plot_avg_fine_by_violation_type(df):
+def plot_avg_fine_by_violation_type(df, weights=None):
     """
     Plots Average Fine Amount by Violation Type (Scatter Plot).
     """
     apply_plot_style()
     fig, ax = plt.subplots(figsize=FIG_SIZE)
 
-    avg_fines = df.groupby('Violation_Type')['Fine_Amount'].mean().sort_values(ascending=False)
+    avg_fines = mean_by(df, 'Violation_Type', 'Fine_Amount', weights).sort_values(ascending=False)
+    avg_fines.index = avg_fines.index.astype(object) # Plot in sorted order, not category order
 
     sns.scatterplot(
         x=avg_fines.index, 
@@ -113,7 +154,7 @@ def plot_avg_fine_by_violation_type(df):
     plt.tight_layout()
     return fig
 
-def plot_bar_or_count(df, x_col, y_col):
+def plot_bar_or_count(df, x_col, y_col, weights=None):
     """
     Generates a bar plot or count plot based on the Y-axis selection.
     """
@@ -121,11 +162,13 @@ def plot_bar_or_count(df, x_col, y_col):
     fig, ax = plt.subplots(figsize=FIG_SIZE)
 
     if y_col == 'Count':
-        sns.countplot(x=x_col, data=df, ax=ax, order=df[x_col].value_counts().index, palette=UNI_PALETTE)
+        counts = data_schema.count_values(df[x_col], weights)
+        sns.barplot(x=counts.index, y=counts.values, hue=counts.index, legend=False, ax=ax, palette=UNI_PALETTE)
         ax.set_title(f"Count of {x_col}")
         ax.set_ylabel("Count")
     else:
-        sns.barplot(x=x_col, y=y_col, hue=x_col, legend=False, data=df, ax=ax, estimator=lambda x: x.mean(), palette=UNI_PALETTE)
+        order = df[x_col].dropna().unique()
+        sns.barplot(x=x_col, y=y_col, hue=x_col, legend=False, data=df, ax=ax, estimator='mean', weights=weights, order=order, hue_order=order, palette=UNI_PALETTE)
         ax.set_title(f"Mean of {y_col} by {x_col}")
         ax.set_ylabel(f"Mean {y_col}")
 
@@ -167,10 +210,10 @@ def plot_correlation_heatmap(df, numerical_cols):
 
 # --- MONIKA'S PLOTS ---
 
-def plot_top_5_locations_violation(df):
+def plot_top_5_locations_violation(df, weights=None):
     apply_plot_style()
     fig = plt.figure(figsize=FIG_SIZE)
-    Location_Count = df['Location'].value_counts().head(5)
+    Location_Count = data_schema.count_values(df['Location'], weights).head(5)
     sns.barplot(x=Location_Count.index, y=Location_Count.values, hue=Location_Count.index, legend=False, palette="viridis")
     plt.title("Top 5 Locations (Violations)")
     plt.xlabel("Location")
@@ -180,10 +223,11 @@ def plot_top_5_locations_violation(df):
     plt.close()
     return fig
 
-def plot_vehicle_type_vs_violation_type(df):
+def plot_vehicle_type_vs_violation_type(df, weights=None):
     apply_plot_style()
     fig = plt.figure(figsize=FIG_SIZE)
-    sns.countplot(data=df, x='Violation_Type', hue='Vehicle_Type', palette=UNI_PALETTE)
+    counts = data_schema.count_table(df, 'Violation_Type', 'Vehicle_Type', weights).stack().rename('Count').reset_index()
+    sns.barplot(data=counts, x='Violation_Type', y='Count', hue='Vehicle_Type', order=df['Violation_Type'].dropna().unique(), hue_order=df['Vehicle_Type'].dropna().unique(), palette=UNI_PALETTE)
     plt.title('Vehicle Type vs Violation Type')
     plt.xlabel('Violation Type')
     plt.ylabel('Number of Violations')
@@ -198,9 +242,9 @@ def plot_vehicle_type_vs_violation_type(df):
 
 # --- AMITH'S PLOTS ---
 
-def plot_violation_type_percentage(df):
+def plot_violation_type_percentage(df, weights=None):
     apply_plot_style()
-    violation_counts = df['Violation_Type'].value_counts()
+    violation_counts = data_schema.count_values(df['Violation_Type'], weights)
     fig = plt.figure(figsize=FIG_SIZE)
     
     # Use distinct colors
@@ -221,14 +265,15 @@ def plot_violation_type_percentage(df):
 
 # --- HARIKA'S PLOTS ---
 
-def plot_repeat_offenders(df):
+def plot_repeat_offenders(df, weights=None):
+    # Lists individual records, so sampling weights do not apply
     apply_plot_style()
     fig = plt.figure(figsize=FIG_SIZE)
     # Use a high contrast sequential palette
     palette = sns.color_palette("rocket_r", n_colors=10) 
     
     if 'Previous_Violations' in df.columns:
-        violations = df[df['Previous_Violations']>3].head(10)
+        violations = data_schema.format_ids(df[df['Previous_Violations']>3].head(10))
         if not violations.empty:
             plt.barh(
                 violations.get('Violation_ID', range(len(violations))), 
@@ -246,9 +291,9 @@ def plot_repeat_offenders(df):
     plt.close()
     return fig
 
-def plot_violation_by_location_pie(df):
+def plot_violation_by_location_pie(df, weights=None):
     apply_plot_style()
-    location_counts = df["Location"].value_counts()
+    location_counts = data_schema.count_values(df["Location"], weights)
     if len(location_counts) > 10:
         top_n = location_counts.head(10)
         others_count = location_counts.iloc[10:].sum()
@@ -288,14 +333,15 @@ def plot_violation_by_location_pie(df):
 
 # --- DARSANA'S PLOTS ---
 
-def plot_speeding_vs_road_condition(df):
+def plot_speeding_vs_road_condition(df, weights=None):
     apply_plot_style()
-    df = df.copy()
     if 'Recorded_Speed' in df.columns and 'Speed_Limit' in df.columns:
-        df['Speeding'] = df['Recorded_Speed'] - df['Speed_Limit']
-        speed_df = df[df['Speeding'] > 0]
+        df = df.assign(Speeding=df['Recorded_Speed'] - df['Speed_Limit'])
+        speeding = (df['Speeding'] > 0).to_numpy()
+        speed_df = df[speeding]
         
-        avg_speeding = speed_df.groupby('Road_Condition')['Speeding'].mean().reset_index()
+        avg_speeding = mean_by(speed_df, 'Road_Condition', 'Speeding', None if weights is None else np.asarray(weights)[speeding]).reset_index()
+        avg_speeding['Road_Condition'] = avg_speeding['Road_Condition'].astype(object)
         
         fig = plt.figure(figsize=FIG_SIZE)
         sns.barplot(
@@ -316,10 +362,11 @@ def plot_speeding_vs_road_condition(df):
         return fig
     return None
 
-def plot_fines_vs_weather_severity(df):
+def plot_fines_vs_weather_severity(df, weights=None):
     apply_plot_style()
     fig = plt.figure(figsize=FIG_SIZE)
-    df_severity = df.groupby('Weather_Condition')['Fine_Amount'].mean().sort_values()
+    df_severity = mean_by(df, 'Weather_Condition', 'Fine_Amount', weights).sort_values()
+    df_severity.index = df_severity.index.astype(object) # Plot in sorted order, not category order
     
     sns.barplot(
         x=df_severity.values,
@@ -340,32 +387,26 @@ def plot_fines_vs_weather_severity(df):
 
 # --- MRUNALINI'S PLOTS ---
 
-def plot_severity_heatmap_by_location(df):
+def plot_severity_heatmap_by_location(df, weights=None):
     apply_plot_style()
-    df = df.copy()
     
-    def calc_severity_score(row):
-        severity = 0
-        if pd.notnull(row.get('Fine_Amount')): severity += row['Fine_Amount'] / 1000
-        if pd.notnull(row.get('Penalty_Points')): severity += row['Penalty_Points'] 
-        if pd.notnull(row.get('Recorded_Speed')) and pd.notnull(row.get('Speed_Limit')):
-            overspeed = row['Recorded_Speed'] - row['Speed_Limit']
-            if overspeed > 0: severity += overspeed /10
-        if pd.notnull(row.get('Alcohol_Level')): severity += row['Alcohol_Level'] * 10
-        if row.get('Helmet_Worn') == 'No': severity += 10
-        if row.get('Seatbelt_Worn') == 'No': severity += 10
-        if row.get('Traffic_Light_Status') == 'Red': severity += 15
-        if pd.notnull(row.get('Previous_Violations')): severity += row['Previous_Violations'] * 1.5
-        return severity
-
-    df['Violation_Severity_Score'] = df.apply(calc_severity_score, axis=1)
+    def calc_severity_score(frame):
+        # Column-wise version of the per-row score (missing values add nothing)
+        overspeed = (frame['Recorded_Speed'] - frame['Speed_Limit']).clip(lower=0)
+        return (
+            (frame['Fine_Amount'] / 1000).fillna(0)
+            + frame['Penalty_Points'].fillna(0)
+            + (overspeed / 10).fillna(0)
+            + (frame['Alcohol_Level'] * 10).fillna(0)
+            + data_schema.flag_mask(frame['Helmet_Worn'], False) * 10
+            + data_schema.flag_mask(frame['Seatbelt_Worn'], False) * 10
+            + (frame['Traffic_Light_Status'] == 'Red') * 15
+            + (frame['Previous_Violations'] * 1.5).fillna(0)
+        )
+
+    df = df.assign(Violation_Severity_Score=calc_severity_score(df))
     
-    location_heatmap = df.pivot_table(
-        values='Violation_Severity_Score',
-        index='Location',
-        columns='Violation_Type',
-        aggfunc='mean'
-    )
+    location_heatmap = mean_by(df, ['Location', 'Violation_Type'], 'Violation_Severity_Score', weights).unstack()
 
     fig = plt.figure(figsize=FIG_SIZE)
     sns.heatmap(
@@ -384,19 +425,19 @@ def plot_severity_heatmap_by_location(df):
 
 # --- POOJITHA'S PLOTS ---
 
-def plot_speed_exceeded_vs_weather_2(df):
-    return plot_speed_exceeded_vs_weather(df) # Reuse standardized function
+def plot_speed_exceeded_vs_weather_2(df, weights=None):
+    return plot_speed_exceeded_vs_weather(df, weights) # Reuse standardized function
 
-def plot_avg_fine_by_violation_type_2(df):
-    return plot_avg_fine_by_violation_type(df) # Reuse standardized function
+def plot_avg_fine_by_violation_type_2(df, weights=None):
+    return plot_avg_fine_by_violation_type(df, weights) # Reuse standardized function
 
 # --- RAKSHITHA'S PLOTS ---
 
 
 
-def plot_violation_by_road_condition(df):
+def plot_violation_by_road_condition(df, weights=None):
     apply_plot_style()
-    road_counts = df['Road_Condition'].value_counts()
+    road_counts = data_schema.count_values(df['Road_Condition'], weights)
     
     fig, ax = plt.subplots(figsize=FIG_SIZE)
     
@@ -429,15 +470,9 @@ def plot_violation_by_road_condition(df):
 
 # --- SANIYA'S PLOTS ---
 
-def plot_weather_impact_heatmap(df):
+def plot_weather_impact_heatmap(df, weights=None):
     apply_plot_style()
-    pivot = df.pivot_table(
-        index="Violation_Type",
-        columns="Weather_Condition",
-        values="Violation_ID",
-        aggfunc="count",
-        fill_value=0
-    )
+    pivot = data_schema.count_table(df, "Violation_Type", "Weather_Condition", weights)
     fig = plt.figure(figsize=FIG_SIZE)
     sns.heatmap(
         pivot, 
@@ -460,15 +495,16 @@ def plot_weather_impact_heatmap(df):
 
 # --- SANJANA'S PLOTS ---
 
-def plot_vehicle_risk_countplot(df):
+def plot_vehicle_risk_countplot(df, weights=None):
     apply_plot_style()
-    vehicle_counts = df['Vehicle_Type'].value_counts().index
+    vehicle_counts = data_schema.count_values(df['Vehicle_Type'], weights)
     fig = plt.figure(figsize=FIG_SIZE)
-    sns.countplot(
-        y=df['Vehicle_Type'],
-        order=vehicle_counts,
+    sns.barplot(
+        x=vehicle_counts.values,
+        y=vehicle_counts.index,
+        orient='h',
         palette='Reds_r', # Intensity indicates risk/freq
-        hue=df['Vehicle_Type'],
+        hue=vehicle_counts.index,
         legend=False
     )
     plt.title('Vehicle-Type Based Risk Analysis')
@@ -480,9 +516,8 @@ def plot_vehicle_risk_countplot(df):
     plt.close()
     return fig
 
-def plot_age_alcohol_heatmap(df):
+def plot_age_alcohol_heatmap(df, weights=None):
     apply_plot_style()
-    df = df.copy()
     bins = [0, 25, 35, 45, 60, 100]
     labels = ["18-25", "26-35", "36-45", "46-60", "60+"]
     
@@ -495,10 +530,12 @@ def plot_age_alcohol_heatmap(df):
     if len(ranges) - 1 != len(safelevels): 
         return None
 
-    df["Age_Group"] = pd.cut(df["Driver_Age"], bins=bins, labels=labels, include_lowest=True)
-    df["Alcohol_Range"] = pd.cut(df["Alcohol_Level"], bins=ranges, labels=safelevels, include_lowest=True)
+    df = df.assign(
+        Age_Group=pd.cut(df["Driver_Age"], bins=bins, labels=labels, include_lowest=True),
+        Alcohol_Range=pd.cut(df["Alcohol_Level"], bins=ranges, labels=safelevels, include_lowest=True),
+    )
     
-    heatmap_data = pd.crosstab(df['Age_Group'], df['Alcohol_Range'])
+    heatmap_data = data_schema.count_table(df, 'Age_Group', 'Alcohol_Range', weights)
     
     fig = plt.figure(figsize=FIG_SIZE)
     sns.heatmap(
@@ -519,9 +556,9 @@ def plot_age_alcohol_heatmap(df):
 
 # --- ISHWARI'S PLOTS ---
 
-def plot_fine_vs_vehicle_pie(df):
+def plot_fine_vs_vehicle_pie(df, weights=None):
     apply_plot_style()
-    fine_data = df.groupby('Vehicle_Type')['Fine_Amount'].sum()
+    fine_data = sum_by(df, 'Vehicle_Type', 'Fine_Amount', weights)
     fig, ax = plt.subplots(figsize=FIG_SIZE)
     
     wedges, texts, autotexts = ax.pie(
@@ -548,9 +585,9 @@ def plot_fine_vs_vehicle_pie(df):
 
 # ---- Anshu's Plots ----
 
-def plot_license_validity_by_gender(df):
+def plot_license_validity_by_gender(df, weights=None):
     apply_plot_style()
-    validity_gender = df.groupby(['License_Validity', 'Driver_Gender']).size().unstack(fill_value=0)
+    validity_gender = data_schema.count_table(df, 'License_Validity', 'Driver_Gender', weights)
     
     fig, ax = plt.subplots(figsize=FIG_SIZE)
     validity_gender.plot(
@@ -568,7 +605,8 @@ def plot_license_validity_by_gender(df):
     plt.tight_layout()
     return fig
 
-def plot_fine_amount_distribution_vs_weather(df):
+def plot_fine_amount_distribution_vs_weather(df, weights=None):
+    # Violin plots draw the sampled rows' distribution: seaborn cannot weight them
     apply_plot_style()
     plt.figure(figsize=FIG_SIZE)
     sns.violinplot(
@@ -578,6 +616,8 @@ def plot_fine_amount_distribution_vs_weather(df):
         inner='box', 
         palette="muted",
         hue='Weather_Condition',
+        order=df['Weather_Condition'].dropna().unique(),
+        hue_order=df['Weather_Condition'].dropna().unique(),
         legend=False
     )
     
@@ -589,10 +629,10 @@ def plot_fine_amount_distribution_vs_weather(df):
     plt.tight_layout()
     return plt.gcf()
 
-def plot_violation_types_vs_weather_heatmap(df):
+def plot_violation_types_vs_weather_heatmap(df, weights=None):
     apply_plot_style()
     plt.figure(figsize=FIG_SIZE)
-    heatmap_violation = pd.crosstab(df['Weather_Condition'], df['Violation_Type'])
+    heatmap_violation = data_schema.count_table(df, 'Weather_Condition', 'Violation_Type', weights)
     
     sns.heatmap(
         heatmap_violation, 
@@ -612,17 +652,17 @@ def plot_violation_types_vs_weather_heatmap(df):
 
 
 
-def plot_driver_risk_by_age(df):
+def plot_driver_risk_by_age(df, weights=None):
     apply_plot_style()
-    df = df.copy()
     bins = [0, 25, 35, 45, 60, 100]
     labels = ["18-25", "26-35", "36-45", "46-60", "60+"]
-    df["Age_Group"] = pd.cut(df["Driver_Age"], bins=bins, labels=labels, include_lowest=True)
-    
-    df['Alcohol_Flag'] = (df['Breathalyzer_Result'] == "Positive").astype(int)
-    df["Risk_Level"] = df["Previous_Violations"] + df["Alcohol_Flag"]
+    df = df.assign(
+        Age_Group=pd.cut(df["Driver_Age"], bins=bins, labels=labels, include_lowest=True),
+        Alcohol_Flag=(df['Breathalyzer_Result'] == "Positive").astype(int),
+        Risk_Level=lambda d: d["Previous_Violations"] + d["Alcohol_Flag"],
+    )
 
-    risk_by_age = df.groupby("Age_Group", observed=False)["Risk_Level"].mean().reset_index()
+    risk_by_age = mean_by(df, "Age_Group", "Risk_Level", weights, observed=False).reset_index()
     risk_by_age = risk_by_age.sort_values("Age_Group")
 
     fig, ax = plt.subplots(figsize=FIG_SIZE)
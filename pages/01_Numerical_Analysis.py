@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from core.sidebar import render_sidebar
-from core import utils
+from core import data_schema, downloads, excel_export, partition_store, utils
 
 # ------------------------------
 # PAGE CONFIG
@@ -125,6 +125,7 @@ quick_navigator = """
             <a class="nav-pill" href="#environmental-impact" target="_self">Environment</a>
             <a class="nav-pill" href="#hourly-violation-patterns" target="_self">Hourly</a>
             <a class="nav-pill" href="#custom-tabular-analysis" target="_self">Custom</a>
+            <a class="nav-pill" href="#export-report" target="_self">Export</a>
         </div>
     </div>
     """
@@ -149,7 +150,7 @@ except Exception as e:
 # ------------------------------
 with st.expander("Filters", expanded=True):
     start_date, end_date = None, None
-    df = df_original.copy() # Work with a copy
+    df = df_original.copy(deep=False) # Work on a lazy copy (copy-on-write)
 
     try:
         if 'Date' in df.columns:
@@ -175,14 +176,10 @@ with st.expander("Filters", expanded=True):
         if start_date > end_date:
             st.error("Error: End date must fall after start date.")
             st.stop()
-        df_filtered = df[(df['Date'].dt.date >= start_date) & (df['Date'].dt.date <= end_date)]
+        df_filtered = partition_store.filter_days(df, start_date, end_date)
     else:
         df_filtered = df
 
-    # CRITICAL FIX: Ensure Violation_ID is string to prevent PyArrow serialization errors
-    if 'Violation_ID' in df_filtered.columns:
-        df_filtered['Violation_ID'] = df_filtered['Violation_ID'].astype(str)
-        
     st.write(f"### Showing data for `{df_filtered.shape[0]}`x`{df_filtered.shape[1]}` records based on the selected filters.")
 st.markdown("---")
 
@@ -200,7 +197,7 @@ st.dataframe(data_quality_df, width='stretch', hide_index=True)
 st.subheader("5 Sample Rows of the Dataset")
 st.write("This section provides a combined view of column names, data types, and descriptive statistics for the filtered data.")
 with st.expander("5 Sample Rows", expanded=True):
-    st.write(df_filtered.sample(5))
+    st.write(data_schema.format_ids(df_filtered.sample(5)))
 st.markdown("---")
 # -----------------------------------
 # Column Information
@@ -219,7 +216,8 @@ with st.expander("Column Information", expanded=True):
     info_df = info_df.reset_index(drop=True)
 
     # Get the descriptive statistics & Merge the two dataframes
-    desc_df = df_filtered.describe(include='all').transpose()
+    # IDs are described as the text labels they are, not as numbers
+    desc_df = data_schema.format_ids(df_filtered).describe(include='all').transpose()
     for col in desc_df.columns:
         if desc_df[col].dtype == 'object':
             desc_df[col] = desc_df[col].astype(str)
@@ -306,10 +304,13 @@ st.markdown("---")
 st.markdown('<h2 id="custom-analysis" style="text-align: center;">Custom Tabular Analysis</h3>', unsafe_allow_html=True)
 st.write("This section provides a combined view of column names, data types, and descriptive statistics for the filtered data.")
 
+custom_df = None
 with st.expander("🛠️ Custom Grouping & Aggregation", expanded=True):
     # Separate columns by type
-    cat_cols = df_filtered.select_dtypes(include=['object', 'category', 'bool']).columns.tolist()
-    num_cols = df_filtered.select_dtypes(include=['number']).columns.tolist()
+    # Numerically stored IDs are labels, so they group like text columns
+    label_cols = set(df_filtered.select_dtypes(include=['object', 'category', 'bool']).columns) | set(data_schema.id_columns(df_filtered))
+    cat_cols = [col for col in df_filtered.columns if col in label_cols]
+    num_cols = data_schema.numeric_columns(df_filtered)
 
     c1, c2, c3 = st.columns(3)
     with c1:
@@ -320,21 +321,45 @@ with st.expander("🛠️ Custom Grouping & Aggregation", expanded=True):
         selected_funcs = st.multiselect("3. Select Aggregation Functions", ['count', 'sum', 'mean', 'min', 'max', 'std'], default=['count', 'mean'])
 
     if selected_group_cols and selected_agg_cols and selected_funcs:
-        custom_df = utils.get_custom_grouping(df_filtered, selected_group_cols, selected_agg_cols, selected_funcs)
+        custom_df = data_schema.format_ids(utils.get_custom_grouping(df_filtered, selected_group_cols, selected_agg_cols, selected_funcs))
         
         if not custom_df.empty:
             st.write(f"### Resulting Table: {custom_df.shape[0]} rows")
             st.dataframe(custom_df, width='stretch')
             
-            # Download button
-            csv = custom_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="📥 Download CSV",
-                data=csv,
-                file_name="custom_analysis.csv",
-                mime="text/csv",
-            )
+            # Download button (the CSV is only written once asked for)
+            if st.button("📥 Prepare CSV", key="num_custom_csv"):
+                with open(downloads.table_csv(custom_df), "rb") as f:
+                    st.download_button(
+                        label="📥 Download CSV",
+                        data=f,
+                        file_name="custom_analysis.csv",
+                        mime=downloads.MIME_TYPES['csv'],
+                        on_click="ignore",
+                    )
     else:
         st.info("Please select at least one Grouping Column, one Aggregation Column, and one Function to generate the table.")
 
 st.markdown("---")
+
+# 6. Excel Report
+# -------------------------------------------------------------------------
+st.markdown('<h2 id="export-report" style="text-align: center;">Export Report</h3>', unsafe_allow_html=True)
+st.write("Download every table of this page (with the custom grouping, if one is selected) as one Excel workbook, one sheet per table.")
+if st.button("📊 Build Excel Report", key="num_excel_build"):
+    # Written on request only, streamed sheet by sheet so large tables stay within constant memory
+    with st.spinner("Writing workbook..."):
+        report = excel_export.export_workbook({
+            "Violation Statistics": violation_stats,
+            "Vehicle Analysis": vehicle_stats,
+            "Environmental Impact": env_stats,
+            "Hourly Patterns": hourly_pivot,
+            "Custom Analysis": custom_df,
+        })
+    st.download_button(
+        label="📥 Download Excel Report",
+        data=report,
+        file_name="numerical_analysis.xlsx",
+        mime=excel_export.XLSX_MIME,
+        on_click="ignore",
+    )
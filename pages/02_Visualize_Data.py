@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-from core.sidebar import render_sidebar
+from core.sidebar import render_sidebar, render_sample_mode
 import core.visualize_plot as visualize_plot
+from core import data_schema, partition_store
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -185,6 +186,10 @@ try:
     if df is None:
         st.warning("No dataset selected. Please select one from the sidebar.")
         st.stop()
+    # Approximate mode: plots are drawn from the dataset's stratified sample (core.stratified_sample)
+    sample = render_sample_mode(df)
+    if sample:
+        df = sample.df
 except Exception as e:
     st.error(f"An error occurred while loading the data: {e}")
     st.stop()
@@ -213,7 +218,7 @@ def render_plot_item(title, insight, plot_func, team_member_name, df_local, key_
         key_start = f"start_{key_suffix}"
         key_end = f"end_{key_suffix}"
         
-        filtered_df = df_local.copy()
+        filtered_df = df_local # Filtering below builds new frames; df_local itself is never modified
         
         # Determine min/max date if possible
         min_d, max_d = None, None
@@ -240,17 +245,15 @@ def render_plot_item(title, insight, plot_func, team_member_name, df_local, key_
                     st.error("Start Date must be before End Date.")
                 else:
                     if filtered_df['Date'].dtype == 'object':
-                            filtered_df['Date'] = pd.to_datetime(filtered_df['Date'], errors='coerce')
+                            filtered_df = filtered_df.assign(Date=pd.to_datetime(filtered_df['Date'], errors='coerce'))
                     
-                    filtered_df = filtered_df[
-                        (filtered_df['Date'].dt.date >= s_date) & 
-                        (filtered_df['Date'].dt.date <= e_date)
-                    ]
+                    filtered_df = partition_store.filter_days(filtered_df, s_date, e_date)
         
         if filtered_df.empty:
             st.warning("No data available for the selected range.")
         else:
-            total_records = len(filtered_df)
+            total_records = f"{sample.estimator(filtered_df).count()}" if sample else len(filtered_df)
+            weights = sample.estimator(filtered_df).weights() if sample else None # Scales the sampled rows up to the dataset
             date_range_str = f"`{s_date}` to `{e_date}`" if s_date and e_date else "All Time"
 
             # Uniform Layout: Plot (Large) | Insight (Small) -> 4 : 1
@@ -258,7 +261,7 @@ def render_plot_item(title, insight, plot_func, team_member_name, df_local, key_
             
             with col_plot:
                 try:
-                    fig = plot_func(filtered_df)
+                    fig = plot_func(filtered_df, weights=weights)
                     if fig:
                         st.pyplot(fig, width='stretch')
                     else:
@@ -472,8 +475,8 @@ with st.expander("Custom Bar/Count Plot", expanded=True):
     
     with st.form(key="bar_plot_form"):
         # --- Bar Plot Controls ---
-        all_categorical_cols = [col for col in df.columns if df[col].dtype == 'object' and df[col].nunique() < 100]
-        all_numerical_cols = df.select_dtypes(include=['float64', 'int64']).columns.tolist()
+        all_categorical_cols = [col for col in df.columns if df[col].dtype in ('object', 'category') and df[col].nunique() < 100]
+        all_numerical_cols = data_schema.numeric_columns(df)
 
         if not all_categorical_cols:
             st.warning("No suitable categorical columns found for the X-axis of a bar plot.")
@@ -488,7 +491,7 @@ with st.expander("Custom Bar/Count Plot", expanded=True):
 
             # --- Date Range Selector ---
             bar_start_date, bar_end_date = None, None
-            plot_df_bar = df.copy()
+            plot_df_bar = df.copy(deep=False)
             # Date filtering setup (simplified for form context if needed, but keeping logic)
             # Note: Inputs in form is fine.
 
@@ -523,20 +526,21 @@ with st.expander("Custom Bar/Count Plot", expanded=True):
         else:
             # Filter by date if applicable
             if bar_start_date and bar_end_date:
-                plot_df_bar = plot_df_bar[(plot_df_bar['Date'].dt.date >= bar_start_date) & (plot_df_bar['Date'].dt.date <= bar_end_date)]
+                plot_df_bar = partition_store.filter_days(plot_df_bar, bar_start_date, bar_end_date)
             
             if plot_df_bar.empty:
                 st.warning("No data available for the selected criteria.")
             else:
-                fig = visualize_plot.plot_bar_or_count(plot_df_bar, x_col_bar, y_col_bar)
+                bar_weights = sample.estimator(plot_df_bar).weights() if sample else None
+                fig = visualize_plot.plot_bar_or_count(plot_df_bar, x_col_bar, y_col_bar, bar_weights)
                 st.pyplot(fig, width='stretch')
 
                 # Display the underlying data in an expander
                 with st.expander("View Data"):
                     if y_col_bar == 'Count':
-                        st.dataframe(plot_df_bar[x_col_bar].value_counts())
+                        st.dataframe(data_schema.count_values(plot_df_bar[x_col_bar], bar_weights))
                     else:
-                        st.dataframe(plot_df_bar.groupby(x_col_bar)[y_col_bar].mean())
+                        st.dataframe(visualize_plot.mean_by(plot_df_bar, x_col_bar, y_col_bar, bar_weights))
 
 # ====================================== Removed Plots =======================================================
 
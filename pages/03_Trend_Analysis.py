@@ -2,8 +2,13 @@ import streamlit as st
 import pandas as pd
 from core.sidebar import render_sidebar
 import core.trend_plot as trend_plot
+from core import data_schema, partition_store
 import matplotlib.pyplot as plt
 
+# Columns read by this page for traffic datasets: Date, fines and every low-cardinality
+# column (x-axis, trend line and heatmap choices). IDs and free text are not loaded.
+TREND_COLUMNS = ['Date', 'Fine_Amount', *data_schema.CATEGORY_VOCABULARIES, *data_schema.FLAG_COLUMNS]
+
 # ------------------------------
 # PAGE CONFIG
 # ------------------------------
@@ -149,7 +154,7 @@ st.markdown(quick_navigator, unsafe_allow_html=True)
 # ------------------------------
 
 try:
-    df = render_sidebar()
+    df = render_sidebar(columns=TREND_COLUMNS)
     if df is None:
         st.warning("No dataset selected or loaded. Please select a dataset from the sidebar.")
         st.stop()
@@ -168,9 +173,7 @@ def render_hardcoded_trend_plots(df):
     if 'Date' not in df.columns:
          return
     
-    # Create working copy
-    df_plot = df.copy()
-    df_plot['Date'] = pd.to_datetime(df_plot['Date'], errors='coerce')
+    df_plot = data_schema.add_temporal_columns(df.copy(deep=False))
     df_plot = df_plot.dropna(subset=['Date'])
     
     if df_plot.empty:
@@ -223,12 +226,12 @@ def render_hardcoded_trend_plots(df):
         # The values `sel_viol`, `start_d` etc. are updated.
 
         # Filter Date
-        data_filtered = dataset.copy()
+        data_filtered = dataset
         if start_d and end_d:
             if start_d > end_d:
                 st.error("End Date must be after Start Date")
                 return
-            data_filtered = data_filtered[(data_filtered['Date'].dt.date >= start_d) & (data_filtered['Date'].dt.date <= end_d)]
+            data_filtered = partition_store.filter_days(data_filtered, start_d, end_d)
 
         # Filter Violation
         if sel_viol:
@@ -240,8 +243,8 @@ def render_hardcoded_trend_plots(df):
 
         # --- Plotting Logic ---
         if timeframe_col == 'Month':
-            data_filtered['Month'] = data_filtered['Date'].dt.month_name()
-            counts = data_filtered.groupby(['Month', 'Violation_Type']).size().reset_index(name='Count')
+            data_filtered = data_filtered.assign(Month=data_schema.month_names(data_filtered['Month']))
+            counts = data_filtered.groupby(['Month', 'Violation_Type'], observed=True).size().reset_index(name='Count')
             if not counts.empty:
                 pivot_data = counts.pivot(index='Month', columns='Violation_Type', values='Count').fillna(0)
                 month_order = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
@@ -252,8 +255,7 @@ def render_hardcoded_trend_plots(df):
                 st.info("No data to plot.")
 
         elif timeframe_col == 'Year':
-            data_filtered['Year'] = data_filtered['Date'].dt.year
-            counts = data_filtered.groupby(['Year', 'Violation_Type']).size().reset_index(name='Count')
+            counts = data_filtered.groupby(['Year', 'Violation_Type'], observed=True).size().reset_index(name='Count')
             if not counts.empty:
                 pivot_data = counts.pivot(index='Year', columns='Violation_Type', values='Count').fillna(0)
                 fig = trend_plot.plot_trend_analysis_line(pivot_data, plot_func_x_label, "Violation_Type")
@@ -285,7 +287,7 @@ def render_plot_item(title, insight, plot_func, team_member_name, df_local, key_
         key_start = f"start_{key_suffix}"
         key_end = f"end_{key_suffix}"
         
-        filtered_df = df_local.copy()
+        filtered_df = df_local # Filtering below builds new frames; df_local itself is never modified
         
         min_d, max_d = None, None
         if 'Date' in df_local.columns:
@@ -310,12 +312,9 @@ def render_plot_item(title, insight, plot_func, team_member_name, df_local, key_
                     st.error("Start Date must be before End Date.")
                 else:
                     if filtered_df['Date'].dtype == 'object':
-                            filtered_df['Date'] = pd.to_datetime(filtered_df['Date'], errors='coerce')
+                            filtered_df = filtered_df.assign(Date=pd.to_datetime(filtered_df['Date'], errors='coerce'))
                     
-                    filtered_df = filtered_df[
-                        (filtered_df['Date'].dt.date >= s_date) & 
-                        (filtered_df['Date'].dt.date <= e_date)
-                    ]
+                    filtered_df = partition_store.filter_days(filtered_df, s_date, e_date)
         
         if filtered_df.empty:
             st.warning("No data available for the selected range.")
@@ -370,7 +369,7 @@ def render_trend_analysis_line_plot_section():
         # DATA PREPARATION & VALIDATION
         # ------------------------------
         try:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+            data_schema.add_temporal_columns(df) # Year, Month, Year_Month, ... (precomputed at ingest)
             df.dropna(subset=['Date'], inplace=True)
         except KeyError:
             st.error("The selected dataset does not have a 'Date' column, which is required for trend analysis.")
@@ -429,7 +428,7 @@ def render_trend_analysis_line_plot_section():
 
             start_date_dt = pd.to_datetime(start_date)
             end_date_dt = pd.to_datetime(end_date)
-            df_filtered = df[(df['Date'] >= start_date_dt) & (df['Date'] <= end_date_dt)].copy()
+            df_filtered = df[(df['Date'] >= start_date_dt) & (df['Date'] <= end_date_dt)]
 
             # --- Apply Multi-Filter ---
             if selected_filter_values:
@@ -439,15 +438,11 @@ def render_trend_analysis_line_plot_section():
                 st.warning("No data available for the selected date range.")
                 st.stop()
 
-            if X_axis == 'Year':
-                df_filtered['Year'] = df_filtered['Date'].dt.year
-            elif X_axis == 'Month':
-                df_filtered['Month'] = df_filtered['Date'].dt.month_name()
-            elif X_axis == "Year_Month":
-                df_filtered['Year_Month'] = df_filtered['Date'].dt.to_period('M')
+            if X_axis == 'Month' and pd.api.types.is_integer_dtype(df_filtered['Month']):
+                df_filtered['Month'] = data_schema.month_names(df_filtered['Month'])
 
             try:
-                attribute_based_counts = df_filtered.groupby([X_axis, Lines]).size().reset_index(name='Count')
+                attribute_based_counts = df_filtered.groupby([X_axis, Lines], observed=True).size().reset_index(name='Count')
             except KeyError:
                 st.error(f"The selected columns '{X_axis}' or '{Lines}' are not found in the dataset.")
                 st.stop()
@@ -488,7 +483,7 @@ def render_categorical_heatmap_section():
     st.markdown("Analyze the percentage of a specific outcome (e.g., 'Court Appearance Required') across different categories.")
 
     with st.expander("Configure Categorical Heatmap", expanded=False):
-        all_categorical_cols = [col for col in df.columns if df[col].dtype == 'object' and df[col].nunique() > 1 and df[col].nunique() < 50]
+        all_categorical_cols = [col for col in df.columns if df[col].dtype in ('object', 'category', 'boolean') and df[col].nunique() > 1 and df[col].nunique() < 50]
         
         if not all_categorical_cols:
             st.warning("No suitable categorical columns found for this analysis.")
@@ -544,25 +539,23 @@ def render_categorical_heatmap_section():
                 if start_date_cat > end_date_cat:
                     st.error("Error: End date must fall after start date.")
                     st.stop()
-                df_filtered = df[(df['Date'].dt.date >= start_date_cat) & (df['Date'].dt.date <= end_date_cat)].copy()
+                df_filtered = partition_store.filter_days(df, start_date_cat, end_date_cat)
             else:
-                df_filtered = df.copy()
+                df_filtered = df.copy(deep=False)
 
             # --- Merged plotting logic ---
             df_copy = df_filtered
             if x_col in ['Year', 'Month', 'DayOfWeek'] and 'Date' in df_copy.columns:
-                # Date conversion already done, just extract parts
-                if x_col == 'Year':
-                    df_copy[x_col] = df_copy['Date'].dt.year
-                elif x_col == 'Month':
-                    df_copy[x_col] = df_copy['Date'].dt.month_name()
+                # Year, Month and Day_Of_Week are precomputed at ingest, only names are mapped here
+                if x_col == 'Month':
+                    df_copy[x_col] = data_schema.month_names(df_copy['Month'])
                 elif x_col == 'DayOfWeek':
-                    df_copy[x_col] = df_copy['Date'].dt.day_name()
+                    df_copy[x_col] = data_schema.day_names(df_copy['Day_Of_Week'])
 
             df_copy['_flag'] = df_copy[category_col].astype(str).str.lower()
             
-            totals = df_copy.groupby([group_col, x_col]).size().reset_index(name='Total')
-            positive_cases = df_copy[df_copy['_flag'] == str(positive_value).lower()].groupby([group_col, x_col]).size().reset_index(name='Yes')
+            totals = df_copy.groupby([group_col, x_col], observed=True).size().reset_index(name='Total')
+            positive_cases = df_copy[df_copy['_flag'] == str(positive_value).lower()].groupby([group_col, x_col], observed=True).size().reset_index(name='Yes')
             
             merged = totals.merge(positive_cases, on=[group_col, x_col], how='left')
             merged['Yes'] = merged['Yes'].fillna(0)
@@ -3,11 +3,15 @@ import pandas as pd
 from core.sidebar import render_sidebar
 from core.utils import (
     find_location_columns,
+    get_map_aggregate,
     render_choropleth_map_on_page,
     
 )
 import core.map_plot as map_plot
-from core.data_variables import TRAFFIC_VIOLATION_COLUMNS
+from core import data_schema, partition_store
+
+# Columns read by this page: the state columns and the numeric columns offered in the custom map
+MAP_COLUMNS = ['Date', 'Location', 'Registration_State', 'Alcohol_Level', *data_schema.INTEGER_COLUMNS]
 
 # ------------------------------
 # PAGE CONFIG
@@ -28,7 +32,7 @@ st.set_page_config(
 # LOAD DATA
 # ------------------------------
 try:
-    df = render_sidebar()
+    df = render_sidebar(traffic_only=True, columns=MAP_COLUMNS)
     if df is None:
         st.warning("No dataset selected. Please select one from the sidebar.")
         st.stop()
@@ -42,7 +46,7 @@ except Exception as e:
 st.title("🗺️ Map Visualization")
 st.markdown("Visualize traffic violation data across India.")
 
-if set(TRAFFIC_VIOLATION_COLUMNS).issubset(set(df.columns)) is False:
+if set(MAP_COLUMNS).issubset(set(df.columns)) is False:
     st.error("No traffic violation columns found in the dataset.")
     st.stop()
 
@@ -70,7 +74,7 @@ valid_location_cols = find_location_columns(df, known_states)
 
 if not valid_location_cols:
     # Fallback to categorical columns
-    valid_location_cols = [col for col in df.select_dtypes(include=['object']).columns if df[col].nunique() < 50]
+    valid_location_cols = [col for col in df.select_dtypes(include=['object', 'category']).columns if df[col].nunique() < 50]
     if not valid_location_cols:
         st.error("No suitable location/categorical column found.")
         st.stop()
@@ -93,12 +97,10 @@ else:
     sel_years_viol = st.slider("Filter by Year", min_year, max_year, (min_year, max_year), key="viol_slider")
 
 # Filter
-mask_viol = (df['Date'].dt.year >= sel_years_viol[0]) & (df['Date'].dt.year <= sel_years_viol[1])
-df_viol = df[mask_viol]
+df_viol = partition_store.filter_years(df, sel_years_viol[0], sel_years_viol[1])
 
 try:
-    map_data_count = df_viol[default_loc_col].value_counts().reset_index()
-    map_data_count.columns = [default_loc_col, 'Count']
+    map_data_count = get_map_aggregate(df_viol, default_loc_col)
     render_choropleth_map_on_page(map_data_count, geojson_data, default_loc_col, 'Count', state_prop_name, color_theme="YlOrRd", title="Violations Count")
 except Exception as e:
     st.error(f"Could not generate Violations Count map: {e}")
@@ -119,13 +121,9 @@ if 'Driver_Age' in df.columns:
             sel_years_age = st.slider("Filter by Year", min_year, max_year, (min_year, max_year), key="age_slider")
 
         # Filter
-        mask_age = (df['Date'].dt.year >= sel_years_age[0]) & (df['Date'].dt.year <= sel_years_age[1])
-        df_age = df[mask_age].copy()
+        df_age = partition_store.filter_years(df, sel_years_age[0], sel_years_age[1])
 
-        # Ensure numeric
-        df_age['Driver_Age'] = pd.to_numeric(df_age['Driver_Age'], errors='coerce')
-        map_data_age = df_age.groupby(default_loc_col)['Driver_Age'].mean().reset_index()
-        map_data_age.columns = [default_loc_col, 'Avg Age']
+        map_data_age = get_map_aggregate(df_age, default_loc_col, 'Driver_Age', 'mean', 'Avg Age') # Driver_Age made numeric
         #All Color Themes Options: OrRd, YlOrRd, PuBuGn, YlGnBu, RdBu, BrBG, PiYG, PRGn, PuOr, Set1, Set2, Set3, Pastel1, Pastel2, Accent, Dark2, Paired, Set1, Set2, Set3, Pastel1, Pastel2, Accent, Dark2, Paired
         render_choropleth_map_on_page(map_data_age, geojson_data, default_loc_col, 'Avg Age', state_prop_name, color_theme="BrBG", title="Average Driver's Age")
     except Exception as e:
@@ -155,7 +153,7 @@ with st.expander("Configure Custom Map", expanded=True):
         # end_date input removed
 
         
-        numerical_cols = df.select_dtypes(include=['float64', 'int64']).columns.tolist()
+        numerical_cols = data_schema.numeric_columns(df)
         # Exclude Fine_Amount_Num helper if exists
         numerical_cols = [c for c in numerical_cols if c != 'Fine_Amount_Num']
         
@@ -171,17 +169,15 @@ with st.expander("Configure Custom Map", expanded=True):
 
     if st.button("Generate Custom Map"):
         # Filter
-        mask_custom = (df['Date'].dt.year >= sel_years_custom[0]) & (df['Date'].dt.year <= sel_years_custom[1])
-        plot_df = df[mask_custom].copy()
+        plot_df = partition_store.filter_years(df, sel_years_custom[0], sel_years_custom[1])
 
         # Aggregate
         if value_col == 'Count of Violations':
-            custom_map_data = plot_df[location_col].value_counts().reset_index()
-            custom_map_data.columns = [location_col, 'Count']
+            custom_map_data = get_map_aggregate(plot_df, location_col)
             viz_val_col = 'Count'
         else:
             agg_map = {'Mean': 'mean', 'Sum': 'sum', 'Median': 'median'}
-            custom_map_data = plot_df.groupby(location_col)[value_col].agg(agg_map[agg_func]).reset_index()
+            custom_map_data = get_map_aggregate(plot_df, location_col, value_col, agg_map[agg_func])
             viz_val_col = value_col
         
         # Store in Session State
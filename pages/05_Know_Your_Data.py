@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from core import data_ingest
 
 st.set_page_config(
     page_title="Auto Data Analyzer", 
@@ -16,7 +17,15 @@ st.markdown("Want to know more about your data? This page helps you understand y
 uploaded = st.file_uploader("Upload your CSV file", type=["csv"])
 
 if uploaded:
-    df = pd.read_csv(uploaded)
+    # Parse in blocks with the multithreaded reader instead of one pd.read_csv call
+    progress_bar = st.progress(0.0, text="Reading file ...")
+    try:
+        df = data_ingest.read_csv(uploaded, progress_callback=lambda fraction, text: progress_bar.progress(fraction, text=text))
+    except Exception as e:
+        st.error(f"An error occurred while reading the file: {e}")
+        st.stop()
+    finally:
+        progress_bar.empty()
 
 
 
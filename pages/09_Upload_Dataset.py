@@ -5,6 +5,7 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from core.data_generator import generate_dataset_by_days
+from core import data_cache, data_catalog, data_ingest, data_schema, dataset_versions, dataset_watcher, downloads
 
 # ------------------------------
 # PAGE CONFIG
@@ -58,14 +59,18 @@ with st.expander("🤖 Generate Fake Traffic Dataset"):
             os.makedirs(save_dir, exist_ok=True)
             
             dataset_id = 1
-            while (dataset_id <= 99) and (os.path.exists(os.path.join(save_dir, f"{dataset_id:02d}_traffic_dataset.csv"))):
+            while (dataset_id <= 99) and any(os.path.exists(os.path.join(save_dir, f"{dataset_id:02d}_traffic_dataset{ext}")) for ext in data_catalog.DATASET_EXTENSIONS):
                 dataset_id += 1
             
             if dataset_id <= 99:
-                file_path = os.path.join(save_dir, f"{dataset_id:02d}_traffic_dataset.csv")
-                df.to_csv(file_path, index=False)
-                st.success(f"Successfully generated and saved '{os.path.basename(file_path)}' in the `{save_dir}` directory.")
-                st.dataframe(df.head())
+                # Written as compressed Parquet: generated data is never appended to, so it needs no CSV text
+                file_path = os.path.join(save_dir, f"{dataset_id:02d}_traffic_dataset{data_cache.PARQUET_EXTENSION}")
+                if data_cache.write_cache(df, file_path):
+                    dataset_watcher.update_store(file_path)
+                    st.success(f"Successfully generated and saved '{os.path.basename(file_path)}' in the `{save_dir}` directory.")
+                    st.dataframe(df.head())
+                else:
+                    st.error("The generated dataset could not be saved.")
             else:
                 st.warning("Dataset generation limit (99) reached for today. Please try again tomorrow.")
 
@@ -73,18 +78,9 @@ st.markdown("---")
 st.markdown("### Upload and save new datasets")
 
 # --- Gather existing datasets for duplicate check ---
-root_upload_dir = "uploaded_datasets"
 local_dataset_dir = "dataset"
-all_dataset_paths = []
-if os.path.exists(local_dataset_dir):
-    for file_name in os.listdir(local_dataset_dir):
-        if file_name.endswith('.csv'):
-            all_dataset_paths.append(os.path.join(local_dataset_dir, file_name))
-if os.path.exists(root_upload_dir):
-    for root, _, files in os.walk(root_upload_dir):
-        for file_name in files:
-            if file_name.endswith('.csv'):
-                all_dataset_paths.append(os.path.join(root, file_name))
+data_catalog.refresh_catalog()
+all_dataset_paths = [entry['path'] for entry in data_catalog.list_datasets() if entry['source'] in ("sample", "legacy")]
 
 # --- Traffic Violation Columns ---
 TRAFFIC_VIOLATION_COLUMNS = [
@@ -128,10 +124,8 @@ if uploaded_file is not None:
 
             if not is_duplicate:
                 try:
-                    # Check columns to decide the folder
-                    uploaded_df = pd.read_csv(uploaded_file)
-                    uploaded_file.seek(0) # Reset file pointer
-                    uploaded_columns = set(uploaded_df.columns)
+                    # Check columns to decide the folder (the header is enough, the file is streamed below)
+                    uploaded_columns = set(preview_df.columns)
                     
                     if set(TRAFFIC_VIOLATION_COLUMNS).issubset(uploaded_columns):
                         save_dir = "uploded_file_relateds"
@@ -142,9 +136,21 @@ if uploaded_file is not None:
                     
                     file_path = os.path.join(save_dir, uploaded_file.name)
 
-                    with open(file_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
+                    # Save and build the columnar cache block by block (bounded memory)
+                    progress_bar = st.progress(0.0, text="Saving dataset ...")
+                    cached = data_ingest.ingest_upload(
+                        uploaded_file,
+                        file_path,
+                        progress_callback=lambda fraction, text: progress_bar.progress(fraction, text=text)
+                    )
+                    if save_dir == "uploded_file_relateds":
+                        progress_bar.progress(1.0, text="Adding violations to the partitioned store ...")
+                        dataset_watcher.update_store(file_path) # Replaces the rows of a file uploaded under the same name
+                    dataset_versions.snapshot(file_path) # A file replaced by name keeps its old content as a version
+                    progress_bar.empty()
                     st.success(f"File '{uploaded_file.name}' saved successfully in `{save_dir}`.")
+                    if not cached:
+                        st.info("The dataset will be indexed the first time it is opened.")
                 
                 except Exception as e:
                     st.error(f"An error occurred while saving the file: {e}")
@@ -155,51 +161,35 @@ if uploaded_file is not None:
 st.markdown("---")
 st.markdown("### View Previously Uploaded Datasets")
 
-dataset_options = {}
-if os.path.exists(local_dataset_dir):
-    for file_name in os.listdir(local_dataset_dir):
-        if file_name.endswith('.csv'):
-            dataset_options[f"[Sample] / {file_name}"] = os.path.join(local_dataset_dir, file_name)
-
-# Function to scan a directory and add to options
-def scan_and_add_datasets(directory, prefix):
-    if os.path.exists(directory):
-        # Scan for date-based directories (for generated data)
-        if "generated" in directory:
-            for date_dir in sorted(os.listdir(directory), reverse=True):
-                full_date_dir = os.path.join(directory, date_dir)
-                if os.path.isdir(full_date_dir):
-                    for file_name in sorted(os.listdir(full_date_dir)):
-                        if file_name.endswith('.csv'):
-                            display_name = f"[{prefix} - {date_dir}] / {file_name}"
-                            dataset_options[display_name] = os.path.join(full_date_dir, file_name)
-        else: # Original logic for other directories
-            for file_name in sorted(os.listdir(directory)):
-                if file_name.endswith('.csv'):
-                    dataset_options[f"[{prefix}] / {file_name}"] = os.path.join(directory, file_name)
+# Read the dataset list from the catalog (picks up files saved or generated above)
+data_catalog.refresh_catalog()
+catalog_entries = data_catalog.list_datasets()
 
-# Scan new directories
-scan_and_add_datasets("uploded_file_relateds", "Traffic Related")
-scan_and_add_datasets("generated_fake_traffic_datasets", "Generated")
-scan_and_add_datasets("uploded_file_others", "Other CSVs")
+def get_date_from_dir_name(dir_name):
+    date_str = dir_name.replace("Date(", "").replace(")", "")
+    return datetime.strptime(date_str, "%d-%m-%Y")
 
+dataset_options = {}
+for entry in catalog_entries:
+    if entry['source'] == "sample":
+        dataset_options[f"[Sample] / {entry['file_name']}"] = entry['path']
+for source, prefix in [("related", "Traffic Related"), ("generated", "Generated"), ("other", "Other CSVs")]:
+    for entry in catalog_entries:
+        if entry['source'] != source:
+            continue
+        if source == "generated":
+            dataset_options[f"[{prefix} - {entry['folder']}] / {entry['file_name']}"] = entry['path']
+        else:
+            dataset_options[f"[{prefix}] / {entry['file_name']}"] = entry['path']
 
+legacy_entries = [entry for entry in catalog_entries if entry['source'] == "legacy" and entry['folder'].startswith("Date(")]
+legacy_entries.sort(key=lambda entry: get_date_from_dir_name(entry['folder']), reverse=True)
+for entry in legacy_entries:
+    dataset_options[f"[Legacy] {entry['folder'].replace('Date(', '').replace(')', '')} / {entry['file_name']}"] = entry['path']
 
-if not os.path.exists(root_upload_dir) and not dataset_options and not os.path.exists("uploded_file_relateds") and not os.path.exists("uploded_file_others"):
+if not dataset_options:
     st.info("No datasets have been uploaded or found locally.")
 else:
-    if os.path.exists(root_upload_dir):
-        date_dirs = [d for d in os.listdir(root_upload_dir) if os.path.isdir(os.path.join(root_upload_dir, d)) and d.startswith("Date(")]
-        def get_date_from_dir_name(dir_name):
-            date_str = dir_name.replace("Date(", "").replace(")", "")
-            return datetime.strptime(date_str, "%d-%m-%Y")
-        sorted_date_dirs = sorted(date_dirs, key=get_date_from_dir_name, reverse=True)
-        for date_dir in sorted_date_dirs:
-            dir_path = os.path.join(root_upload_dir, date_dir)
-            files = sorted([f for f in os.listdir(dir_path) if f.endswith('.csv')])
-            for file_name in files:
-                dataset_options[f"[Legacy] {date_dir.replace('Date(', '').replace(')', '')} / {file_name}"] = os.path.join(dir_path, file_name)
-
     selected_dataset_display_name = st.selectbox("Select a dataset to view", options=["-"] + list(dataset_options.keys()))
 
     if selected_dataset_display_name != "-":
@@ -207,7 +197,8 @@ else:
         st.markdown(f"### Statistics for: `{selected_dataset_display_name}`")
         
         try:
-            df_view = pd.read_csv(file_path)
+            df_view = data_schema.format_ids(data_cache.load_dataset(file_path)) # Read from the compressed Parquet cache
+            df_view = data_schema.drop_derived_columns(df_view, data_catalog.get_dataset(file_path)['columns']) # Describe the file's own columns
             tab1, tab2, tab3, tab4 = st.tabs(["📋 Overview", "🔢 Numerical Summary", "🔠 Categorical Summary", "📄 Data Preview & Actions"])
 
             with tab1:
@@ -219,7 +210,7 @@ else:
                 st.dataframe(df_view.describe(include=np.number))
             with tab3:
                 st.markdown("#### Summary for Categorical Columns")
-                cat_summary = df_view.describe(include='object')
+                cat_summary = df_view.describe(include=['object', 'category'])
                 if not cat_summary.empty: st.dataframe(cat_summary)
                 else: st.info("No categorical columns found.")
             with tab4:
@@ -230,13 +221,23 @@ else:
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    st.download_button(
-                        label="⬇️ Download Full Dataset",
-                        data=df_view.to_csv(index=False).encode('utf-8'),
-                        file_name=os.path.basename(file_path),
-                        mime='text/csv',
-                        width='stretch'
-                    )
+                    # The file is only read once a download is asked for, not on every rerun
+                    download_format = st.radio("Download format", ["CSV", "Parquet"], horizontal=True, key="download_format").lower()
+                    if st.button("⬇️ Prepare Full Dataset Download", width='stretch'):
+                        with st.spinner("Preparing download ..."):
+                            download_path = downloads.dataset_file(file_path, download_format)
+                        if download_path is None:
+                            st.error("This dataset cannot be stored as Parquet, please download it as CSV.")
+                        else:
+                            with open(download_path, "rb") as f:
+                                st.download_button(
+                                    label="⬇️ Download Full Dataset",
+                                    data=f,
+                                    file_name=f"{os.path.splitext(os.path.basename(file_path))[0]}.{download_format}",
+                                    mime=downloads.MIME_TYPES[download_format],
+                                    width='stretch',
+                                    on_click="ignore"
+                                )
                 with col2:
                     # Do not allow deleting sample or generated datasets
                     if not file_path.startswith(local_dataset_dir) and "generated_fake_traffic_datasets" not in file_path:
@@ -265,6 +266,7 @@ if st.session_state.file_to_delete:
                 if secret_code == "123456789":
                     try:
                         os.remove(file_path_to_delete)
+                        dataset_watcher.update_store(file_path_to_delete) # Its rows leave the partitioned store
                         st.success(f"Successfully deleted `{os.path.basename(file_path_to_delete)}`.")
                         st.session_state.file_to_delete = None
                         st.rerun()
@@ -1,6 +1,10 @@
 import streamlit as st
 import pandas as pd
 from core import (
+    data_schema,
+    data_validation,
+    memory_governor,
+    record_index,
     sidebar,
     data_variables
 )
@@ -20,10 +24,79 @@ st.set_page_config(
 st.title("📝 Dataset Summary")
 st.markdown("Visualize and analyze traffic violation data.")
 
+QUARANTINE_PREVIEW_ROWS = 1000
+
 df = sidebar.render_sidebar()
 total_data_records = len(df)
 st.metric(label="Total Data Records", value=total_data_records)
 
+# ------------------------------
+# RECORD LOOKUP (hash index, no scan)
+# ------------------------------
+lookup_columns = [col for col in data_schema.ID_COLUMNS if col in df.columns]
+if lookup_columns:
+    with st.expander("🎫 Record Lookup", expanded=True):
+        lookup_cols = st.columns(len(lookup_columns))
+        lookup_labels = {'Violation_ID': "Violation ID (e.g. VLT100042)", 'Officer_ID': "Officer ID (e.g. OFF4821)"}
+        for lookup_col, col in zip(lookup_cols, lookup_columns):
+            with lookup_col:
+                lookup_text = st.text_input(lookup_labels[col], key=f"lookup_{col}")
+                if not lookup_text.strip():
+                    continue
+                found = data_schema.format_ids(record_index.find_rows(df, col, lookup_text))
+                if found.empty:
+                    st.warning(f"No record found for `{lookup_text.strip()}`.")
+                elif len(found) == 1:
+                    # One ticket: show it as a Field / Value card
+                    record = found.iloc[0]
+                    st.dataframe(
+                        pd.DataFrame({'Field': record.index, 'Value': record.astype(str).to_numpy()}),
+                        hide_index=True, width='stretch'
+                    )
+                else:
+                    st.write(f"`{len(found)}` records found.")
+                    st.dataframe(found, hide_index=True, width='stretch')
+
+# ------------------------------
+# VALIDATION REPORT (rules from core.data_validation)
+# ------------------------------
+validation_report = data_validation.load_report(df.attrs.get('validation'))
+if validation_report is not None:
+    with st.expander(f"🧪 Validation Report ({validation_report['quarantined']:,} quarantined rows)", expanded=False):
+        st.dataframe(
+            pd.DataFrame([
+                {'Rule': rule['description'], 'Column': rule['column'], 'Rows': rule['rows']}
+                for rule in validation_report['rules'].values()
+            ]),
+            hide_index=True, width='stretch'
+        )
+        if validation_report['quarantined']:
+            st.write(f"Quarantined rows (first {QUARANTINE_PREVIEW_ROWS:,}; `Row` is the row number in the file):")
+            st.dataframe(
+                data_schema.format_ids(data_validation.load_quarantined(df.attrs['validation'], QUARANTINE_PREVIEW_ROWS)),
+                hide_index=True, width='stretch'
+            )
+
+# ------------------------------
+# MEMORY USAGE (frames held by this server process, see core.memory_governor)
+# ------------------------------
+memory_usage = memory_governor.get_usage()
+with st.expander(f"🧠 Memory Usage ({memory_usage['used'] / 1024 ** 2:,.0f} of {memory_usage['budget'] / 1024 ** 2:,.0f} MB)", expanded=False):
+    st.progress(min(memory_usage['used'] / memory_usage['budget'], 1.0))
+    st.caption(f"Least recently used entries are released above the budget (set with `{memory_governor.BUDGET_ENV_VAR}`). "
+               "Columns mapped from the shared store are listed apart: all processes share one copy of them. "
+               "Pending session results are released on that session's next run.")
+    if memory_usage['entries']:
+        st.dataframe(
+            pd.DataFrame([
+                {'Held As': entry['kind'] + (" (pending)" if entry['pending'] else ""),
+                 'Key': ", ".join(str(part) for part in entry['key'] if part is not None),
+                 'MB': entry['bytes'] / 1024 ** 2, 'Mapped MB': entry['mapped'] / 1024 ** 2}
+                for entry in memory_usage['entries']
+            ]),
+            hide_index=True, width='stretch', column_config={'MB': st.column_config.NumberColumn(format="%.1f"), 'Mapped MB': st.column_config.NumberColumn(format="%.1f")}
+        )
+
 # Initialize session state for filters if not exists
 if "search_violation" not in st.session_state: st.session_state.search_violation = ""
 if "search_gender" not in st.session_state: st.session_state.search_gender = ""
@@ -72,7 +145,7 @@ if set(data_variables.TRAFFIC_VIOLATION_COLUMNS).issubset(set(df.columns)):
         st.button("🔄 Reset Filters", on_click=clear_filters)
 
 # Filter the dataset logic using Session State values
-df_filtered = df.copy()
+df_filtered = df.copy(deep=False)
 
 if set(data_variables.TRAFFIC_VIOLATION_COLUMNS).issubset(set(df.columns)):
     # Apply Filters based on Session State (which holds the submitted form values)
@@ -99,8 +172,5 @@ if set(data_variables.TRAFFIC_VIOLATION_COLUMNS).issubset(set(df.columns)):
 else:
     st.error("Dataset does not contain required columns for advanced filtering.")
 
-# CRITICAL FIX: Ensure Violation_ID is string to prevent PyArrow serialization errors
-if 'Violation_ID' in df_filtered.columns:
-    df_filtered['Violation_ID'] = df_filtered['Violation_ID'].astype(str)
-
-st.data_editor(df_filtered, width='stretch')
\ No newline at end of file
+# IDs are stored as numbers; show them as the original text
+st.data_editor(data_schema.format_ids(df_filtered), width='stretch')
\ No newline at end of file
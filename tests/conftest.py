@@ -0,0 +1,15 @@
+import pytest
+
+from core import record_index
+
+
+# -------------------------------------------------------------------------------
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Runs a test in an empty folder, so the relative .dataset_cache starts empty.
+    """
+    monkeypatch.chdir(tmp_path)
+    record_index._open_index.cache_clear() # Memory-mapped indexes are cached by key
+    yield tmp_path
+    record_index._open_index.cache_clear()
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import data_cache, data_schema, dataset_union
+
+
+# -------------------------------------------------------------------------------
+def make_member(name: str, ids: list, fines: list) -> dict:
+    """
+    Writes a member's Parquet cache and returns its catalog entry.
+    """
+    df = data_schema.apply_traffic_schema(pd.DataFrame({
+        'Violation_ID': ids,
+        'Fine_Amount': fines,
+        'Date': ['2024-01-15'] * len(ids),
+    }))
+    assert data_cache.write_cache(df, data_cache.get_cache_path(name))
+    return {'path': f"{name}.csv", 'content_hash': name, 'is_traffic': True,
+            'min_date': '2024-01-15', 'max_date': '2024-01-15'}
+# -------------------------------------------------------------------------------
+@pytest.fixture
+def members(workdir):
+    first = make_member("first", ['VLT000001', 'VLT000002', 'VLT000002', 'VLT000003'], [1, 2, 3, 4])
+    second = make_member("second", ['VLT000003', 'VLT000004', 'VLT000004', 'VLT000001'], [5, 6, 7, 8])
+    return first, second
+
+
+# ==================================================================================
+# _IdFilter
+# ==================================================================================
+def test_id_filter_exact():
+    id_filter = dataset_union._IdFilter(1000)
+    assert not id_filter.seen(np.arange(10, dtype=np.uint32)).any()
+    id_filter.add(np.arange(0, 1000, 2, dtype=np.uint32))
+    seen = id_filter.seen(np.arange(1000, dtype=np.uint32))
+    # Bloom filter false positives are settled by the exact check
+    assert np.array_equal(np.flatnonzero(seen), np.arange(0, 1000, 2))
+# -------------------------------------------------------------------------------
+def test_id_filter_small_table():
+    id_filter = dataset_union._IdFilter(0)
+    id_filter.add(np.array([7], dtype=np.uint32))
+    assert id_filter.seen(np.array([7, 8], dtype=np.uint32)).tolist() == [True, False]
+
+
+# ==================================================================================
+# read_union
+# ==================================================================================
+def test_dedup_keeps_first_files_row(members):
+    df = dataset_union.read_union(list(members))
+    assert df['Fine_Amount'].tolist() == [1, 2, 3, 4, 6, 7]
+# -------------------------------------------------------------------------------
+def test_dedup_follows_priority_order(members):
+    first, second = members
+    df = dataset_union.read_union([second, first])
+    assert df['Fine_Amount'].tolist() == [5, 6, 7, 8, 2, 3]
+# -------------------------------------------------------------------------------
+def test_dedup_keeps_rows_repeated_within_a_file(members):
+    first, _ = members
+    df = dataset_union.read_union([first])
+    assert data_schema.format_ids(df)['Violation_ID'].tolist() == ['VLT000001', 'VLT000002', 'VLT000002', 'VLT000003']
+# -------------------------------------------------------------------------------
+def test_dedup_with_projection(members):
+    df = dataset_union.read_union(list(members), columns=['Fine_Amount'])
+    assert list(df.columns) == ['Fine_Amount']
+    assert df['Fine_Amount'].tolist() == [1, 2, 3, 4, 6, 7]
+# -------------------------------------------------------------------------------
+def test_without_dedup(members):
+    df = dataset_union.read_union(list(members), dedup=False)
+    assert df['Fine_Amount'].tolist() == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert df.attrs['zone_map']['zones'][1][2:] == (4, 8)
@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+from core import data_cache, dataset_versions
+
+PATH = "traffic.csv"
+
+
+# -------------------------------------------------------------------------------
+def rows(ids: list, fines: list) -> pd.DataFrame:
+    return pd.DataFrame({'Violation_ID': [f"VLT{i:06d}" for i in ids], 'Fine_Amount': fines, 'Date': '2024-01-15'})
+# -------------------------------------------------------------------------------
+def write(df: pd.DataFrame, previous_hash: str = None, append: bool = False) -> tuple:
+    """
+    Writes (or appends to) the dataset file and caches it, like an upload or the
+    generator would. Returns (catalog-like entry, the typed content).
+    """
+    df.to_csv(PATH, mode='a' if append else 'w', header=not append, index=False)
+    content_hash = data_cache.get_file_hash(PATH)
+    content = data_cache.load_dataset(PATH, content_hash)
+    entry = {
+        'source': "generated", 'path': PATH, 'row_count': len(content),
+        'content_hash': content_hash, 'previous_hash': previous_hash,
+        'appended_from': 0 if append else None,
+    }
+    return entry, content
+# -------------------------------------------------------------------------------
+def assert_same_rows(df: pd.DataFrame, expected: pd.DataFrame):
+    """
+    Versions come back as kept rows then added rows, so rows are compared as multisets.
+    """
+    def ordered(frame):
+        frame = frame.astype({col: str for col in frame.columns if frame[col].dtype == 'category'})
+        return frame.sort_values(list(frame.columns), ignore_index=True)
+    pd.testing.assert_frame_equal(ordered(df), ordered(expected), check_dtype=False)
+# -------------------------------------------------------------------------------
+def assert_versions(contents: list):
+    versions = dataset_versions.list_versions(PATH)
+    assert [version['version'] for version in versions] == list(range(1, len(contents) + 1))
+    for number, content in enumerate(contents, start=1):
+        assert_same_rows(dataset_versions.read(PATH, version=number), content)
+    assert_same_rows(dataset_versions.read(PATH), contents[-1])
+
+
+# ==================================================================================
+# Recording and rebuilding
+# ==================================================================================
+def test_unchanged_file_is_not_versioned(workdir):
+    entry, _ = write(rows([1, 2], [100, 200]))
+    assert dataset_versions.record_entry(entry) is None
+    assert dataset_versions.list_versions(PATH) == []
+    assert dataset_versions.read(PATH) is None
+# -------------------------------------------------------------------------------
+def test_replace_then_append(workdir):
+    entry, first = write(rows([1, 2, 3, 3], [100, 200, 300, 300]))
+    # Replace: row 1 removed, row 2 changed, one copy of the duplicate removed, rows 4 added
+    entry, second = write(rows([2, 3, 4, 4], [250, 300, 400, 400]), entry['content_hash'])
+    assert dataset_versions.record_entry(entry) == 2
+    assert_versions([first, second])
+
+    entry, third = write(rows([5, 1], [500, 100]), entry['content_hash'], append=True)
+    assert dataset_versions.record_entry(entry) == 3
+    assert dataset_versions.list_versions(PATH)[-1]['deletes'] is None # Appends store no deletions
+    assert_versions([first, second, third])
+
+    # The original content again: only the rows version 3 lacks (2 and a second 3) are stored
+    stored_rows = dataset_versions.list_versions(PATH)[-1]['stored_rows']
+    entry, fourth = write(rows([1, 2, 3, 3], [100, 200, 300, 300]), entry['content_hash'])
+    assert dataset_versions.record_entry(entry) == 4
+    assert dataset_versions.list_versions(PATH)[-1]['stored_rows'] == stored_rows + 2
+    assert_versions([first, second, third, fourth])
+# -------------------------------------------------------------------------------
+def test_append_first(workdir):
+    entry, first = write(rows([1, 2], [100, 200]))
+    entry, second = write(rows([3], [300]), entry['content_hash'], append=True)
+    assert dataset_versions.record_entry(entry) == 2
+    assert_versions([first, second])
+    assert dataset_versions.record_entry(entry) == 2 # Recorded once
+
+
+# ==================================================================================
+# Resolving
+# ==================================================================================
+def test_read_missing_version(workdir):
+    entry, _ = write(rows([1], [100]))
+    entry, _ = write(rows([2], [200]), entry['content_hash'])
+    dataset_versions.record_entry(entry)
+    assert dataset_versions.read(PATH, version=3) is None
+# -------------------------------------------------------------------------------
+def test_read_as_of(workdir):
+    entry, _ = write(rows([1], [100]))
+    entry, second = write(rows([2], [200]), entry['content_hash'])
+    dataset_versions.record_entry(entry)
+    assert dataset_versions.read(PATH, as_of="2000-01-01") is None
+    assert_same_rows(dataset_versions.read(PATH, as_of=pd.Timestamp.now().normalize()), second)
+# -------------------------------------------------------------------------------
+@pytest.mark.parametrize("columns", [['Fine_Amount'], ['Violation_ID', 'Fine_Amount']])
+def test_read_projection(workdir, columns):
+    entry, first = write(rows([1, 2], [100, 200]))
+    entry, _ = write(rows([2, 3], [200, 300]), entry['content_hash'])
+    dataset_versions.record_entry(entry)
+    df = dataset_versions.read(PATH, version=1, columns=columns)
+    assert list(df.columns) == columns
+    assert_same_rows(df, first[columns])
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from core import data_schema, record_index
+
+INDEX_KEY = "test-dataset"
+
+
+# -------------------------------------------------------------------------------
+@pytest.fixture
+def dataset(workdir):
+    """
+    Small typed dataset with a built record index (one ID repeated, one missing).
+    """
+    df = data_schema.apply_traffic_schema(pd.DataFrame({
+        'Violation_ID': ['VLT000001', 'VLT000002', 'VLT100000', 'VLT000002', None],
+        'Officer_ID': ['OFF0001', 'OFF0002', 'OFF0001', 'OFF0003', 'OFF0002'],
+        'Fine_Amount': [100, 200, 300, 400, 500],
+    }))
+    assert record_index.build_index(INDEX_KEY, df)
+    df.attrs['record_index'] = INDEX_KEY
+    return df
+# -------------------------------------------------------------------------------
+@pytest.mark.parametrize("text", ["VLT000002", "vlt 000002", "2", " VLT2 "])
+def test_find_rows_hit(dataset, text):
+    found = record_index.find_rows(dataset, 'Violation_ID', text)
+    assert found['Fine_Amount'].tolist() == [200, 400]
+# -------------------------------------------------------------------------------
+def test_find_rows_uses_index(dataset, monkeypatch):
+    def scan(df):
+        raise AssertionError("column scanned instead of using the index")
+    monkeypatch.setattr(data_schema, 'format_ids', scan)
+    assert record_index.find_rows(dataset, 'Violation_ID', "VLT000001")['Fine_Amount'].tolist() == [100]
+    assert record_index.find_rows(dataset, 'Violation_ID', "VLT000009").empty
+# -------------------------------------------------------------------------------
+def test_find_rows_unpadded_id(dataset):
+    found = record_index.find_rows(dataset, 'Violation_ID', "VLT100000")
+    assert found['Fine_Amount'].tolist() == [300]
+# -------------------------------------------------------------------------------
+def test_find_rows_other_column(dataset):
+    found = record_index.find_rows(dataset, 'Officer_ID', "OFF0001")
+    assert found['Fine_Amount'].tolist() == [100, 300]
+# -------------------------------------------------------------------------------
+@pytest.mark.parametrize("text", ["VLT000009", "OFF0001", "abc", "99999999999", ""])
+def test_find_rows_miss(dataset, text):
+    assert record_index.find_rows(dataset, 'Violation_ID', text).empty
+# -------------------------------------------------------------------------------
+def test_find_rows_unknown_column(dataset):
+    assert record_index.find_rows(dataset, 'Comments', "VLT000001").empty
+# -------------------------------------------------------------------------------
+def test_find_rows_non_range_index(dataset):
+    # Row labels no longer match the indexed positions, so the column is scanned
+    relabelled = dataset.set_axis([10, 20, 30, 40, 50])
+    found = record_index.find_rows(relabelled, 'Violation_ID', "VLT000002")
+    assert found.index.tolist() == [20, 40]
+    assert record_index.find_rows(relabelled, 'Violation_ID', "VLT000009").empty
+# -------------------------------------------------------------------------------
+def test_find_rows_filtered_frame(dataset):
+    # Fewer rows than indexed: positions from the index would point at other rows
+    filtered = dataset[dataset['Fine_Amount'] > 150]
+    found = record_index.find_rows(filtered, 'Violation_ID', "2")
+    assert found['Fine_Amount'].tolist() == [200, 400]